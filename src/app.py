@@ -7,6 +7,7 @@ from config.database import get_connection_string
 from config.logging_config import setup_logging
 from src.models import db 
 from src.routes import blueprints 
+from src.services.location_hierarchy import migrate_legacy_locations
 
 
 # Load environment variables
@@ -24,6 +25,8 @@ app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-key-replace-in-productio
 app.config['DEBUG'] = os.getenv('FLASK_DEBUG') == '1'
 app.config['SQLALCHEMY_DATABASE_URI'] = get_connection_string()
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Taille maximale d'une requête (uploads audio), vérifiée sur l'en-tête Content-Length avant lecture du corps
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_CONTENT_LENGTH', 25 * 1024 * 1024))
 
 # Initialize extensions
 db.init_app(app)
@@ -150,6 +153,8 @@ def db_config_redirect():
 def init_db():
     with app.app_context():
         db.create_all()
+        # Reporter les zones/meubles/tiroirs existants dans la hiérarchie générique
+        migrate_legacy_locations()
 
 if __name__ == '__main__':
     # Configure logging
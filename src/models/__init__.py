@@ -6,4 +6,7 @@ db = SQLAlchemy()
 from .item import Item
 from .borrow import Borrow
 from .location import Zone, Furniture, Drawer
+from .location_node import LocationNode
+from .item_embedding import ItemEmbedding
+from .ai_usage import AIUsage
 from .user import User
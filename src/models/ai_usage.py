@@ -0,0 +1,23 @@
+from datetime import datetime
+from . import db
+
+class AIUsage(db.Model):
+    """
+    Un appel à l'API d'IA: opération, modèle, jetons consommés, durée et utilisateur à l'origine de la requête.
+
+    `user_id` n'est pas une clé étrangère: l'historique de consommation est conservé après la suppression d'un utilisateur.
+    """
+    __tablename__ = 'ai_usage'
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    user_id = db.Column(db.Integer, nullable=True, index=True)
+    operation = db.Column(db.String(30), nullable=False)
+    model = db.Column(db.String(100), nullable=True)
+    status_code = db.Column(db.Integer, nullable=True)
+    prompt_tokens = db.Column(db.Integer, nullable=True)
+    completion_tokens = db.Column(db.Integer, nullable=True)
+    total_tokens = db.Column(db.Integer, nullable=True)
+    latency_ms = db.Column(db.Integer, nullable=True)
+
+    def __repr__(self):
+        return f'<AIUsage {self.operation} {self.model} {self.total_tokens}>'
@@ -14,6 +14,9 @@ class Item(db.Model):
     furniture_id = db.Column(db.Integer, db.ForeignKey('furniture.id'), nullable=True)
     drawer_id = db.Column(db.Integer, db.ForeignKey('drawer.id'), nullable=True)
     
+    # Noeud le plus profond de la hiérarchie générique (synchronisé avec les clés ci-dessus)
+    location_node_id = db.Column(db.Integer, db.ForeignKey('location_node.id'), nullable=True, index=True)
+    
     # Champs texte pour la compatibilité (nullable pour les articles temporaires)
     zone = db.Column(db.String(100), nullable=True)
     mobilier = db.Column(db.String(100), nullable=True)
@@ -26,6 +29,7 @@ class Item(db.Model):
     zone_rel = db.relationship('Zone', backref='items', lazy=True)
     furniture_rel = db.relationship('Furniture', backref='items', lazy=True)
     drawer_rel = db.relationship('Drawer', backref='items', lazy=True)
+    location_node = db.relationship('LocationNode', backref='items', lazy=True)
 
     def __repr__(self):
         if self.is_temporary:
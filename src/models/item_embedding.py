@@ -0,0 +1,28 @@
+from datetime import datetime
+from sqlalchemy import event
+from . import db
+from .item import Item
+
+class ItemEmbedding(db.Model):
+    """
+    Vecteur d'embedding du nom d'un article, stocké en float32 brut (4 octets par dimension).
+
+    `text_hash` identifie le texte vectorisé: un renommage de l'article rend le vecteur obsolète.
+    """
+    __tablename__ = 'item_embedding'
+    item_id = db.Column(db.Integer, db.ForeignKey('item.id', ondelete='CASCADE'), primary_key=True)
+    # Modèle (ou backend local) ayant produit le vecteur
+    model = db.Column(db.String(100), nullable=False)
+    text_hash = db.Column(db.String(40), nullable=False)
+    dim = db.Column(db.Integer, nullable=False)
+    vector = db.Column(db.LargeBinary, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ItemEmbedding {self.item_id} {self.model}>'
+
+
+# La suppression d'un article supprime son vecteur (SQLite n'applique pas ON DELETE CASCADE par défaut)
+@event.listens_for(Item, 'after_delete')
+def _item_after_delete(mapper, connection, target):
+    connection.execute(ItemEmbedding.__table__.delete().where(ItemEmbedding.item_id == target.id))
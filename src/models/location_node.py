@@ -0,0 +1,197 @@
+from datetime import datetime
+from sqlalchemy import event, func, select
+from . import db
+from .location import Zone, Furniture, Drawer
+from .item import Item
+
+class LocationNode(db.Model):
+    """
+    Noeud générique de la hiérarchie des emplacements (profondeur arbitraire).
+
+    Le chemin matérialisé `path` contient les IDs des ancêtres et du noeud lui-même,
+    chacun suivi d'un '/' (ex: '3/17/42/'). Toutes les questions "sous ce noeud"
+    deviennent ainsi un simple parcours de plage sur l'index de `path`.
+    """
+    __tablename__ = 'location_node'
+    id = db.Column(db.Integer, primary_key=True)
+    parent_id = db.Column(db.Integer, db.ForeignKey('location_node.id'), nullable=True)
+    name = db.Column(db.String(100), nullable=False)
+    # Type du noeud ('zone', 'furniture', 'drawer' pour les niveaux historiques, libre sinon)
+    kind = db.Column(db.String(30), nullable=False, default='node')
+    # ID de la ligne Zone/Furniture/Drawer correspondante (NULL pour les noeuds génériques)
+    legacy_id = db.Column(db.Integer, nullable=True)
+    # Collation binaire sous PostgreSQL: les collations linguistiques (en_US.utf8) ignorent '/'
+    # et casseraient la comparaison par plage de `subtree_bounds`
+    path = db.Column(
+        db.String(255).with_variant(db.String(255, collation='C'), 'postgresql'),
+        nullable=False, default='', index=True
+    )
+    depth = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    children = db.relationship('LocationNode', backref=db.backref('parent', remote_side=[id]), lazy=True)
+
+    # Contrainte d'unicité: une ligne historique ne peut être associée qu'à un seul noeud
+    __table_args__ = (
+        db.UniqueConstraint('kind', 'legacy_id', name='unique_location_node_legacy'),
+    )
+
+    def __repr__(self):
+        return f'<LocationNode {self.path} {self.name}>'
+
+    @property
+    def ancestor_ids(self):
+        """Retourne les IDs des ancêtres (racine en premier), noeud courant inclus"""
+        return [int(part) for part in self.path.split('/') if part]
+
+    @staticmethod
+    def subtree_bounds(path):
+        """
+        Retourne les bornes [début, fin) de la plage de chemins couvrant le sous-arbre.
+        '/' précède immédiatement '0' dans la table ASCII : '3/17/' <= chemin < '3/170'.
+        Suppose une comparaison octet par octet (collation 'C' de la colonne sous PostgreSQL).
+        """
+        return path, path[:-1] + '0'
+
+    @classmethod
+    def subtree_filter(cls, path):
+        """Condition SQLAlchemy sélectionnant un sous-arbre par plage sur `path`"""
+        lower, upper = cls.subtree_bounds(path)
+        return db.and_(cls.path >= lower, cls.path < upper)
+
+
+# ---------------------------------------------------------------------------
+# Synchronisation avec les tables historiques Zone/Furniture/Drawer
+#
+# Les écouteurs ci-dessous s'exécutent pendant le flush, sur la même connexion,
+# ce qui garantit que la table location_node reste cohérente quelle que soit
+# la route (API, administration, import en batch) à l'origine de l'écriture.
+# ---------------------------------------------------------------------------
+
+_node_table = LocationNode.__table__
+
+# Niveau parent de chaque niveau historique: (kind du parent, attribut portant l'ID du parent)
+_LEGACY_PARENTS = {
+    'zone': None,
+    'furniture': ('zone', 'zone_id'),
+    'drawer': ('furniture', 'furniture_id'),
+}
+
+
+def find_legacy_node(connection, kind, legacy_id):
+    """Retourne la ligne (id, path, depth) du noeud associé à une ligne historique"""
+    if legacy_id is None:
+        return None
+    return connection.execute(
+        select(_node_table.c.id, _node_table.c.path, _node_table.c.depth).where(
+            _node_table.c.kind == kind,
+            _node_table.c.legacy_id == int(legacy_id),
+        )
+    ).first()
+
+
+def insert_node(connection, name, kind='node', legacy_id=None, parent=None):
+    """
+    Insère un noeud sous `parent` (ligne id/path/depth ou None pour une racine)
+    et calcule son chemin matérialisé. Retourne l'ID du nouveau noeud.
+    """
+    result = connection.execute(_node_table.insert().values(
+        parent_id=parent.id if parent else None,
+        name=name,
+        kind=kind,
+        legacy_id=legacy_id,
+        path='',
+        depth=parent.depth + 1 if parent else 0,
+    ))
+    node_id = result.inserted_primary_key[0]
+    path = f"{parent.path if parent else ''}{node_id}/"
+    connection.execute(_node_table.update().where(_node_table.c.id == node_id).values(path=path))
+    return node_id
+
+
+def insert_legacy_node(connection, kind, target):
+    """Crée le noeud correspondant à une Zone, un Furniture ou un Drawer"""
+    parent = None
+    parent_spec = _LEGACY_PARENTS[kind]
+    if parent_spec:
+        parent_kind, parent_attr = parent_spec
+        parent = find_legacy_node(connection, parent_kind, getattr(target, parent_attr))
+    return insert_node(connection, target.name, kind=kind, legacy_id=target.id, parent=parent)
+
+
+def move_node(connection, node, parent):
+    """
+    Rattache un noeud (ligne id/path/depth) sous `parent` (ou à la racine si None).
+    Le préfixe de chemin et la profondeur de tout le sous-arbre sont réécrits en une requête.
+    """
+    new_path = f"{parent.path if parent else ''}{node.id}/"
+    depth_delta = (parent.depth + 1 if parent else 0) - node.depth
+    lower, upper = LocationNode.subtree_bounds(node.path)
+    connection.execute(_node_table.update().where(
+        _node_table.c.path >= lower,
+        _node_table.c.path < upper,
+    ).values(
+        path=db.literal(new_path, db.String).concat(func.substr(_node_table.c.path, len(node.path) + 1)),
+        depth=_node_table.c.depth + depth_delta,
+    ))
+    connection.execute(_node_table.update().where(_node_table.c.id == node.id).values(
+        parent_id=parent.id if parent else None
+    ))
+
+
+def _register_legacy_listeners(model, kind):
+    @event.listens_for(model, 'after_insert')
+    def _after_insert(mapper, connection, target):
+        insert_legacy_node(connection, kind, target)
+
+    @event.listens_for(model, 'after_update')
+    def _after_update(mapper, connection, target):
+        connection.execute(_node_table.update().where(
+            _node_table.c.kind == kind,
+            _node_table.c.legacy_id == target.id,
+        ).values(name=target.name))
+        parent_spec = _LEGACY_PARENTS[kind]
+        if parent_spec and db.inspect(target).attrs[parent_spec[1]].history.has_changes():
+            node = find_legacy_node(connection, kind, target.id)
+            if node:
+                parent = find_legacy_node(connection, parent_spec[0], getattr(target, parent_spec[1]))
+                move_node(connection, node, parent)
+
+    @event.listens_for(model, 'after_delete')
+    def _after_delete(mapper, connection, target):
+        node = find_legacy_node(connection, kind, target.id)
+        if node:
+            lower, upper = LocationNode.subtree_bounds(node.path)
+            connection.execute(_node_table.delete().where(
+                _node_table.c.path >= lower,
+                _node_table.c.path < upper,
+            ))
+
+
+_register_legacy_listeners(Zone, 'zone')
+_register_legacy_listeners(Furniture, 'furniture')
+_register_legacy_listeners(Drawer, 'drawer')
+
+
+def resolve_item_node_id(connection, item):
+    """Retourne l'ID du noeud le plus profond correspondant aux clés historiques de l'article"""
+    for kind, attr in (('drawer', 'drawer_id'), ('furniture', 'furniture_id'), ('zone', 'zone_id')):
+        node = find_legacy_node(connection, kind, getattr(item, attr))
+        if node:
+            return node.id
+    return None
+
+
+@event.listens_for(Item, 'before_insert')
+def _item_before_insert(mapper, connection, target):
+    if target.is_temporary:
+        target.location_node_id = None
+    elif target.drawer_id or target.furniture_id or target.zone_id:
+        target.location_node_id = resolve_item_node_id(connection, target)
+
+
+@event.listens_for(Item, 'before_update')
+def _item_before_update(mapper, connection, target):
+    state = db.inspect(target)
+    if any(state.attrs[attr].history.has_changes() for attr in ('zone_id', 'furniture_id', 'drawer_id', 'is_temporary')):
+        _item_before_insert(mapper, connection, target)
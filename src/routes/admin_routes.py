@@ -7,6 +7,7 @@ from src.models.borrow import Borrow
 from src.models.location import Zone, Furniture, Drawer
 from config.database import save_config as save_db_config, get_postgres_config_values, DB_TYPE
 from config.app_config import get_app_config_values, save_app_config_value
+from src.services.usage_tracker import usage_report, operation_totals, daily_quota
 
 # Note: La classe ItemTempo n'est plus utilisée après la refactorisation
 
@@ -461,3 +462,20 @@ def inventory_voice_admin():
     Page d'administration pour la reconnaissance vocale d'inventaire
     """
     return render_template('admin/inventory_voice.html')
+
+# Consommation de l'API d'IA
+@admin_bp.route('/ai-usage')
+def ai_usage_report():
+    """
+    Rapport de consommation de l'API d'IA par jour et par utilisateur (format JSON avec ?format=json)
+    """
+    days = request.args.get('days', 30, type=int)
+    days = min(max(days, 1), 365)
+    report = usage_report(days)
+    totals = operation_totals(days)
+    if request.args.get('format') == 'json':
+        return jsonify({'days': days, 'by_day_and_user': report, 'by_operation': totals})
+    return render_template(
+        'admin/ai_usage.html', report=report, totals=totals, days=days,
+        daily_quota=daily_quota.max_tokens
+    )
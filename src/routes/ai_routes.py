@@ -1,15 +1,139 @@
 """
 Routes unifiées pour les fonctionnalités d'IA et de reconnaissance vocale
 """
+import os
 import json
-from flask import Blueprint, request, jsonify, current_app, session # Ajout de session
+import time
+import shutil
+import logging
+import tempfile
+from flask import Blueprint, request, jsonify, current_app, session, url_for, Response # Ajout de session
+from werkzeug.datastructures import FileStorage
+from werkzeug.exceptions import RequestEntityTooLarge
 from src.services.ai_service import ai_service # ai_service est l'instance, AIService est la classe
 from src.services.ai_service import AIService # Import de la classe pour instanciation si nécessaire ailleurs
+from src.services.job_queue import job_queue, QueueFullError
+from src.services.resilience import ServiceUnavailableError
+from src.services.usage_tracker import current_user_id
+from src.services.inventory_index import inventory_index
+from src.services import chat_intents
+from src.services.metrics import metrics, StageTimings
 from src.models import db
 from src.models.item import Item # Item est déjà importé
 
 ai_bp = Blueprint('ai', __name__, url_prefix='/api/ai') # Ajout du préfixe d'URL
 
+# Taille au-delà de laquelle une copie d'upload (traitement asynchrone) déborde sur disque
+UPLOAD_SPOOL_SIZE = int(os.environ.get('AI_UPLOAD_SPOOL_SIZE', 1024 * 1024))
+
+# Nombre maximal d'enregistrements par requête de lot
+BATCH_MAX_CLIPS = int(os.environ.get('AI_BATCH_MAX_CLIPS', 10))
+
+# Détail des durées par étape dans l'en-tête Server-Timing des routes vocales
+SERVER_TIMING_ENABLED = os.environ.get('AI_SERVER_TIMING', 'false').lower() in ('1', 'true')
+
+
+@ai_bp.before_request
+def set_usage_user():
+    """Associe les appels à l'API d'IA de la requête à l'utilisateur connecté (journal et quota)"""
+    current_user_id.set(session.get('user_id'))
+
+
+@ai_bp.errorhandler(RequestEntityTooLarge)
+def handle_request_too_large(error):
+    """Upload refusé dès la lecture de l'en-tête Content-Length (MAX_CONTENT_LENGTH)"""
+    max_size = current_app.config.get('MAX_CONTENT_LENGTH')
+    return jsonify({
+        'error': f"Le fichier audio dépasse la taille maximale autorisée ({max_size // (1024 * 1024)} Mo)." if max_size else "Le fichier audio est trop volumineux.",
+        'error_type': 'payload_too_large'
+    }), 413
+
+
+def _classify_ai_error(error):
+    """Catégorise une erreur pour une meilleure gestion côté client"""
+    if isinstance(error, ServiceUnavailableError):
+        return error.error_type
+    error_message = str(error)
+    if "API OpenAI" in error_message or "service d'IA" in error_message:
+        return "ai_service_error"
+    if "fichier audio" in error_message:
+        return "audio_format_error"
+    return "server_error"
+
+
+def _service_unavailable_response(error):
+    """Réponse rapide lorsque le service d'IA est saturé ou indisponible (429/503 avec Retry-After)"""
+    response = jsonify({'error': str(error), 'error_type': error.error_type})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, error.status_code
+
+
+def _wants_async():
+    """Le client demande un traitement asynchrone via le champ (ou paramètre) 'async'"""
+    flag = request.form.get('async') or request.args.get('async') or 'false'
+    return flag.lower() in ('1', 'true')
+
+
+def _buffer_upload(audio_file):
+    """
+    Copie l'upload dans un tampon propre au travail: le flux de la requête n'est plus lisible une fois
+    la réponse envoyée. Le tampon reste en mémoire jusqu'à UPLOAD_SPOOL_SIZE puis déborde dans un
+    fichier temporaire anonyme (supprimé automatiquement, même en cas d'arrêt brutal).
+    """
+    buffer = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_SIZE)
+    shutil.copyfileobj(audio_file.stream, buffer)
+    buffer.seek(0)
+    return FileStorage(
+        stream=buffer,
+        filename=audio_file.filename,
+        content_type=audio_file.content_type
+    )
+
+
+def _run_audio_pipeline(**kwargs):
+    """Traite un fichier audio et retourne les données de réponse (articles et statistiques éventuelles)"""
+    stats = {}
+    response_data = {'items': ai_service.process_audio_file(stats=stats, **kwargs)}
+    if stats:
+        response_data['stats'] = stats
+    return response_data
+
+
+def _run_audio_batch_pipeline(clips):
+    """Traite un lot d'enregistrements d'inventaire et retourne les données de réponse"""
+    stats = {}
+    response_data = {'items': ai_service.process_audio_batch(clips, stats=stats)}
+    response_data['stats'] = stats
+    return response_data
+
+
+def _audio_response(response_data):
+    """Réponse JSON du traitement audio, avec l'en-tête Server-Timing si AI_SERVER_TIMING est activé"""
+    response = jsonify(response_data)
+    timings = response_data.get('stats', {}).get('timings')
+    if timings and SERVER_TIMING_ENABLED:
+        response.headers['Server-Timing'] = StageTimings.server_timing(timings)
+    return response
+
+
+def _enqueue_audio_job(kind, pipeline=_run_audio_pipeline, **kwargs):
+    """Place le traitement d'un fichier audio (ou d'un lot) dans la file et retourne la réponse 202"""
+    try:
+        job = job_queue.submit(
+            kind,
+            lambda: pipeline(**kwargs),
+            error_classifier=_classify_ai_error
+        )
+    except QueueFullError as e:
+        response = jsonify({'error': str(e), 'error_type': 'queue_full'})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 503
+
+    response_data = job.to_dict()
+    response_data['status_url'] = url_for('ai.get_job', job_id=job.id)
+    response_data['events_url'] = url_for('ai.job_events', job_id=job.id)
+    return jsonify(response_data), 202
+
 @ai_bp.route('/voice-recognition', methods=['POST']) # Suppression de /api/ du chemin
 def voice_recognition():
     """
@@ -27,39 +151,34 @@ def voice_recognition():
     temporary_only = request.form.get('temporary_only', 'false').lower() == 'true'
     current_app.logger.debug(f"[voice_recognition] temporary_only flag from form: {request.form.get('temporary_only')}, parsed as: {temporary_only}")
     
+    if _wants_async():
+        return _enqueue_audio_job(
+            'voice_recognition',
+            audio_file=_buffer_upload(audio_file),
+            audio_mime_type=audio_mime_type,
+            temporary_only=temporary_only
+        )
+    
     try:
         # Log du type MIME pour le débogage
-        current_app.logger.info(f"Utilisation du suffixe '{ai_service.getFileExtension(audio_mime_type)}' pour le mimeType '{audio_mime_type}' (base: '{audio_mime_type.split(';')[0] if ';' in audio_mime_type else audio_mime_type}')")
+        current_app.logger.debug(f"Utilisation du suffixe '{ai_service.getFileExtension(audio_mime_type)}' pour le mimeType '{audio_mime_type}' (base: '{audio_mime_type.split(';')[0] if ';' in audio_mime_type else audio_mime_type}')")
         
         # Utiliser le service AI pour traiter l'audio
-        items = ai_service.process_audio_file(audio_file, audio_mime_type=audio_mime_type, temporary_only=temporary_only)
-        
-        # Log détaillé du résultat pour le débogage
-        current_app.logger.info(f"Reconnaissance vocale réussie: {len(items)} articles identifiés")
-        
-        # Vérifier la structure des données
-        import json
-        current_app.logger.info(f"Structure des données: {json.dumps(items, indent=2)}")
+        response_data = _run_audio_pipeline(audio_file=audio_file, audio_mime_type=audio_mime_type, temporary_only=temporary_only)
         
-        # Vérifier que chaque article a un ID et un nom
-        for i, item in enumerate(items):
-            current_app.logger.info(f"Article {i}: id={item.get('id', 'MANQUANT')}, name={item.get('name', 'MANQUANT')}")
+        current_app.logger.info(f"Reconnaissance vocale réussie: {len(response_data['items'])} articles identifiés")
         
-        # Créer la réponse JSON
-        response_data = {'items': items}
-        current_app.logger.info(f"Réponse JSON finale: {json.dumps(response_data, indent=2)}")
+        # Détail complet uniquement en mode débogage (sérialisation évitée sinon)
+        if current_app.logger.isEnabledFor(logging.DEBUG):
+            current_app.logger.debug(f"Réponse JSON finale: {json.dumps(response_data, ensure_ascii=False)}")
         
-        return jsonify(response_data)
+        return _audio_response(response_data)
     
+    except ServiceUnavailableError as e:
+        return _service_unavailable_response(e)
     except Exception as e:
         error_message = str(e)
-        error_type = "server_error"
-        
-        # Catégoriser les erreurs pour une meilleure gestion côté client
-        if "API OpenAI" in error_message or "service d'IA" in error_message:
-            error_type = "ai_service_error"
-        elif "fichier audio" in error_message:
-            error_type = "audio_format_error"
+        error_type = _classify_ai_error(e)
         
         current_app.logger.error(f"Erreur dans voice_recognition: {error_message}", exc_info=True)
         return jsonify({
@@ -81,24 +200,65 @@ def inventory_voice_recognition():
     if audio_file.filename == '':
         return jsonify({'error': 'Nom de fichier audio invalide'}), 400
     
-    # Récupérer le contexte des emplacements
-    context = {}
-    if 'context' in request.form:
-        try:
-            context = json.loads(request.form['context'])
-        except:
-            pass
+    # Le contexte des emplacements est construit côté serveur (un éventuel champ 'context' est ignoré)
+    
+    if _wants_async():
+        return _enqueue_audio_job(
+            'inventory_voice',
+            audio_file=_buffer_upload(audio_file),
+            is_inventory=True,
+            audio_mime_type=audio_mime_type
+        )
     
     try:
         # Utiliser le service AI pour traiter l'audio avec contexte d'emplacements
-        items = ai_service.process_audio_file(audio_file, is_inventory=True, locations_context=context, audio_mime_type=audio_mime_type)
-        return jsonify({'items': items})
+        return _audio_response(_run_audio_pipeline(audio_file=audio_file, is_inventory=True, audio_mime_type=audio_mime_type))
     
+    except ServiceUnavailableError as e:
+        return _service_unavailable_response(e)
     except Exception as e:
         current_app.logger.error(f"Erreur dans inventory_voice_recognition: {e}", exc_info=True)
         return jsonify({'error': str(e)}), 500
 
 
+@ai_bp.route('/inventory-voice/batch', methods=['POST'])
+def inventory_voice_batch():
+    """
+    Endpoint pour traiter plusieurs enregistrements d'inventaire en une requête (champs 'audio' répétés,
+    'mime_type' répété dans le même ordre si besoin) et retourner la liste fusionnée des articles
+    """
+    audio_files = [audio_file for audio_file in request.files.getlist('audio') if audio_file.filename]
+    if not audio_files:
+        return jsonify({'error': 'Aucun fichier audio n\'a été fourni'}), 400
+    if len(audio_files) > BATCH_MAX_CLIPS:
+        return jsonify({
+            'error': f"Trop d'enregistrements dans le lot ({len(audio_files)}, maximum {BATCH_MAX_CLIPS}).",
+            'error_type': 'too_many_clips'
+        }), 400
+    
+    mime_types = request.form.getlist('mime_type') or request.form.getlist('mimeType')
+    clips = [
+        (audio_file, (mime_types[index] if index < len(mime_types) else None) or audio_file.mimetype or 'audio/webm')
+        for index, audio_file in enumerate(audio_files)
+    ]
+    
+    if _wants_async():
+        return _enqueue_audio_job(
+            'inventory_voice_batch',
+            pipeline=_run_audio_batch_pipeline,
+            clips=[(_buffer_upload(audio_file), mime_type) for audio_file, mime_type in clips]
+        )
+    
+    try:
+        return _audio_response(_run_audio_batch_pipeline(clips))
+    
+    except ServiceUnavailableError as e:
+        return _service_unavailable_response(e)
+    except Exception as e:
+        current_app.logger.error(f"Erreur dans inventory_voice_batch: {e}", exc_info=True)
+        return jsonify({'error': str(e), 'error_type': _classify_ai_error(e)}), 500
+
+
 @ai_bp.route('/chat/inventory', methods=['POST'])
 def handle_inventory_chat():
     if 'user_id' not in session:
@@ -115,10 +275,143 @@ def handle_inventory_chat():
 
     # ai_service est déjà l'instance de AIService importée au niveau du module
     try:
-        all_items = Item.query.all() # Item est déjà importé
-        ai_response_text = ai_service.get_inventory_chat_response(all_items, user_query)
+        started = time.monotonic()
+        # "Où est X ?", "Qui a emprunté X ?", "Combien de Y ?": réponse directe depuis la base
+        local_answer = chat_intents.answer(user_query)
+        if local_answer is not None:
+            metrics.observe('ai_chat.local.seconds', time.monotonic() - started)
+            return jsonify({'response': local_answer})
+
+        # Seuls les articles pertinents (et un résumé par zone) sont transmis au modèle
+        context = inventory_index.retrieve(user_query)
+        ai_response_text = ai_service.get_inventory_chat_response(
+            context.items, user_query, zone_summaries=context.zone_summaries,
+            total_items=context.total_items, inventory_version=context.version
+        )
+        metrics.observe('ai_chat.llm.seconds', time.monotonic() - started)
         return jsonify({'response': ai_response_text})
 
+    except ServiceUnavailableError as e:
+        return _service_unavailable_response(e)
     except Exception as e:
         current_app.logger.error(f"Erreur lors de l'appel à AIService pour le chat: {e}", exc_info=True)
         return jsonify({'error': f'Erreur du service IA: {str(e)}'}), 500
+
+
+def _sse_event(event, payload):
+    """Formate un événement Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+@ai_bp.route('/chat/inventory/stream', methods=['POST'])
+def stream_inventory_chat():
+    """
+    Variante en flux du chat inventaire: relaie les fragments de la réponse en Server-Sent Events
+    (événements 'delta', puis 'done' ou 'error'). /chat/inventory reste disponible pour les anciens clients.
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'Authentification requise'}), 401
+
+    data = request.get_json()
+    if not data or not data.get('query'):
+        return jsonify({'error': 'La requête ne peut pas être vide'}), 400
+
+    started = time.monotonic()
+    try:
+        local_answer = chat_intents.answer(data['query'])
+        if local_answer is not None:
+            metrics.observe('ai_chat.local.seconds', time.monotonic() - started)
+            return Response(
+                _sse_event('delta', {'content': local_answer}) + _sse_event('done', {}),
+                mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'}
+            )
+
+        context = inventory_index.retrieve(data['query'])
+        deltas = ai_service.stream_inventory_chat_response(
+            context.items, data['query'], zone_summaries=context.zone_summaries,
+            total_items=context.total_items, inventory_version=context.version
+        )
+    except ServiceUnavailableError as e:
+        return _service_unavailable_response(e)
+    except Exception as e:
+        current_app.logger.error(f"Erreur lors de l'appel à AIService pour le chat en flux: {e}", exc_info=True)
+        return jsonify({'error': f'Erreur du service IA: {str(e)}'}), 500
+
+    logger = current_app.logger
+
+    def generate():
+        try:
+            for content in deltas:
+                yield _sse_event('delta', {'content': content})
+            metrics.observe('ai_chat.llm.seconds', time.monotonic() - started)
+            yield _sse_event('done', {})
+        except Exception as e:
+            logger.error(f"Flux du chat interrompu: {e}", exc_info=True)
+            yield _sse_event('error', {'error': f'Erreur du service IA: {str(e)}'})
+
+    return Response(generate(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@ai_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Retourne l'état (et le résultat une fois terminé) d'un travail asynchrone
+    """
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({'error': 'Travail introuvable ou expiré'}), 404
+    return jsonify(job.to_dict())
+
+
+@ai_bp.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """
+    Flux Server-Sent Events: envoie l'état du travail jusqu'à sa fin
+    """
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({'error': 'Travail introuvable ou expiré'}), 404
+
+    def generate():
+        last_status = None
+        last_sent = time.monotonic()
+        while True:
+            finished = job.wait(timeout=1)
+            if job.status != last_status:
+                last_status = job.status
+                event = job.status if finished else 'status'
+                yield _sse_event(event, job.to_dict())
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= 15:
+                yield ": keep-alive\n\n"
+                last_sent = time.monotonic()
+            if finished:
+                break
+
+    return Response(generate(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@ai_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Expose les métriques en mémoire du processus (file de travaux, appels IA...)
+    """
+    return jsonify(metrics.snapshot())
+
+
+@ai_bp.route('/health', methods=['GET'])
+def get_health():
+    """
+    Etat du service d'IA: disjoncteur, appels en cours par opération et file de travaux.
+    Répond 503 tant que le disjoncteur est ouvert.
+    """
+    breaker = ai_service.breaker.to_dict()
+    status = {'closed': 'ok', 'half_open': 'degraded'}.get(breaker['state'], 'unavailable')
+    health = {
+        'status': status,
+        'api_key_configured': bool(ai_service.api_key),
+        'circuit_breaker': breaker,
+        'bulkheads': {operation: bulkhead.to_dict() for operation, bulkhead in ai_service.bulkheads.items()},
+        'job_queue': {'pending': job_queue.pending, 'max_pending': job_queue.max_pending},
+    }
+    return jsonify(health), 503 if status == 'unavailable' else 200
@@ -1,8 +1,10 @@
 from flask import Blueprint, request, jsonify, render_template
 from src.models import db
 from src.models.location import Zone, Furniture, Drawer
+from src.models.location_node import LocationNode
 from src.models.item import Item
 from sqlalchemy.exc import IntegrityError
+from src.services import location_hierarchy
 
 location_bp = Blueprint('location', __name__, url_prefix='/api/location')
 
@@ -274,3 +276,67 @@ def api_delete_drawer(drawer_id):
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
+
+# API pour la hiérarchie générique (profondeur arbitraire)
+def _serialize_node(node):
+    return {
+        'id': node.id,
+        'name': node.name,
+        'kind': node.kind,
+        'parent_id': node.parent_id,
+        'path': node.path,
+        'depth': node.depth
+    }
+
+@location_bp.route('/nodes', methods=['GET', 'POST'])
+def api_nodes():
+    if request.method == 'GET':
+        parent_id = request.args.get('parent_id', type=int)
+        query = LocationNode.query.filter_by(parent_id=parent_id) if parent_id else LocationNode.query.filter(LocationNode.parent_id.is_(None))
+        return jsonify([_serialize_node(node) for node in query.order_by(LocationNode.name).all()])
+
+    data = request.json or {}
+    name = (data.get('name') or '').strip()
+    parent_id = data.get('parent_id')
+
+    if not name:
+        return jsonify({'error': 'Le nom de l\'emplacement est requis'}), 400
+
+    parent = None
+    if parent_id:
+        parent = db.session.get(LocationNode, parent_id)
+        if not parent:
+            return jsonify({'error': 'Emplacement parent non trouvé'}), 404
+
+    try:
+        node = location_hierarchy.create_node(name, parent=parent, kind=data.get('kind') or 'node')
+        db.session.commit()
+        return jsonify(_serialize_node(node))
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@location_bp.route('/nodes/<int:node_id>', methods=['GET'])
+def api_node(node_id):
+    node = db.session.get(LocationNode, node_id)
+    if not node:
+        return jsonify({'error': 'Emplacement non trouvé'}), 404
+
+    result = _serialize_node(node)
+    result['breadcrumb'] = [_serialize_node(ancestor) for ancestor in location_hierarchy.breadcrumb(node)]
+    result['label'] = ' > '.join(ancestor['name'] for ancestor in result['breadcrumb'])
+    result['item_count'] = location_hierarchy.subtree_item_count(node)
+    return jsonify(result)
+
+@location_bp.route('/nodes/<int:node_id>/items', methods=['GET'])
+def api_node_items(node_id):
+    node = db.session.get(LocationNode, node_id)
+    if not node:
+        return jsonify({'error': 'Emplacement non trouvé'}), 404
+
+    items = location_hierarchy.subtree_items_query(node).order_by(Item.name).all()
+    return jsonify([{
+        'id': item.id,
+        'name': item.name,
+        'location_node_id': item.location_node_id
+    } for item in items])
@@ -9,26 +9,19 @@ from src.models import db
 from src.models.user import User
 from src.models.item import Item
 from src.models.borrow import Borrow
+from src.services.inventory_cache import inventory_version
+from src.services.single_flight import SingleFlight, fingerprint
 
 # Création du blueprint
 reports_bp = Blueprint('reports', __name__)
 
-# Export de la liste des articles en CSV
-@reports_bp.route('/export_items_csv')
-def export_items_csv():
-    """
-    Exporte la liste des articles au format CSV
-    """
-    if 'user_id' not in session:
-        flash('Veuillez vous connecter', 'danger')
-        return redirect(url_for('main.index'))
-    
-    # Accès ouvert à tous les utilisateurs
-    # Accès autorisé pour tous les utilisateurs
-    if False:
-        flash('Vous n\'êtes pas autorisé à accéder à cette page', 'danger')
-        return redirect(url_for('main.dashboard'))
-    
+# Exports demandés simultanément pour la même version de l'inventaire: un seul rendu partagé
+_items_csv_flight = SingleFlight('items_csv')
+_all_items_pdf_flight = SingleFlight('all_items_pdf')
+
+
+def _items_csv():
+    """Contenu CSV de la liste des articles"""
     # Récupérer tous les articles
     items = db.session.query(Item).order_by(Item.name).all()
     
@@ -49,11 +42,29 @@ def export_items_csv():
             item.niveau_tiroir or '',
             'Oui' if item.is_temporary else 'Non'
         ])
+    return output.getvalue()
+
+# Export de la liste des articles en CSV
+@reports_bp.route('/export_items_csv')
+def export_items_csv():
+    """
+    Exporte la liste des articles au format CSV
+    """
+    if 'user_id' not in session:
+        flash('Veuillez vous connecter', 'danger')
+        return redirect(url_for('main.index'))
+    
+    # Accès ouvert à tous les utilisateurs
+    # Accès autorisé pour tous les utilisateurs
+    if False:
+        flash('Vous n\'êtes pas autorisé à accéder à cette page', 'danger')
+        return redirect(url_for('main.dashboard'))
+    
+    csv_content = _items_csv_flight.do(fingerprint('items_csv', inventory_version.value), _items_csv)
     
     # Préparer la réponse
-    output.seek(0)
     return Response(
-        output,
+        csv_content,
         mimetype="text/csv",
         headers={"Content-Disposition": f"attachment;filename=articles_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"}
     )
@@ -158,6 +169,57 @@ def generate_pdf():
         flash(f'Erreur lors de la génération du PDF: {str(e)}', 'danger')
         return redirect(url_for('main.dashboard'))
 
+def _all_items_pdf():
+    """Contenu PDF de la liste de tout le matériel"""
+    items = Item.query.order_by(Item.name).all()
+
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_auto_page_break(auto=True, margin=15)
+
+    # Titre
+    pdf.set_font('Arial', 'B', 16)
+    pdf.cell(0, 10, 'Liste de Tout le Matériel', 0, 1, 'C')
+    pdf.set_font('Arial', '', 10)
+    pdf.cell(0, 10, f'Date de génération: {datetime.now().strftime("%d/%m/%Y %H:%M:%S")}', 0, 1, 'C')
+    pdf.ln(10)
+
+    if not items:
+        pdf.set_font('Arial', '', 12)
+        pdf.cell(0, 10, 'Aucun article trouvé.', 0, 1)
+    else:
+        # En-têtes de tableau
+        pdf.set_font('Arial', 'B', 10)
+        header_height = 7
+        col_widths = {'id': 15, 'name': 60, 'location': 70, 'type': 25, 'created_at': 25}
+
+        pdf.cell(col_widths['id'], header_height, 'ID', 1, 0, 'C')
+        pdf.cell(col_widths['name'], header_height, 'Nom', 1, 0, 'C')
+        pdf.cell(col_widths['location'], header_height, 'Emplacement', 1, 0, 'C')
+        pdf.cell(col_widths['type'], header_height, 'Type', 1, 0, 'C')
+        pdf.cell(col_widths['created_at'], header_height, 'Créé le', 1, 1, 'C')
+
+        # Données du tableau
+        pdf.set_font('Arial', '', 9)
+        row_height = 6
+        for item in items:
+            item_type = "Temporaire" if item.is_temporary else "Permanent"
+            created_date = item.created_at.strftime("%d/%m/%y") if item.created_at else "N/A"
+            location_text = item.location_info if item.location_info else "N/A"
+
+            # Utilisation de cell au lieu de multi_cell pour la simplicité et la cohérence
+            # Le texte long sera coupé par FPDF. Une gestion plus avancée du texte nécessiterait des calculs de largeur de texte.
+            pdf.cell(col_widths['id'], row_height, str(item.id), 1, 0, 'C')
+            pdf.cell(col_widths['name'], row_height, item.name, 1, 0, 'L')
+            pdf.cell(col_widths['location'], row_height, location_text, 1, 0, 'L')
+            pdf.cell(col_widths['type'], row_height, item_type, 1, 0, 'C')
+            pdf.cell(col_widths['created_at'], row_height, created_date, 1, 1, 'C') # ln=1 pour la dernière cellule de la ligne
+
+    # Générer le PDF en mémoire (PyFPDF renvoie une chaîne latin-1, fpdf2 des octets)
+    content = pdf.output(dest='S')
+    return content.encode('latin-1') if isinstance(content, str) else bytes(content)
+
+
 @reports_bp.route('/all_items_pdf')
 def generate_all_items_pdf():
     """Génère un PDF listant tous les articles (matériel)."""
@@ -165,70 +227,15 @@ def generate_all_items_pdf():
         flash('Veuillez vous connecter pour accéder à cette fonctionnalité.', 'warning')
         return redirect(url_for('main.login')) # Ou une autre page de login appropriée
     try:
-        items = Item.query.order_by(Item.name).all()
-
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_auto_page_break(auto=True, margin=15)
-
-        # Titre
-        pdf.set_font('Arial', 'B', 16)
-        pdf.cell(0, 10, 'Liste de Tout le Matériel', 0, 1, 'C')
-        pdf.set_font('Arial', '', 10)
-        pdf.cell(0, 10, f'Date de génération: {datetime.now().strftime("%d/%m/%Y %H:%M:%S")}', 0, 1, 'C')
-        pdf.ln(10)
-
-        if not items:
-            pdf.set_font('Arial', '', 12)
-            pdf.cell(0, 10, 'Aucun article trouvé.', 0, 1)
-        else:
-            # En-têtes de tableau
-            pdf.set_font('Arial', 'B', 10)
-            header_height = 7
-            col_widths = {'id': 15, 'name': 60, 'location': 70, 'type': 25, 'created_at': 25}
-            
-            pdf.cell(col_widths['id'], header_height, 'ID', 1, 0, 'C')
-            pdf.cell(col_widths['name'], header_height, 'Nom', 1, 0, 'C')
-            pdf.cell(col_widths['location'], header_height, 'Emplacement', 1, 0, 'C')
-            pdf.cell(col_widths['type'], header_height, 'Type', 1, 0, 'C')
-            pdf.cell(col_widths['created_at'], header_height, 'Créé le', 1, 1, 'C')
-
-            # Données du tableau
-            pdf.set_font('Arial', '', 9)
-            row_height = 6
-            for item in items:
-                item_type = "Temporaire" if item.is_temporary else "Permanent"
-                created_date = item.created_at.strftime("%d/%m/%y") if item.created_at else "N/A"
-                location_text = item.location_info if item.location_info else "N/A"
-
-                # Utilisation de cell au lieu de multi_cell pour la simplicité et la cohérence
-                # Le texte long sera coupé par FPDF. Une gestion plus avancée du texte nécessiterait des calculs de largeur de texte.
-                pdf.cell(col_widths['id'], row_height, str(item.id), 1, 0, 'C')
-                pdf.cell(col_widths['name'], row_height, item.name, 1, 0, 'L')
-                pdf.cell(col_widths['location'], row_height, location_text, 1, 0, 'L')
-                pdf.cell(col_widths['type'], row_height, item_type, 1, 0, 'C')
-                pdf.cell(col_widths['created_at'], row_height, created_date, 1, 1, 'C') # ln=1 pour la dernière cellule de la ligne
-
-        # Générer le PDF dans un fichier temporaire
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp:
-            pdf_path = tmp.name
-            pdf.output(pdf_path)
+        pdf_content = _all_items_pdf_flight.do(fingerprint('all_items_pdf', inventory_version.value), _all_items_pdf)
 
         # Envoyer le fichier PDF au client
-        response = send_file(
-            pdf_path,
+        return send_file(
+            io.BytesIO(pdf_content),
             mimetype='application/pdf',
             as_attachment=True,
             download_name=f'liste_materiel_{datetime.now().strftime("%Y%m%d")}.pdf'
         )
-        # Nettoyage après l'envoi (nécessaire sur certains systèmes)
-        @response.call_on_close
-        def cleanup_file():
-            try:
-                os.unlink(pdf_path)
-            except Exception as e_clean:
-                current_app.logger.error(f"Erreur lors du nettoyage du fichier PDF temporaire {pdf_path}: {e_clean}")
-        return response
 
     except Exception as e:
         current_app.logger.error(f'Erreur lors de la génération du PDF de tous les articles: {e}', exc_info=True)
@@ -0,0 +1,165 @@
+"""
+Schémas des réponses structurées de l'API d'IA.
+Les appels d'extraction et de comparaison imposent un schéma JSON strict (`response_format`),
+puis la réponse est lue en une seule passe validée vers de petits enregistrements typés.
+Une réponse ou un enregistrement non conforme est compté (`ai_schema.<schéma>.violations`) et écarté.
+"""
+import json
+import logging
+from src.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_NULLABLE_ID = {'type': ['integer', 'null']}
+
+
+def _object(properties):
+    """Objet strict: toutes les propriétés requises, aucune propriété supplémentaire"""
+    return {
+        'type': 'object',
+        'properties': properties,
+        'required': list(properties),
+        'additionalProperties': False,
+    }
+
+
+def _list_of(key, item_schema):
+    # Le schéma racine d'une réponse structurée doit être un objet
+    return _object({key: {'type': 'array', 'items': item_schema}})
+
+
+ITEMS_SCHEMA = _list_of('items', _object({'name': {'type': 'string'}}))
+
+LOCATED_ITEMS_SCHEMA = _list_of('items', _object({
+    'name': {'type': 'string'},
+    'zone_id': _NULLABLE_ID,
+    'furniture_id': _NULLABLE_ID,
+    'drawer_id': _NULLABLE_ID,
+}))
+
+COMPARISON_SCHEMA = _list_of('matched_items', _object({
+    'original_name': {'type': 'string'},
+    'is_conventional': {'type': 'boolean'},
+    'db_id': _NULLABLE_ID,
+    'db_name': {'type': ['string', 'null']},
+}))
+
+
+class SchemaViolationError(ValueError):
+    """Réponse de l'IA non conforme au schéma attendu"""
+
+
+def _name(value):
+    if not isinstance(value, str) or not value.strip():
+        raise SchemaViolationError(f"nom invalide: {value!r}")
+    name = value.strip()
+    return name[0].upper() + name[1:]
+
+
+def _optional_id(value):
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise SchemaViolationError(f"identifiant invalide: {value!r}")
+    return value
+
+
+class ExtractedItem:
+    """Article extrait d'une transcription"""
+    __slots__ = ('name',)
+
+    def __init__(self, data):
+        self.name = _name(data.get('name'))
+
+    def to_dict(self, item_id):
+        return {'id': item_id, 'name': self.name}
+
+
+class LocatedItem:
+    """Article extrait avec les identifiants d'emplacement proposés (à valider par LocationContext)"""
+    __slots__ = ('name', 'zone_id', 'furniture_id', 'drawer_id')
+
+    def __init__(self, data):
+        self.name = _name(data.get('name'))
+        self.zone_id = _optional_id(data.get('zone_id'))
+        self.furniture_id = _optional_id(data.get('furniture_id'))
+        self.drawer_id = _optional_id(data.get('drawer_id'))
+
+    def to_dict(self, item_id):
+        return {
+            'id': item_id, 'name': self.name,
+            'zone_id': self.zone_id, 'furniture_id': self.furniture_id, 'drawer_id': self.drawer_id,
+        }
+
+
+class ComparisonMatch:
+    """Verdict de l'IA pour un nom dicté ambigu"""
+    __slots__ = ('original_name', 'is_conventional', 'db_id')
+
+    def __init__(self, data):
+        if not isinstance(data.get('original_name'), str) or not isinstance(data.get('is_conventional'), bool):
+            raise SchemaViolationError(f"correspondance invalide: {data!r}")
+        self.original_name = data['original_name']
+        self.is_conventional = data['is_conventional']
+        self.db_id = _optional_id(data.get('db_id'))
+
+
+class ResponseSchema:
+    """Schéma JSON d'une réponse et type des enregistrements de sa liste"""
+
+    def __init__(self, name, schema, key, record_type):
+        self.name = name
+        self.schema = schema
+        self.key = key
+        self.record_type = record_type
+
+    def response_format(self, strict=True):
+        """Paramètre `response_format` de l'appel (mode JSON simple si les sorties structurées sont désactivées)"""
+        if not strict:
+            return {'type': 'json_object'}
+        return {'type': 'json_schema', 'json_schema': {'name': self.name, 'strict': True, 'schema': self.schema}}
+
+    def _violation(self, message):
+        metrics.increment(f'ai_schema.{self.name}.violations')
+        logger.warning(f"Réponse non conforme au schéma {self.name}: {message}")
+
+    def parse(self, response_json):
+        """
+        Lit les enregistrements d'une réponse de complétion
+
+        Returns:
+            list: enregistrements conformes (les enregistrements invalides sont comptés et écartés)
+
+        Raises:
+            SchemaViolationError: si la réponse elle-même n'est pas conforme (refus, JSON invalide, liste absente)
+        """
+        try:
+            message = response_json['choices'][0]['message']
+        except (KeyError, IndexError, TypeError):
+            self._violation("aucun message dans la réponse")
+            raise SchemaViolationError("aucun message dans la réponse")
+        if message.get('refusal') or not message.get('content'):
+            self._violation(f"réponse vide ou refusée ({message.get('refusal')})")
+            raise SchemaViolationError("réponse vide ou refusée")
+        try:
+            entries = json.loads(message['content'])[self.key]
+            if not isinstance(entries, list):
+                raise TypeError(type(entries).__name__)
+        except (ValueError, KeyError, TypeError) as e:
+            self._violation(f"{e.__class__.__name__}: {e}")
+            raise SchemaViolationError(f"réponse non conforme au schéma {self.name}") from e
+
+        records = []
+        for entry in entries:
+            try:
+                if not isinstance(entry, dict):
+                    raise SchemaViolationError(f"entrée invalide: {entry!r}")
+                records.append(self.record_type(entry))
+            except SchemaViolationError as e:
+                self._violation(str(e))
+        return records
+
+
+EXTRACTION = ResponseSchema('extracted_items', ITEMS_SCHEMA, 'items', ExtractedItem)
+LOCATED_EXTRACTION = ResponseSchema('located_items', LOCATED_ITEMS_SCHEMA, 'items', LocatedItem)
+COMPARISON = ResponseSchema('item_comparison', COMPARISON_SCHEMA, 'matched_items', ComparisonMatch)
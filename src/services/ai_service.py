@@ -2,13 +2,33 @@
 Service centralisé pour toutes les interactions avec l'IA et la reconnaissance vocale
 """
 import os
+import copy
 import json
-import tempfile
+import time
 import requests
-import re
+import wave
 import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from src.models.item import Item  # Import du modèle Item pour la comparaison
+from flask import current_app, has_app_context
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from src.services import inventory_cache
+from src.services.inventory_cache import VersionedCache, ChatAnswerCache, normalize_question
+from src.services.item_matcher import item_matcher_cache, MatchResult, normalize_name
+from src.services.inventory_index import normalize_text
+from src.services.embedding_index import embedding_index, build_embedder
+from src.services.audio_preprocess import preprocess_wav, is_wav
+from src.services.transcription_cache import transcription_cache, audio_key
+from src.services.location_context import get_location_context
+from src.services.local_extractor import extract_item_list
+from src.services import token_budget, ai_schemas
+from src.services.usage_tracker import usage_recorder, daily_quota, current_user_id, token_counts
+from src.services.async_gateway import build_gateway
+from src.services.single_flight import SingleFlight, fingerprint
+from src.services.resilience import Bulkhead, CircuitBreaker, OverloadedError, ServiceUnavailableError
+from src.services.metrics import metrics, StageTimings
 logger = logging.getLogger(__name__)
 if not logger.handlers:
     logging.basicConfig(level=logging.INFO)
@@ -17,6 +37,82 @@ if not logger.handlers:
 # Charger les variables d'environnement
 load_dotenv()
 
+# Racine de l'API par défaut, remplacée par OPENAI_BASE_URL
+DEFAULT_BASE_URL = 'https://api.openai.com/v1'
+
+# Délais (connexion, lecture) par type d'opération, en secondes.
+# Chaque délai de lecture peut être surchargé par AI_TIMEOUT_<OPERATION> (ex: AI_TIMEOUT_CHAT=90).
+DEFAULT_READ_TIMEOUTS = {
+    'transcription': 120,
+    'extraction': 45,
+    'comparison': 45,
+    'chat': 60,
+    'embedding': 30,
+}
+
+# Codes HTTP pour lesquels une nouvelle tentative est effectuée (limitation de débit et erreurs serveur)
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+def _env_float(name, default):
+    """Lit une variable d'environnement numérique, avec repli sur la valeur par défaut"""
+    try:
+        return float(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        logger.warning("Valeur invalide pour %s, utilisation de %s", name, default)
+        return float(default)
+
+
+def submit_in_context(executor, func, *args, **kwargs):
+    """
+    Soumet `func` à un pool de threads avec les variables de contexte de l'appelant (utilisateur courant...)
+    et, si l'appelant est dans une application Flask, un contexte d'application propre au thread
+    (la session SQLAlchemy de la requête n'est jamais partagée entre threads)
+    """
+    app = current_app._get_current_object() if has_app_context() else None
+
+    def call():
+        if app is None:
+            return func(*args, **kwargs)
+        with app.app_context():
+            return func(*args, **kwargs)
+
+    return executor.submit(contextvars.copy_context().run, call)
+
+
+def build_http_session(pool_size=10, max_retries=3, backoff_factor=0.5):
+    """
+    Construit une session HTTP avec connexions persistantes (keep-alive) et
+    nouvelles tentatives à backoff exponentiel sur les codes 429/5xx.
+    L'en-tête Retry-After renvoyé par l'API est respecté.
+    """
+    retry = Retry(
+        total=max_retries,
+        connect=max_retries,
+        read=0,  # Ne pas renvoyer une requête dont le traitement a pu commencer côté API
+        status=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset(['POST']),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+# Consignes fixes du chat inventaire, placées en tête du prompt pour que son préfixe reste stable
+INVENTORY_CHAT_INSTRUCTIONS = (
+    "Tu es un assistant IA expert en gestion d'inventaire. "
+    "Réponds aux questions de l'utilisateur concernant la liste du matériel fournie ci-dessous. "
+    "Utilise le format Markdown pour structurer tes réponses lorsque c'est pertinent (par exemple, listes à puces, texte en gras, italique). "
+    "Sois clair et concis."
+)
+
+
 class AIService:
     """
     Service qui encapsule toutes les interactions avec l'API OpenAI
@@ -25,13 +121,83 @@ class AIService:
     
     def __init__(self):
         self.api_key = os.environ.get('OPENAI_API_KEY')
-        self.transcription_url = 'https://api.openai.com/v1/audio/transcriptions'
-        self.completion_url = 'https://api.openai.com/v1/chat/completions'
+        # Racine de l'API (serveur compatible OpenAI, ou bouchon local tools/openai_stub.py pour les mesures)
+        self.base_url = (os.environ.get('OPENAI_BASE_URL') or DEFAULT_BASE_URL).rstrip('/')
+        self.transcription_url = f'{self.base_url}/audio/transcriptions'
+        self.completion_url = f'{self.base_url}/chat/completions'
+        self.embedding_url = f'{self.base_url}/embeddings'
         transcription_model = os.environ.get('OPENAI_TRANSCRIPTION_MODEL')
         completion_model = os.environ.get('OPENAI_COMPLETION_MODEL')
         self.model_transcription = transcription_model.strip() if transcription_model and transcription_model.strip() else 'gpt-4o-transcribe'
         self.model_completion = completion_model.strip() if completion_model and completion_model.strip() else 'gpt-4o-mini'
         
+        # Session HTTP partagée: réutilise les connexions TLS entre les appels successifs d'une requête vocale
+        self.http = build_http_session(
+            pool_size=int(_env_float('AI_HTTP_POOL_SIZE', 10)),
+            max_retries=int(_env_float('AI_HTTP_MAX_RETRIES', 3)),
+            backoff_factor=_env_float('AI_HTTP_BACKOFF', 0.5),
+        )
+        # Passerelle asynchrone optionnelle (httpx): les appels non diffusés en flux sont multiplexés
+        # sur une boucle d'événements dédiée au lieu d'occuper chacun une connexion du pool synchrone
+        self.gateway = None
+        if os.environ.get('AI_ASYNC_GATEWAY', 'false').lower() in ('1', 'true'):
+            self.gateway = build_gateway(
+                max_connections=int(_env_float('AI_GATEWAY_MAX_CONNECTIONS', 100)),
+                max_keepalive=int(_env_float('AI_GATEWAY_MAX_KEEPALIVE', 20)),
+                max_retries=int(_env_float('AI_HTTP_MAX_RETRIES', 3)),
+                backoff_factor=_env_float('AI_HTTP_BACKOFF', 0.5),
+            )
+        # Appels identiques simultanés regroupés (chat, comparaison des articles dictés)
+        self._chat_flight = SingleFlight('chat')
+        self._compare_flight = SingleFlight('compare_items')
+        # Contexte d'inventaire du chat, mis en cache par version de l'inventaire
+        self._inventory_context_cache = VersionedCache('inventory_context')
+        # Réponses du chat pour les questions répétées (invalidées à chaque nouvelle version de l'inventaire)
+        self.chat_answer_cache = ChatAnswerCache(
+            max_size=int(_env_float('AI_CHAT_CACHE_SIZE', 256)),
+            ttl=_env_float('AI_CHAT_CACHE_TTL', 600),
+        )
+        
+        connect_timeout = _env_float('AI_CONNECT_TIMEOUT', 5)
+        self.timeouts = {
+            operation: (connect_timeout, _env_float(f'AI_TIMEOUT_{operation.upper()}', read_timeout))
+            for operation, read_timeout in DEFAULT_READ_TIMEOUTS.items()
+        }
+        # Nombre maximal d'appels simultanés par opération (AI_MAX_CONCURRENT_<OPERATION>) et attente bornée
+        bulkhead_wait = _env_float('AI_BULKHEAD_WAIT', 2)
+        default_concurrency = _env_float('AI_MAX_CONCURRENT', 8)
+        self.bulkheads = {
+            operation: Bulkhead(
+                operation,
+                max_concurrent=int(_env_float(f'AI_MAX_CONCURRENT_{operation.upper()}', default_concurrency)),
+                max_wait=bulkhead_wait
+            )
+            for operation in DEFAULT_READ_TIMEOUTS
+        }
+        # Disjoncteur commun à toutes les opérations (elles dépendent de la même API)
+        self.breaker = CircuitBreaker(
+            'openai',
+            failure_threshold=int(_env_float('AI_BREAKER_FAILURES', 5)),
+            window=_env_float('AI_BREAKER_WINDOW', 60),
+            reset_timeout=_env_float('AI_BREAKER_RESET', 30),
+        )
+        
+        # Prétraitement des enregistrements WAV (silences, mono, 16 kHz) avant transcription
+        self.audio_preprocess = os.environ.get('AI_AUDIO_PREPROCESS', 'false').lower() in ('1', 'true')
+        
+        # Extraction locale des listes d'articles simples; l'IA n'est appelée qu'en dessous du seuil de confiance
+        self.local_extraction = os.environ.get('AI_LOCAL_EXTRACTION', 'true').lower() in ('1', 'true')
+        self.local_extraction_min_confidence = _env_float('AI_LOCAL_EXTRACTION_MIN_CONFIDENCE', 0.8)
+        
+        # Lots d'enregistrements: transcriptions en parallèle, extraction combinée tant que les textes restent courts
+        self.batch_workers = max(1, int(_env_float('AI_BATCH_WORKERS', 4)))
+        
+        # Réponses structurées (schéma JSON strict) pour l'extraction et la comparaison; 'false' pour le mode JSON simple
+        self.structured_outputs = os.environ.get('AI_STRUCTURED_OUTPUTS', 'true').lower() in ('1', 'true')
+        
+        # Index vectoriel des noms d'articles: 'hashing' (local, par défaut), 'openai' ou 'none'
+        embedding_index.configure(build_embedder(os.environ.get('AI_EMBEDDING_BACKEND', 'hashing'), post=self._post_embeddings))
+        
     def getFileExtension(self, mime_type):
         """
         Retourne l'extension de fichier appropriée pour un type MIME donné
@@ -66,13 +232,125 @@ class AIService:
             raise ValueError("Clé API OpenAI non configurée")
         return True
     
-    def transcribe_audio(self, audio_file_path, audio_mime_type='audio/webm'):
+    def _post(self, operation, url, **kwargs):
+        """
+        Envoie une requête POST via la session partagée avec les délais propres à l'opération.
+        L'appel occupe un emplacement du cloisonnement de l'opération jusqu'à la réception de la réponse
+        (en-têtes seulement pour une requête en flux).
+        
+        Args:
+            operation (str): Type d'opération ('transcription', 'extraction', 'comparison', 'chat', 'embedding')
+            url (str): URL de l'API
+            
+        Returns:
+            requests.Response: Réponse HTTP (après d'éventuelles nouvelles tentatives)
+            
+        Raises:
+            OverloadedError: Si trop d'appels de cette opération sont déjà en cours
+            CircuitOpenError: Si le disjoncteur est ouvert (API considérée comme indisponible)
+        """
+        kwargs.setdefault('timeout', self.timeouts[operation])
+        user_id = current_user_id.get()
+        daily_quota.check(user_id)
+        model = self._payload_model(kwargs)
+        # Le disjoncteur est consulté avant le cloisonnement: un appel refusé n'occupe aucun emplacement
+        self.breaker.before_call()
+        try:
+            with self.bulkheads[operation].slot():
+                started = time.monotonic()
+                try:
+                    if self.gateway is not None and not kwargs.get('stream'):
+                        response = self.gateway.post(url, **kwargs)
+                    else:
+                        response = self.http.post(url, **kwargs)
+                except Exception as e:
+                    self.breaker.record_failure(f"{operation}: {type(e).__name__}")
+                    usage_recorder.record(operation, model, latency=time.monotonic() - started, user_id=user_id)
+                    raise
+                # Seules les erreurs côté serveur comptent comme pannes; une limitation de débit (429) n'en est pas une
+                if response.status_code >= 500:
+                    self.breaker.record_failure(f"{operation}: HTTP {response.status_code}")
+                elif response.status_code == 429:
+                    self.breaker.release_call()
+                else:
+                    self.breaker.record_success()
+        except OverloadedError:
+            self.breaker.release_call()
+            raise
+        self._record_http_metrics(operation, response, streamed=kwargs.get('stream', False))
+        # L'appel est journalisé une fois les jetons connus (_read_json, fin du flux), immédiatement en cas d'erreur
+        response.usage_record = {
+            'operation': operation, 'model': model, 'status_code': response.status_code,
+            'latency': time.monotonic() - started, 'user_id': user_id,
+        }
+        if response.status_code >= 300:
+            self._record_usage(response)
+        return response
+
+    @staticmethod
+    def _payload_model(kwargs):
+        """Modèle demandé dans le corps de la requête (JSON ou multipart)"""
+        if isinstance(kwargs.get('json'), dict):
+            return kwargs['json'].get('model')
+        model = (kwargs.get('files') or {}).get('model')
+        return model[1] if isinstance(model, tuple) else model
+
+    def _record_usage(self, response, usage=None):
+        """Journalise l'appel (une seule fois) et décompte les jetons du quota de l'utilisateur"""
+        record = getattr(response, 'usage_record', None)
+        if record is None:
+            return
+        response.usage_record = None
+        usage_recorder.record(usage=usage, **record)
+        # Même total que le journal (les blocs de transcription n'ont que input_tokens/output_tokens)
+        _, _, total_tokens = token_counts(usage)
+        daily_quota.add(record['user_id'], total_tokens or 0)
+
+    def _record_http_metrics(self, operation, response, streamed=False):
+        """Enregistre la durée et la taille (requête et réponse) d'un appel à l'API"""
+        metrics.observe(f'ai_http.{operation}.seconds', response.elapsed.total_seconds())
+        request = response.request
+        body = request.body if request is not None else None
+        if body is not None and not hasattr(body, 'read'):
+            metrics.observe(f'ai_http.{operation}.request_bytes', len(body))
+        elif request is not None and str(request.headers.get('Content-Length', '')).isdigit():
+            metrics.observe(f'ai_http.{operation}.request_bytes', int(request.headers['Content-Length']))
+        # Le corps d'une réponse en flux n'est pas encore lu: seule la taille annoncée est disponible
+        content_length = response.headers.get('Content-Length')
+        if content_length and content_length.isdigit():
+            metrics.observe(f'ai_http.{operation}.response_bytes', int(content_length))
+        elif not streamed:
+            metrics.observe(f'ai_http.{operation}.response_bytes', len(response.content))
+
+    def _read_json(self, operation, response):
+        """Décode la réponse JSON et enregistre les jetons consommés (`usage`) dans les métriques"""
+        data = response.json()
+        usage = data.get('usage') if isinstance(data, dict) else None
+        if isinstance(usage, dict):
+            for key, value in usage.items():
+                if isinstance(value, int):
+                    metrics.observe(f'ai_usage.{operation}.{key}', value)
+        self._record_usage(response, usage)
+        return data
+    
+    def _post_embeddings(self, **kwargs):
+        """Appelle l'endpoint d'embeddings (utilisé par l'index vectoriel avec le backend 'openai')"""
+        self.validate_api_key()
+        headers = {'Authorization': f'Bearer {self.api_key}'}
+        response = self._post('embedding', self.embedding_url, headers=headers, **kwargs)
+        if response.status_code == 200:
+            # Lecture du bloc `usage` pour le journal (l'index relit ensuite les vecteurs)
+            self._read_json('embedding', response)
+        return response
+
+    def transcribe_audio(self, audio, audio_mime_type='audio/webm', filename=None):
         """
         Transcrit un fichier audio en texte en utilisant l'API Whisper d'OpenAI
         
         Args:
-            audio_file_path (str): Chemin vers le fichier audio
+            audio: Contenu audio (bytes, flux binaire ouvert) ou chemin vers un fichier audio
             audio_mime_type (str): Type MIME du fichier audio
+            filename (str): Nom transmis à l'API (son extension indique le format audio)
             
         Returns:
             str: Texte transcrit
@@ -82,29 +360,46 @@ class AIService:
         """
         self.validate_api_key()
         
+        if isinstance(audio, str):
+            with open(audio, 'rb') as audio_file:
+                return self.transcribe_audio(audio_file, audio_mime_type, filename=filename or os.path.basename(audio))
+        filename = filename or f"audio{self.getFileExtension(audio_mime_type)}"
+        
+        # Un enregistrement déjà transcrit (nouvelle tentative du navigateur) est servi depuis le cache
+        data = audio if isinstance(audio, bytes) else audio.read()
+        cache_key = audio_key(data, self.model_transcription) if transcription_cache.enabled else None
+        if cache_key:
+            cached_text = transcription_cache.get(cache_key)
+            if cached_text is not None:
+                logger.info(f"Transcription servie depuis le cache ({len(data)} octets audio)")
+                return cached_text
+        
         try:
-            with open(audio_file_path, 'rb') as audio_file:
-                headers = {'Authorization': f'Bearer {self.api_key}'}
-                
-                files = {
-                    'file': (os.path.basename(audio_file_path), audio_file, audio_mime_type),
-                    'model': (None, self.model_transcription)
-                }
-                
-                logging.info(f"Envoi d'un fichier audio pour transcription: {os.path.basename(audio_file_path)} (type: {audio_mime_type})")
-                response = requests.post(self.transcription_url, headers=headers, files=files)
-                
-                if response.status_code != 200:
-                    error_message = f"Erreur API OpenAI ({response.status_code}): {response.text}"
-                    logging.error(error_message)
-                    if response.status_code == 500:
-                        raise Exception("Erreur serveur OpenAI. Il s'agit d'un problème temporaire avec le service d'IA. Veuillez réessayer dans quelques instants.")
-                    else:
-                        raise Exception(f"Erreur lors de la transcription: {response.text}")
-                
-                transcription_result = response.json()
-                logging.info(f"Transcription réussie: {len(transcription_result.get('text', ''))} caractères")
-                return transcription_result.get('text', '')
+            headers = {'Authorization': f'Bearer {self.api_key}'}
+            
+            # Le contenu est placé directement dans le corps multipart, sans fichier intermédiaire
+            files = {
+                'file': (filename, data, audio_mime_type),
+                'model': (None, self.model_transcription)
+            }
+            
+            logging.info(f"Envoi d'un fichier audio pour transcription: {filename} (type: {audio_mime_type})")
+            response = self._post('transcription', self.transcription_url, headers=headers, files=files)
+            
+            if response.status_code != 200:
+                error_message = f"Erreur API OpenAI ({response.status_code}): {response.text}"
+                logging.error(error_message)
+                if response.status_code == 500:
+                    raise Exception("Erreur serveur OpenAI. Il s'agit d'un problème temporaire avec le service d'IA. Veuillez réessayer dans quelques instants.")
+                else:
+                    raise Exception(f"Erreur lors de la transcription: {response.text}")
+            
+            transcription_result = self._read_json('transcription', response)
+            logging.info(f"Transcription réussie: {len(transcription_result.get('text', ''))} caractères")
+            text = transcription_result.get('text', '')
+            if cache_key and text:
+                transcription_cache.put(cache_key, self.model_transcription, text, audio_bytes=len(data))
+            return text
         except requests.exceptions.RequestException as e:
             error_message = f"Erreur de connexion à l'API OpenAI: {str(e)}"
             logging.error(error_message)
@@ -114,6 +409,15 @@ class AIService:
                 logging.error(f"Erreur inattendue lors de la transcription: {str(e)}")
             raise
     
+    @staticmethod
+    def _is_known_item_name(name):
+        """Indique si un nom dicté correspond (même approximativement) à un article conventionnel"""
+        try:
+            return item_matcher_cache.get().match(name).status != MatchResult.NONE
+        except Exception as e:
+            logger.warning(f"Index de correspondance indisponible pour l'extraction locale: {e}")
+            return False
+
     def extract_items_from_text(self, text):
         """
         Extrait les noms d'articles à partir d'un texte
@@ -124,11 +428,21 @@ class AIService:
         Returns:
             list: Liste d'articles au format [{"id": 1, "name": "Nom Article"}]
         """
-        self.validate_api_key()
-        
         if not text:
             return []
         
+        # Une simple énumération ("marteau, tournevis et pince") est découpée localement, sans appel à l'IA
+        if self.local_extraction:
+            local = extract_item_list(text, is_known=self._is_known_item_name)
+            if local.confidence >= self.local_extraction_min_confidence:
+                metrics.increment('local_extractor.accepted')
+                logger.debug(f"Extraction locale (confiance {local.confidence:.2f}): {local.items}")
+                return local.items
+            metrics.increment('local_extractor.fallbacks')
+            logger.debug(f"Confiance de l'extraction locale insuffisante ({local.confidence:.2f}), appel à l'IA")
+        
+        self.validate_api_key()
+        
         headers = {
             'Authorization': f'Bearer {self.api_key}',
             'Content-Type': 'application/json'
@@ -147,92 +461,174 @@ class AIService:
                 {
                     'role': 'user',
                     'content': f'Voici la transcription d\'une commande vocale pour emprunter des articles: "{text}". '
-                              'Extrais les noms des articles mentionnés et retourne-les sous forme de liste JSON avec un ID unique '
-                              'et le nom de chaque article. Format attendu: [{"id": 1, "name": "nom de l\'article"}, ...]. '
+                              'Extrais les noms des articles mentionnés et retourne-les sous forme d\'objet JSON. '
+                              'Format attendu: {"items": [{"name": "nom de l\'article"}, ...]}. '
                               'Ne retourne que le JSON, sans aucun autre texte.'
                 }
-            ]
+            ],
+            'response_format': ai_schemas.EXTRACTION.response_format(self.structured_outputs)
         }
         
-        response = requests.post(self.completion_url, headers=headers, json=completion_payload)
+        response = self._post('extraction', self.completion_url, headers=headers, json=completion_payload)
         
         if response.status_code != 200:
             raise Exception(f"Erreur lors de l'analyse avec {self.model_completion}: {response.text}")
         
-        return self._parse_openai_response(response.json())
+        return self._parse_openai_response(self._read_json('extraction', response), ai_schemas.EXTRACTION)
     
-    def extract_items_with_locations(self, text, locations_context):
+    def extract_items_with_locations(self, text, location_context=None):
         """
         Extrait les articles avec leurs emplacements à partir d'un texte
         
         Args:
             text (str): Texte transcrit
-            locations_context (dict): Contexte des emplacements existants
+            location_context (LocationContext): Arborescence des emplacements
+                (par défaut, celle de la version courante de l'inventaire, construite côté serveur)
             
         Returns:
-            list: Liste d'articles avec leurs emplacements
+            list: Liste d'articles avec des emplacements validés
         """
         self.validate_api_key()
         
         logger.debug(f"Texte transcrit pour extraction d'inventaire: '{text}'")
-        logger.debug(f"Contexte des emplacements reçu: {locations_context}")
         
         if not text or len(text.strip()) < 3:
             logger.info("Texte trop court ou vide, aucun article à extraire")
             return []
         
-        if not text:
-            return []
-        
-        # Préparer le contexte pour l'analyse
-        zones_context = self._format_zones_context(locations_context.get('zones', []))
-        furniture_context = self._format_furniture_context(locations_context.get('furniture', []))
-        drawers_context = self._format_drawers_context(locations_context.get('drawers', []))
+        if location_context is None:
+            location_context = get_location_context()
+        logger.debug(f"Contexte des emplacements: {len(location_context.zones)} zones, {len(location_context.furniture)} meubles, {len(location_context.drawers)} tiroirs ({location_context.prompt_tokens} jetons estimés)")
         
         headers = {
             'Authorization': f'Bearer {self.api_key}',
             'Content-Type': 'application/json'
         }
         
+        build_messages = lambda tree: [
+            {
+                'role': 'system',
+                'content': 'Tu es un assistant spécialisé dans l\'extraction d\'articles et de leurs emplacements '
+                          'à partir de commandes vocales. Ton rôle est d\'identifier les noms d\'articles mentionnés '
+                          'dans la transcription et de les associer aux emplacements existants (zone, meuble, tiroir) '
+                          'en fonction du contexte fourni. Utilise ton jugement pour faire les meilleures associations '
+                          'possibles entre ce qui est dit et les emplacements disponibles.'
+            },
+            {
+                'role': 'user',
+                'content': f'Voici la transcription d\'une commande vocale pour ajouter des articles à l\'inventaire: "{text}". '
+                          f'\n\nEmplacements existants, une zone par ligne (Z = zone, M = meuble, T = tiroir/niveau entre crochets):\n{tree}\n\n'
+                          f'Extrais les noms des articles mentionnés et associe-les aux emplacements existants. '
+                          f'Retourne le résultat sous forme d\'objet JSON avec le format suivant (IDs numériques sans préfixe, null si inconnu):\n'
+                          f'{{"items": [{{"name": "nom de l\'article", "zone_id": id_zone, "furniture_id": id_meuble, "drawer_id": id_tiroir}}, ...]}}\n\n'
+                          f'Ne retourne que le JSON, sans aucun autre texte.'
+            }
+        ]
+        # L'arborescence est limitée au budget restant une fois les consignes et la transcription comptées
+        budget = token_budget.budget_for('extraction')
+        tree_budget = max(1, budget - token_budget.estimate_messages(build_messages(''))) if budget > 0 else 0
+        messages = build_messages(location_context.prompt_for(text, tree_budget) or "Aucun emplacement disponible")
+        token_budget.record('extraction', messages)
+        
         completion_payload = {
             'model': self.model_completion,
-            'messages': [
-                {
-                    'role': 'system',
-                    'content': 'Tu es un assistant spécialisé dans l\'extraction d\'articles et de leurs emplacements '
-                              'à partir de commandes vocales. Ton rôle est d\'identifier les noms d\'articles mentionnés '
-                              'dans la transcription et de les associer aux emplacements existants (zone, meuble, tiroir) '
-                              'en fonction du contexte fourni. Utilise ton jugement pour faire les meilleures associations '
-                              'possibles entre ce qui est dit et les emplacements disponibles.'
-                },
-                {
-                    'role': 'user',
-                    'content': f'Voici la transcription d\'une commande vocale pour ajouter des articles à l\'inventaire: "{text}". '
-                              f'\n\nVoici le contexte des emplacements existants:\n\nZONES:\n{zones_context}\n\nMEUBLES:\n{furniture_context}\n\nTIROIRS/NIVEAUX:\n{drawers_context}\n\n'
-                              f'Extrais les noms des articles mentionnés et associe-les aux emplacements existants. '
-                              f'Retourne le résultat sous forme de liste JSON avec le format suivant:\n'
-                              f'[{{"name": "nom de l\'article", "zone_id": id_zone, "furniture_id": id_meuble, "drawer_id": id_tiroir}}, ...]\n\n'
-                              f'Assure-toi que les IDs correspondent bien aux emplacements existants dans le contexte fourni. '
-                              f'Ne retourne que le JSON, sans aucun autre texte.'
-                }
-            ]
+            'messages': messages,
+            'response_format': ai_schemas.LOCATED_EXTRACTION.response_format(self.structured_outputs)
         }
         
-        response = requests.post(self.completion_url, headers=headers, json=completion_payload)
+        response = self._post('extraction', self.completion_url, headers=headers, json=completion_payload)
         
         if response.status_code != 200:
             raise Exception(f"Erreur lors de l'analyse avec {self.model_completion}: {response.text}")
         
-        return self._parse_openai_response(response.json())
+        items = self._parse_openai_response(self._read_json('extraction', response), ai_schemas.LOCATED_EXTRACTION)
+        # Les IDs inventés ou incohérents sont écartés, les niveaux supérieurs déduits du plus précis
+        return [location_context.resolve(item) for item in items]
     
-    def get_inventory_chat_response(self, items_list, user_query):
+    def _format_inventory_context(self, items_list, zone_summaries=None, total_items=None):
+        """
+        Formate le contexte d'inventaire du prompt système: consignes fixes en premier,
+        puis résumé par zone et liste des articles, dans un ordre déterministe.
+        """
+        inventory_context_parts = [INVENTORY_CHAT_INSTRUCTIONS]
+        if not items_list and not zone_summaries:
+            inventory_context_parts.append("L'inventaire est actuellement vide.")
+            return "\n".join(inventory_context_parts)
+
+        # Parts fixes du budget du chat: ce message est mis en cache, il ne doit pas dépendre de la question
+        budget = token_budget.budget_for('chat')
+        if zone_summaries:
+            inventory_context_parts.append(
+                f"L'inventaire compte {total_items if total_items is not None else len(items_list)} article(s). Résumé par zone :"
+            )
+            zone_lines, dropped = token_budget.fit_lines([f"- {summary}" for summary in zone_summaries], budget // 4, 'chat')
+            inventory_context_parts.extend(zone_lines)
+            if dropped:
+                inventory_context_parts.append(f"- ... et {dropped} autre(s) zone(s)")
+        if items_list:
+            inventory_context_parts.append("Voici l'inventaire actuel :")
+            item_lines, dropped = token_budget.fit_lines(self._format_inventory_items(items_list), budget // 2, 'chat')
+            inventory_context_parts.extend(item_lines)
+            if dropped:
+                inventory_context_parts.append(f"- ... et {dropped} autre(s) article(s) non listé(s)")
+        return "\n".join(inventory_context_parts)
+
+    def _format_inventory_items(self, items_list):
+        return [f"- Nom: {item.name}, Emplacement: {item.location_info or 'N/A'}" for item in items_list]
+
+    def _build_inventory_chat_messages(self, items_list, user_query, zone_summaries=None, total_items=None, inventory_version=None):
+        """
+        Construit les messages (contexte de l'inventaire + question) envoyés au modèle de chat.
+
+        Si `zone_summaries` est fourni, `items_list` peut n'être qu'une sélection des articles pertinents
+        (voir inventory_index): le premier message système ne contient alors que les consignes et le
+        résumé par zone, et la sélection propre à la question est placée dans un second message.
+        Le premier message est ainsi identique d'une question à l'autre pour une même version de
+        l'inventaire: il est mis en cache ici et profite du cache de préfixe de l'API.
+        """
+        is_complete = total_items is None or len(items_list) >= total_items
+        build_context = lambda: self._format_inventory_context(
+            items_list if is_complete else [], zone_summaries, total_items
+        )
+        if inventory_version is not None:
+            inventory_context = self._inventory_context_cache.get_or_build(inventory_version, is_complete, build_context)
+        else:
+            inventory_context = build_context()
+
+        messages = [{'role': 'system', 'content': inventory_context}]
+        if not is_complete:
+            # La sélection (triée par pertinence) reçoit le reste du budget, les moins pertinents sont écartés;
+            # les articles conservés sont ensuite triés par nom pour un message stable d'une question à l'autre
+            budget = token_budget.budget_for('chat')
+            remaining = budget - token_budget.estimate_messages(messages + [{'role': 'user', 'content': user_query}]) - token_budget.MESSAGE_OVERHEAD
+            item_lines = self._format_inventory_items(items_list)
+            if budget > 0:
+                item_lines, _ = token_budget.fit_lines(item_lines, max(1, remaining), 'chat')
+            kept = sorted(zip(items_list, item_lines), key=lambda entry: (normalize_text(entry[0].name), entry[0].id))
+            item_lines = [line for _, line in kept]
+            messages.append({
+                'role': 'system',
+                'content': "\n".join(
+                    ["Articles les plus pertinents pour la question "
+                     "(si l'article demandé n'y figure pas, indique qu'il n'a pas été trouvé) :"]
+                    + item_lines
+                )
+            })
+        messages.append({'role': 'user', 'content': user_query})
+        token_budget.record('chat', messages)
+        return messages
+
+    def get_inventory_chat_response(self, items_list, user_query, zone_summaries=None, total_items=None, inventory_version=None):
         """
         Obtient une réponse de l'IA pour une question sur l'inventaire.
         Construit le contexte de l'inventaire et interroge l'API de complétion.
 
         Args:
-            items_list (list): Liste des objets Item de l'inventaire.
+            items_list (list): Liste des objets Item de l'inventaire (ou sélection pertinente).
             user_query (str): La question de l'utilisateur.
+            zone_summaries (list): Résumé par zone de tout l'inventaire (optionnel).
+            total_items (int): Nombre total d'articles de l'inventaire (optionnel).
+            inventory_version (int): Version de l'inventaire, clé du cache du contexte (optionnel).
 
         Returns:
             str: La réponse textuelle de l'IA.
@@ -242,26 +638,25 @@ class AIService:
         if not user_query: # Sécurité, bien que déjà vérifié dans la route
             return "La question ne peut pas être vide."
 
-        if not items_list:
-            inventory_context = "L'inventaire est actuellement vide."
-        else:
-            # Le prompt détaillé est maintenant construit ici
-            inventory_context_parts = [
-                "Tu es un assistant IA expert en gestion d'inventaire. "
-                "Réponds aux questions de l'utilisateur concernant la liste du matériel fournie ci-dessous. "
-                "Utilise le format Markdown pour structurer tes réponses lorsque c'est pertinent (par exemple, listes à puces, texte en gras, italique). "
-                "Sois clair et concis. Voici l'inventaire actuel :"
-            ]
-            for item in items_list:
-                inventory_context_parts.append(
-                    f"- Nom: {item.name}, Emplacement: {item.location_info or 'N/A'}"
-                )
-            inventory_context = "\n".join(inventory_context_parts)
-        
-        messages_for_ai = [
-            {'role': 'system', 'content': inventory_context},
-            {'role': 'user', 'content': user_query}
-        ]
+        if inventory_version is not None:
+            cached_answer = self.chat_answer_cache.get(user_query, inventory_version)
+            if cached_answer is not None:
+                logger.debug("Réponse du chat servie depuis le cache")
+                return cached_answer
+
+        # Une même question posée simultanément (même sélection, même version) ne déclenche qu'un appel
+        key = fingerprint(
+            normalize_question(user_query), inventory_version, total_items, zone_summaries,
+            [getattr(item, 'id', None) for item in items_list or []], self._flight_scope()
+        )
+        return self._chat_flight.do(
+            key, self._request_inventory_chat_response,
+            items_list, user_query, zone_summaries, total_items, inventory_version
+        )
+
+    def _request_inventory_chat_response(self, items_list, user_query, zone_summaries, total_items, inventory_version):
+        """Appel de complétion du chat (hors cache), mise en cache de la réponse"""
+        messages_for_ai = self._build_inventory_chat_messages(items_list, user_query, zone_summaries, total_items, inventory_version)
 
         headers = {
             'Authorization': f'Bearer {self.api_key}',
@@ -274,10 +669,10 @@ class AIService:
         }
         
         try:
-            response = requests.post(self.completion_url, headers=headers, json=completion_payload)
+            response = self._post('chat', self.completion_url, headers=headers, json=completion_payload)
             response.raise_for_status() # Lève une exception pour les codes d'erreur HTTP 4xx/5xx
             
-            response_data = response.json()
+            response_data = self._read_json('chat', response)
             # Vérification plus robuste de la structure de la réponse
             if not response_data or 'choices' not in response_data or not response_data['choices']:
                 raise ValueError("Réponse de l'API OpenAI malformée: 'choices' est manquant ou vide.")
@@ -291,6 +686,8 @@ class AIService:
             if not ai_message_content.strip():
                 # Gérer le cas où la réponse est vide ou ne contient que des espaces
                 return "Désolé, je n'ai pas pu générer de réponse pour le moment (contenu vide)."
+            if inventory_version is not None:
+                self.chat_answer_cache.put(user_query, inventory_version, ai_message_content)
             return ai_message_content
 
         except requests.exceptions.RequestException as e:
@@ -303,260 +700,502 @@ class AIService:
             logger.error(f"Erreur lors du parsing ou validation de la réponse OpenAI (Chat): {e}")
             raise Exception(f"Réponse inattendue ou malformée de l'API OpenAI: {e}")
 
+    def stream_inventory_chat_response(self, items_list, user_query, zone_summaries=None, total_items=None, inventory_version=None):
+        """
+        Variante en flux de get_inventory_chat_response (mode `stream=true` de l'API).
+        Le contexte est construit et la requête envoyée immédiatement, de sorte que les
+        erreurs de connexion sont levées avant le début du flux.
+
+        Args:
+            items_list (list): Liste des objets Item de l'inventaire (ou sélection pertinente).
+            user_query (str): La question de l'utilisateur.
+            zone_summaries (list): Résumé par zone de tout l'inventaire (optionnel).
+            total_items (int): Nombre total d'articles de l'inventaire (optionnel).
+            inventory_version (int): Version de l'inventaire, clé du cache du contexte (optionnel).
+
+        Returns:
+            generator: Fragments de texte de la réponse, dans l'ordre de réception.
+        """
+        self.validate_api_key()
+
+        if inventory_version is not None:
+            cached_answer = self.chat_answer_cache.get(user_query, inventory_version)
+            if cached_answer is not None:
+                return iter([cached_answer])
+
+        headers = {
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json'
+        }
+        completion_payload = {
+            'model': self.model_completion,
+            'messages': self._build_inventory_chat_messages(items_list, user_query, zone_summaries, total_items, inventory_version),
+            'stream': True,
+            # Le dernier fragment du flux contient alors le bloc `usage`
+            'stream_options': {'include_usage': True}
+        }
+
+        try:
+            response = self._post('chat', self.completion_url, headers=headers, json=completion_payload, stream=True)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Erreur lors de l'appel à l'API OpenAI (Chat en flux): {e}")
+            raise Exception(f"Erreur de communication avec l'API OpenAI: {e}")
+
+        deltas = self._iter_chat_deltas(response)
+        if inventory_version is None:
+            return deltas
+        return self._cache_streamed_answer(deltas, user_query, inventory_version)
+
+    def _cache_streamed_answer(self, deltas, user_query, inventory_version):
+        """Relaie les fragments et met la réponse complète en cache si le flux se termine normalement"""
+        parts = []
+        for content in deltas:
+            parts.append(content)
+            yield content
+        answer = ''.join(parts)
+        if answer.strip():
+            self.chat_answer_cache.put(user_query, inventory_version, answer)
+
+    def _iter_chat_deltas(self, response):
+        """
+        Lit le flux SSE de l'API de complétion et produit les fragments de contenu
+        """
+        usage = None
+        try:
+            for raw_line in response.iter_lines():
+                if not raw_line:
+                    continue
+                line = raw_line.decode('utf-8')
+                if not line.startswith('data:'):
+                    continue
+                data = line[len('data:'):].strip()
+                if data == '[DONE]':
+                    break
+                chunk = json.loads(data)
+                if chunk.get('usage'):
+                    usage = chunk['usage']
+                choices = chunk.get('choices') or []
+                if not choices:
+                    continue
+                content = (choices[0].get('delta') or {}).get('content')
+                if content:
+                    yield content
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Flux de l'API OpenAI interrompu (Chat): {e}")
+            raise Exception(f"Erreur de communication avec l'API OpenAI: {e}")
+        except json.JSONDecodeError as e:
+            logger.error(f"Fragment malformé dans le flux OpenAI (Chat): {e}")
+            raise Exception(f"Réponse inattendue ou malformée de l'API OpenAI: {e}")
+        finally:
+            response.close()
+            self._record_usage(response, usage)
+
 
-    def process_audio_file(self, audio_file, audio_mime_type='audio/webm', is_inventory=False, locations_context=None, temporary_only=False):
+    def process_audio_file(self, audio_file, audio_mime_type='audio/webm', is_inventory=False, temporary_only=False, stats=None):
         """
         Traite un fichier audio et en extrait les informations (articles ou articles+emplacements)
         
         Args:
-            audio_file: Fichier audio à traiter
+            audio_file: Fichier audio à traiter (FileStorage, flux binaire ou bytes)
             is_inventory (bool): Si True, extrait les articles avec leurs emplacements
-            locations_context (dict): Contexte des emplacements (requis si is_inventory=True)
+            stats (dict): Dictionnaire optionnel complété avec les statistiques du traitement
+                          (durées des étapes en ms sous 'timings', clé 'audio' si l'enregistrement a été prétraité)
             
         Returns:
             list: Liste d'articles (ou articles avec emplacements)
         """
+        timings = StageTimings('voice_pipeline')
+        
         try:
-            # Déterminer le suffixe du fichier à partir du mimeType
-            mime_to_suffix = {
-                'audio/webm': '.webm',
-                'audio/mp4': '.mp4',
-                'audio/mpeg': '.mp3', # ou .mpeg
-                'audio/ogg': '.ogg', # ou .oga
-                'audio/wav': '.wav',
-                'audio/flac': '.flac',
-                'audio/x-m4a': '.m4a', # Pour être sûr
-                'audio/m4a': '.m4a'
-            }
-            # Extraire le type MIME de base sans les paramètres (ex: 'audio/webm' de 'audio/webm;codecs=opus')
-            base_mime_type = audio_mime_type.split(';')[0].strip()
-            suffix = mime_to_suffix.get(base_mime_type, '.raw') # Default à .raw si inconnu
-            logger.debug(f"Utilisation du suffixe '{suffix}' pour le mimeType '{audio_mime_type}' (base: '{base_mime_type}')")
-
-            # Créer un fichier temporaire pour stocker l'audio
-            with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
-                audio_path = temp_file.name
-                audio_file.save(audio_path)
-            
-            # Transcription de l'audio
-            transcription_text = self.transcribe_audio(audio_path, audio_mime_type=audio_mime_type)
-            
-            # Extraction des articles ou articles+emplacements
-            if is_inventory and locations_context:
-                logger.debug(f"Mode inventaire détecté avec contexte: {len(locations_context.get('zones', []))} zones, {len(locations_context.get('furniture', []))} meubles, {len(locations_context.get('drawers', []))} tiroirs")
-                items = self.extract_items_with_locations(transcription_text, locations_context)
-                logger.debug(f"Résultat de l'extraction avec emplacements: {len(items)} articles")
-            else:
-                logger.debug("Mode standard détecté")
-                items = self.extract_items_from_text(transcription_text)
-                logger.debug(f"Résultat de l'extraction standard: {len(items)} articles")
+            with timings.stage('total'):
+                transcription_text = self._transcribe_clip(audio_file, audio_mime_type, stats, timings)
                 
-                if temporary_only:
-                    logger.debug("Mode temporaire uniquement activé. Pas de comparaison avec l'existant.")
-                    # Les items sont déjà au format [{'id': ..., 'name': '...'}]
-                    # Ils seront ajoutés comme temporaires par la logique d'appel si aucun db_id n'est présent
+                # Extraction des articles ou articles+emplacements
+                if is_inventory:
+                    logger.debug("Mode inventaire détecté")
+                    with timings.stage('extract'):
+                        items = self.extract_items_with_locations(transcription_text)
+                    logger.debug(f"Résultat de l'extraction avec emplacements: {len(items)} articles")
                 else:
-                    logger.debug("Mode standard. Comparaison avec les articles existants dans la base de données.")
-                    items = self.compare_with_existing_items(items)
-            
-            # Supprimer le fichier temporaire
-            os.unlink(audio_path)
-            
-            # Retourner un tableau vide au lieu de None si nécessaire
-            if items is None:
-                logger.warning("ATTENTION: Les items sont None, remplacement par tableau vide")
-                return []
-                
-            return items
+                    logger.debug("Mode standard détecté")
+                    with timings.stage('extract'):
+                        items = self.extract_items_from_text(transcription_text)
+                    logger.debug(f"Résultat de l'extraction standard: {len(items)} articles")
+                    
+                    if temporary_only:
+                        logger.debug("Mode temporaire uniquement activé. Pas de comparaison avec l'existant.")
+                        # Les items sont déjà au format [{'id': ..., 'name': '...'}]
+                        # Ils seront ajoutés comme temporaires par la logique d'appel si aucun db_id n'est présent
+                    else:
+                        logger.debug("Mode standard. Comparaison avec les articles existants dans la base de données.")
+                        with timings.stage('compare'):
+                            items = self.compare_with_existing_items(items)
+        finally:
+            if stats is not None:
+                stats['timings'] = timings.to_dict()
+        
+        # Retourner un tableau vide au lieu de None si nécessaire
+        if items is None:
+            logger.warning("ATTENTION: Les items sont None, remplacement par tableau vide")
+            return []
             
-        except Exception as e:
-            # En cas d'erreur, s'assurer que le fichier temporaire est supprimé
-            if 'audio_path' in locals() and os.path.exists(audio_path):
-                os.unlink(audio_path)
-            raise e
+        return items
     
-    def _parse_openai_response(self, response_json):
+    def process_audio_batch(self, clips, stats=None):
         """
-        Analyse la réponse OpenAI pour en extraire le contenu
+        Traite plusieurs enregistrements d'inventaire en un seul appel.
+        Les transcriptions sont faites en parallèle (au plus `batch_workers` à la fois), puis les textes
+        sont analysés en un seul appel s'ils sont courts, sinon un appel par enregistrement en parallèle.
+        Les articles sont fusionnés: un même nom n'est conservé qu'une fois, avec l'emplacement le plus précis.
         
         Args:
-            response_json (dict): Réponse JSON d'OpenAI
+            clips (list): Liste de tuples (fichier audio, type MIME)
+            stats (dict): Dictionnaire optionnel complété avec les statistiques du traitement
+                          (détail par enregistrement sous 'clips', durées des étapes sous 'timings')
             
         Returns:
-            list: Liste d'articles ou d'articles avec emplacements
+            list: Liste d'articles avec des emplacements validés
         """
+        timings = StageTimings('voice_batch')
+        clip_stats = [{'filename': getattr(audio_file, 'filename', None)} for audio_file, _ in clips]
         try:
-            logger.debug(f"Réponse brute d'OpenAI: {response_json}")
-            if 'choices' not in response_json or not response_json['choices']:
-                logger.error("ERREUR: Pas de choix dans la réponse OpenAI")
-                return []
-                
-            content = response_json['choices'][0]['message']['content'].strip()
-            logger.debug(f"Contenu extrait: {content}")
-            
-            if not content:
-                logger.error("ERREUR: Contenu vide dans la réponse OpenAI")
-                return []
-            
-            # Nettoyage du contenu avant parsing
-            content = content.replace('```json', '').replace('```', '')
-            content = content.strip()
-            logger.debug(f"Contenu nettoyé: {content}")
-            
-            # Essayer d'abord de parser directement le contenu
-            try:
-                items = json.loads(content)
-                logger.debug(f"Parsing JSON direct réussi: {items}")
-                
-                # Vérifier si le résultat est bien une liste
-                if not isinstance(items, list):
-                    logger.error(f"ERREUR: Le résultat n'est pas une liste mais {type(items)}")
-                    # Essayer de voir si le résultat est un dictionnaire contenant la liste
-                    if isinstance(items, dict) and any(isinstance(items.get(k), list) for k in items):
-                        for k, v in items.items():
-                            if isinstance(v, list):
-                                logger.debug(f"Extraction de la liste depuis la clé '{k}'")
-                                items = v
-                                break
-                    else:
-                        return []
+            with timings.stage('total'):
+                # L'arborescence est chargée une fois, dans le thread de la requête
+                location_context = get_location_context()
                 
-                # Mettre une majuscule à la première lettre de chaque article
-                for item in items:
-                    if 'name' in item and item['name']:
-                        item['name'] = item['name'][0].upper() + item['name'][1:] if len(item['name']) > 1 else item['name'].upper()
+                with timings.stage('transcribe'):
+                    texts = self._run_clips(
+                        lambda clip, clip_stat: self._transcribe_clip(clip[0], clip[1], clip_stat, StageTimings('voice_pipeline')),
+                        clips, clip_stats
+                    )
+                texts = [text.strip() for text in texts if text and text.strip()]
                 
-                # Vérifier que tous les items ont les champs requis
-                valid_items = []
-                for item in items:
-                    # Pour les articles temporaires, seul le nom est requis
-                    if 'name' in item and item['name']:
-                        # Si c'est un article avec emplacement, vérifier les champs requis
-                        if all(k in item for k in ['zone_id', 'furniture_id', 'drawer_id']):
-                            valid_items.append(item)
-                        # Si c'est un article temporaire (sans emplacement), l'ajouter tel quel
-                        elif not any(k in item for k in ['zone_id', 'furniture_id', 'drawer_id']):
-                            valid_items.append(item)
-                        else:
-                            logger.warning(f"AVERTISSEMENT: Article avec emplacement incomplet ignoré: {item}")
+                with timings.stage('extract'):
+                    if not texts:
+                        results = []
+                    elif len(texts) == 1 or token_budget.estimate_tokens(' '.join(texts)) <= token_budget.budget_for('extraction') // 4:
+                        metrics.increment('voice_batch.combined_extractions')
+                        results = [self.extract_items_with_locations('\n'.join(texts), location_context)]
                     else:
-                        logger.warning(f"AVERTISSEMENT: Article sans nom ignoré: {item}")
-                
-                logger.debug(f"Nombre d'items valides après vérification: {len(valid_items)}")
-                return valid_items
-                
-            except json.JSONDecodeError as e:
-                logger.debug(f"Erreur JSON direct: {e}. Essai d'extraction par regex...")
-                # Si ça échoue, essayer d'extraire le JSON de la réponse
-                pattern = r'\[\s*{.*}\s*\]'
-                match = re.search(pattern, content, re.DOTALL)
-                if match:
-                    items_json = match.group(0)
-                    logger.debug(f"JSON extrait par regex: {items_json}")
-                    try:
-                        items = json.loads(items_json)
-                        logger.debug(f"Parsing JSON extrait réussi: {items}")
-                        # Mettre une majuscule à la première lettre de chaque article
-                        for item in items:
-                            if 'name' in item and item['name']:
-                                item['name'] = item['name'][0].upper() + item['name'][1:] if len(item['name']) > 1 else item['name'].upper()
-                        
-                        # Vérifier que tous les items ont les champs requis
-                        valid_items = []
-                        for item in items:
-                            # Pour les articles temporaires, seul le nom est requis
-                            if 'name' in item and item['name']:
-                                # Si c'est un article avec emplacement, vérifier les champs requis
-                                if all(k in item for k in ['zone_id', 'furniture_id', 'drawer_id']):
-                                    valid_items.append(item)
-                                # Si c'est un article temporaire (sans emplacement), l'ajouter tel quel
-                                elif not any(k in item for k in ['zone_id', 'furniture_id', 'drawer_id']):
-                                    valid_items.append(item)
-                                else:
-                                    logger.warning(f"AVERTISSEMENT: Article avec emplacement incomplet ignoré: {item}")
-                            else:
-                                logger.warning(f"AVERTISSEMENT: Article sans nom ignoré: {item}")
-                        
-                        logger.debug(f"Nombre d'items valides après vérification: {len(valid_items)}")
-                        return valid_items
-                    except json.JSONDecodeError as e:
-                        logger.error(f"Erreur lors du parsing du JSON extrait: {e}")
-                        return []
-                else:
-                    logger.debug("Aucun JSON trouvé dans la réponse par regex")
-                    return []
-        except Exception as e:
-            logger.error(f"Erreur lors de l'analyse de la réponse OpenAI: {e}")
-            return []
+                        metrics.increment('voice_batch.parallel_extractions')
+                        results = self._run_clips(
+                            lambda text, _: self.extract_items_with_locations(text, location_context),
+                            texts, [{} for _ in texts]
+                        )
+                items = self._merge_located_items(item for result in results for item in result or [])
+        finally:
+            if stats is not None:
+                stats['clips'] = clip_stats
+                stats['timings'] = timings.to_dict()
+        
+        metrics.observe('voice_batch.clips', len(clips))
+        return items
     
-    def _format_zones_context(self, zones):
+    def _run_clips(self, func, values, clip_stats):
         """
-        Formate les données de zone pour le contexte
+        Applique `func(valeur, stats)` à chaque valeur sur un pool borné et retourne les résultats dans l'ordre.
+        L'échec d'une valeur est noté dans ses statistiques (son résultat est None);
+        l'erreur n'est propagée que si toutes les valeurs échouent.
         """
-        if not zones:
-            logger.warning("Aucune zone fournie dans le contexte")
-            return "Aucune zone disponible"
-            
-        formatted = '\n'.join([f"{zone['id']}: {zone['name']}" for zone in zones])
-        logger.debug(f"Contexte de zones formaté: {formatted}")
-        return formatted
+        if len(values) == 1:
+            try:
+                outcomes = [func(values[0], clip_stats[0])]
+            except Exception as e:
+                outcomes = [e]
+        else:
+            with ThreadPoolExecutor(max_workers=min(len(values), self.batch_workers)) as executor:
+                futures = [submit_in_context(executor, func, value, clip_stat) for value, clip_stat in zip(values, clip_stats)]
+            outcomes = []
+            for future in futures:
+                error = future.exception()
+                outcomes.append(error if error is not None else future.result())
+        
+        errors = [outcome for outcome in outcomes if isinstance(outcome, Exception)]
+        if errors and len(errors) == len(outcomes):
+            raise errors[0]
+        for outcome, clip_stat in zip(outcomes, clip_stats):
+            if isinstance(outcome, Exception):
+                logger.warning(f"Échec du traitement d'un enregistrement du lot: {outcome}")
+                metrics.increment('voice_batch.clip_failures')
+                clip_stat['error'] = str(outcome)
+                clip_stat['error_type'] = getattr(outcome, 'error_type', 'processing_error')
+        return [None if isinstance(outcome, Exception) else outcome for outcome in outcomes]
     
-    def _format_furniture_context(self, furniture):
+    @staticmethod
+    def _merge_located_items(items):
         """
-        Formate les données de meuble pour le contexte
+        Fusionne les articles de plusieurs enregistrements: un article dont le nom est déjà présent
+        est écarté si son emplacement n'ajoute rien, ou remplace l'existant s'il est plus précis
         """
-        if not furniture:
-            logger.warning("Aucun meuble fourni dans le contexte")
-            return "Aucun meuble disponible"
-            
-        formatted = '\n'.join([f"{item['id']}: {item['name']} (Zone: {item['zone_id']})" for item in furniture])
-        logger.debug(f"Contexte de meubles formaté: {formatted}")
-        return formatted
+        keys = ('zone_id', 'furniture_id', 'drawer_id')
+        
+        def covers(kept, other):
+            # `kept` est au moins aussi précis que `other` et ne le contredit pas
+            return all(other.get(key) is None or kept.get(key) == other.get(key) for key in keys)
+        
+        merged = []
+        by_name = {}
+        for item in items:
+            name = normalize_name(item.get('name') or '')
+            if not name:
+                continue
+            same_name = by_name.setdefault(name, [])
+            if any(covers(kept, item) for kept in same_name):
+                continue
+            for kept in [kept for kept in same_name if covers(item, kept)]:
+                same_name.remove(kept)
+                merged.remove(kept)
+            same_name.append(item)
+            merged.append(item)
+        
+        for index, item in enumerate(merged, 1):
+            item['id'] = index
+        return merged
     
-    def _format_drawers_context(self, drawers):
-        """
-        Formate les données de tiroir pour le contexte
-        """
-        if not drawers:
-            logger.warning("Aucun tiroir fourni dans le contexte")
-            return "Aucun tiroir disponible"
-            
-        formatted = '\n'.join([f"{drawer['id']}: {drawer['name']} (Meuble: {drawer['furniture_id']})" for drawer in drawers])
-        logger.debug(f"Contexte de tiroirs formaté: {formatted}")
-        return formatted
+    def _transcribe_clip(self, audio_file, audio_mime_type, stats=None, timings=None):
+        """Prétraite (WAV) puis transcrit un enregistrement; les durées sont ajoutées à `timings`"""
+        timings = timings or StageTimings('voice_pipeline')
+        # Déterminer le suffixe du fichier à partir du mimeType
+        mime_to_suffix = {
+            'audio/webm': '.webm',
+            'audio/mp4': '.mp4',
+            'audio/mpeg': '.mp3', # ou .mpeg
+            'audio/ogg': '.ogg', # ou .oga
+            'audio/wav': '.wav',
+            'audio/flac': '.flac',
+            'audio/x-m4a': '.m4a', # Pour être sûr
+            'audio/m4a': '.m4a'
+        }
+        # Extraire le type MIME de base sans les paramètres (ex: 'audio/webm' de 'audio/webm;codecs=opus')
+        base_mime_type = audio_mime_type.split(';')[0].strip()
+        suffix = mime_to_suffix.get(base_mime_type, '.raw') # Default à .raw si inconnu
+        logger.debug(f"Utilisation du suffixe '{suffix}' pour le mimeType '{audio_mime_type}' (base: '{base_mime_type}')")
 
+        # Le flux de l'upload (en mémoire ou déjà débordé sur disque par Werkzeug) est transmis tel quel
+        audio_stream = getattr(audio_file, 'stream', audio_file)
+        if self.audio_preprocess and is_wav(base_mime_type):
+            with timings.stage('preprocess'):
+                audio_stream = self._preprocess_wav(audio_stream, stats)
+        
+        # Transcription de l'audio
+        with timings.stage('transcribe'):
+            return self.transcribe_audio(audio_stream, audio_mime_type=audio_mime_type, filename=f"audio{suffix}")
 
+    def _preprocess_wav(self, audio_stream, stats=None):
+        """
+        Supprime les silences, passe en mono et rééchantillonne un enregistrement WAV.
+        En cas d'échec du décodage, le contenu d'origine est transmis tel quel.
+        """
+        data = audio_stream if isinstance(audio_stream, bytes) else audio_stream.read()
+        try:
+            processed, audio_stats = preprocess_wav(data)
+        except (wave.Error, ValueError, EOFError) as e:
+            logger.warning(f"Prétraitement audio ignoré (WAV illisible): {e}")
+            return data
+        metrics.observe('audio_preprocess.trimmed_seconds', audio_stats['trimmed_seconds'])
+        metrics.increment('audio_preprocess.saved_bytes', audio_stats['saved_bytes'])
+        logger.info(
+            f"Audio prétraité: {audio_stats['original_bytes']} -> {audio_stats['processed_bytes']} octets, "
+            f"{audio_stats['trimmed_seconds']} s de silence supprimées"
+        )
+        if stats is not None:
+            stats['audio'] = audio_stats
+        return processed
 
-    def _build_batch_comparison_prompt(self, recognized_names, db_items):
+    def _parse_openai_response(self, response_json, schema):
+        """
+        Lit la réponse structurée d'une extraction
+        
+        Args:
+            response_json (dict): Réponse JSON d'OpenAI
+            schema (ResponseSchema): Schéma imposé à l'appel (ai_schemas.EXTRACTION ou LOCATED_EXTRACTION)
+            
+        Returns:
+            list: Liste d'articles ou d'articles avec emplacements (IDs séquentiels), vide si la réponse est non conforme
+        """
+        logger.debug(f"Réponse brute d'OpenAI: {response_json}")
+        try:
+            records = schema.parse(response_json)
+        except ai_schemas.SchemaViolationError as e:
+            logger.error(f"ERREUR: {e}")
+            return []
+        return [record.to_dict(index) for index, record in enumerate(records, 1)]
+    
+    def _build_batch_comparison_prompt(self, candidates_by_name):
         """
         Construit le prompt pour la comparaison sémantique en batch.
+        Chaque nom dicté n'est accompagné que de ses candidats les plus proches (pré-sélection locale).
         """
-        recognized_names_json = json.dumps(recognized_names, indent=2, ensure_ascii=False)
-        db_items_json = json.dumps(db_items, indent=2, ensure_ascii=False)
+        candidates_json = token_budget.compact_json(candidates_by_name)
 
         return (
-            f"Vous êtes un assistant IA expert en gestion d'inventaire. Votre tâche est de comparer une liste d'articles dictés par un utilisateur avec une liste d'articles existants dans une base de données. "
+            f"Vous êtes un assistant IA expert en gestion d'inventaire. Votre tâche est de comparer des articles dictés par un utilisateur avec des articles existants dans une base de données. "
             f"Vous devez identifier quels articles dictés correspondent à des articles existants, même en cas de différences mineures comme les pluriels, les fautes de frappe ou des variations de formulation.\n\n"
-            f"Voici la liste des articles dictés par l'utilisateur :\n{recognized_names_json}\n\n"
-            f"Voici la liste des articles conventionnels de la base de données :\n{db_items_json}\n\n"
-            f"Veuillez analyser ces deux listes et retourner un objet JSON. Cet objet doit contenir une seule clé, 'matched_items', qui est une liste de résultats pour CHAQUE article dicté. "
+            f"Voici, pour chaque article dicté, la liste des articles conventionnels candidats de la base de données :\n{candidates_json}\n\n"
+            f"Veuillez analyser ces listes et retourner un objet JSON. Cet objet doit contenir une seule clé, 'matched_items', qui est une liste de résultats pour CHAQUE article dicté. "
             f"Chaque objet dans la liste doit avoir la structure suivante :\n"
             f"- \"original_name\": Le nom de l'article tel qu'il a été dicté.\n"
-            f"- \"is_conventional\": Un booléen (true/false) indiquant s'il correspond à un article conventionnel.\n"
-            f"- \"db_id\": L'ID de l'article de la base de données correspondant (null si aucune correspondance).\n"
-            f"- \"db_name\": Le nom officiel de l'article de la base de données (null si aucune correspondance).\n\n"
+            f"- \"is_conventional\": Un booléen (true/false) indiquant s'il correspond à l'un de ses candidats.\n"
+            f"- \"db_id\": L'ID de l'article candidat correspondant (null si aucune correspondance).\n"
+            f"- \"db_name\": Le nom officiel de l'article candidat (null si aucune correspondance).\n\n"
             f"Si un article dicté comme 'Gauffres au sesames' correspond à 'Gaufre au sésame' (ID 12) dans la base de données, le résultat doit être :\n"
             f"{{\"original_name\": \"Gauffres au sesames\", \"is_conventional\": true, \"db_id\": 12, \"db_name\": \"Gaufre au sésame\"}}\n\n"
-            f"Si un article dicté n'a pas de correspondance claire, marquez-le comme non conventionnel. Ne renvoyez que l'objet JSON, sans texte ou explication supplémentaire."
+            f"Si un article dicté n'a pas de correspondance claire parmi ses candidats, marquez-le comme non conventionnel. Ne renvoyez que l'objet JSON, sans texte ou explication supplémentaire."
         )
 
-    def compare_with_existing_items(self, items):
+    def _apply_match(self, item, record):
+        """Associe un article reconnu à l'article conventionnel correspondant"""
+        item['is_conventional'] = True
+        item['db_id'] = record.id
+        item['name'] = record.name
+        item['zone_id'] = record.zone_id
+        item['furniture_id'] = record.furniture_id
+        item['drawer_id'] = record.drawer_id
+        item['location_info'] = record.location_info
+
+    def _resolve_ambiguous_matches(self, ambiguous):
         """
-        Compare une liste d'articles reconnus avec des articles conventionnels de la base de données en un seul appel API, 
-        en utilisant l'IA pour trouver des correspondances sémantiques.
+        Soumet à l'IA les noms ambigus avec leurs candidats.
+        Si le prompt dépasse le budget de l'opération 'comparison', les noms sont répartis en lots
+        comparés en parallèle, puis les résultats sont fusionnés.
+
+        Args:
+            ambiguous (dict): Nom dicté -> MatchResult ambigu
+
+        Returns:
+            dict: Nom dicté en minuscules -> MatchRecord retenu (absent si aucune correspondance)
         """
         self.validate_api_key()
+        candidates_by_name = {
+            name: [{"id": record.id, "name": record.name} for _, record in result.candidates]
+            for name, result in ambiguous.items()
+        }
+        candidates_by_key = {
+            name.lower(): {record.id: record for _, record in result.candidates}
+            for name, result in ambiguous.items()
+        }
+
+        budget = token_budget.budget_for('comparison')
+        fixed_tokens = token_budget.estimate_messages(self._comparison_messages({}))
+        chunks = token_budget.chunk_by_budget(
+            list(candidates_by_name),
+            lambda name: token_budget.estimate_tokens(token_budget.compact_json({name: candidates_by_name[name]})),
+            max(1, budget - fixed_tokens) if budget > 0 else 0
+        )
+        if len(chunks) == 1:
+            return self._resolve_ambiguous_chunk(candidates_by_name, candidates_by_key)
 
+        metrics.increment('token_budget.comparison.chunked')
+        logger.info("Comparaison répartie en %s lots pour respecter le budget de %s jetons", len(chunks), budget)
+        resolved = {}
+        workers = min(len(chunks), self.bulkheads['comparison'].max_concurrent)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ai-comparison') as executor:
+            futures = [
+                submit_in_context(
+                    executor, self._resolve_ambiguous_chunk,
+                    {name: candidates_by_name[name] for name in chunk}, candidates_by_key
+                )
+                for chunk in chunks
+            ]
+            for future in futures:
+                try:
+                    resolved.update(future.result())
+                except ServiceUnavailableError:
+                    raise
+                except Exception as e:
+                    # Les noms de ce lot seront marqués comme temporaires, les autres lots restent exploitables
+                    logger.error(f"Échec d'un lot de comparaison: {e}")
+                    metrics.increment('item_matcher.fallbacks')
+        return resolved
+
+    def _comparison_messages(self, candidates_by_name):
+        return [
+            {'role': 'system', 'content': 'Vous êtes un assistant IA expert en JSON qui ne répond que par du JSON valide.'},
+            {'role': 'user', 'content': self._build_batch_comparison_prompt(candidates_by_name)}
+        ]
+
+    def _resolve_ambiguous_chunk(self, candidates_by_name, candidates_by_key):
+        """Un appel de comparaison pour un lot de noms; retourne nom en minuscules -> MatchRecord"""
+        headers = {
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json'
+        }
+        messages = self._comparison_messages(candidates_by_name)
+        token_budget.record('comparison', messages)
+        payload = {
+            'model': self.model_completion,
+            'messages': messages,
+            'response_format': ai_schemas.COMPARISON.response_format(self.structured_outputs),
+            'temperature': 0.0
+        }
+
+        logger.info("Envoi de la requête de comparaison en batch à l'IA (%s article(s) ambigu(s))...", len(candidates_by_name))
+        metrics.increment('item_matcher.llm_calls')
+        response = self._post('comparison', self.completion_url, headers=headers, json=payload)
+        response.raise_for_status()
+
+        response_data = self._read_json('comparison', response)
+        logger.debug(f"Réponse JSON brute de l'IA: {response_data}")
+
+        # Seuls les noms de ce lot, et leurs propres candidats, sont acceptés
+        chunk_keys = {name.lower() for name in candidates_by_name}
+        resolved = {}
+        for ai_match in ai_schemas.COMPARISON.parse(response_data):
+            key = ai_match.original_name.lower()
+            if not ai_match.is_conventional or key not in chunk_keys or key not in candidates_by_key:
+                continue
+            record = candidates_by_key[key].get(ai_match.db_id)
+            if record is not None:
+                resolved[key] = record
+        return resolved
+
+    def _add_semantic_candidates(self, items, matcher, ambiguous):
+        """
+        Complète les candidats des noms non résolus par une recherche vectorielle (un seul lot).
+        Un nom sans candidat lexical mais proche sémantiquement d'un article est soumis à l'IA.
+        """
+        pending = [item['name'] for item in items if item.get('name') and not item.get('is_conventional')]
+        if not pending or not embedding_index.enabled:
+            return
+        try:
+            results = embedding_index.search(pending, top_k=5, include_temporary=False)
+        except Exception as e:
+            logger.warning(f"Recherche vectorielle indisponible, comparaison lexicale seule: {e}")
+            return
+        for name, neighbours in zip(pending, results):
+            extra = [(score, matcher.records[item_id]) for score, item_id in neighbours
+                     if item_id in matcher.records]
+            if not extra:
+                continue
+            result = ambiguous.get(name) or MatchResult(MatchResult.NONE, [])
+            result.merge(extra)
+            if name not in ambiguous:
+                ambiguous[name] = result
+                metrics.increment('item_matcher.semantic_candidates')
+
+    def compare_with_existing_items(self, items):
+        """
+        Compare une liste d'articles reconnus avec les articles conventionnels de la base de données.
+        Les correspondances exactes ou sans ambiguïté sont résolues localement (nom normalisé, trigrammes
+        et distance d'édition), l'index vectoriel complète les candidats des autres noms;
+        seuls les noms ambigus sont soumis à l'IA, en un seul appel.
+        Une liste identique comparée simultanément (même version de l'inventaire) partage ce traitement:
+        l'appel regroupé reçoit une copie du résultat, sa propre liste n'est pas modifiée.
+        """
+        key = fingerprint(items, inventory_cache.inventory_version.value, self._flight_scope())
+        return self._compare_flight.do(key, self._compare_with_existing_items, items, share=copy.deepcopy)
+
+    @staticmethod
+    def _flight_scope():
+        """
+        Portée du regroupement des appels identiques: l'utilisateur courant si le quota quotidien est actif
+        (chacun est décompté de son propre quota et ne reçoit jamais l'erreur de quota d'un autre),
+        sinon tous les utilisateurs (l'appel partagé est alors journalisé au nom du premier demandeur)
+        """
+        return current_user_id.get() if daily_quota.enabled else None
+
+    def _compare_with_existing_items(self, items):
         recognized_item_names = [item['name'] for item in items if item.get('name')]
         if not recognized_item_names:
             logger.info("Aucun article reconnu avec un nom à comparer.")
@@ -564,78 +1203,70 @@ class AIService:
                 item['is_conventional'] = False
             return items
 
-        try:
-            db_conventional_items = Item.query.filter_by(is_temporary=False).all()
-            if not db_conventional_items:
-                logger.info("Aucun article conventionnel dans la BD. Tous les articles sont marqués comme temporaires.")
-                for item in items:
-                    item['is_conventional'] = False
-                return items
-
-            db_items_for_prompt = [{"id": item.id, "name": item.name} for item in db_conventional_items]
-            prompt = self._build_batch_comparison_prompt(recognized_item_names, db_items_for_prompt)
-
-            headers = {
-                'Authorization': f'Bearer {self.api_key}',
-                'Content-Type': 'application/json'
-            }
-            payload = {
-                'model': self.model_completion,
-                'messages': [
-                    {'role': 'system', 'content': 'Vous êtes un assistant IA expert en JSON qui ne répond que par du JSON valide.'},
-                    {'role': 'user', 'content': prompt}
-                ],
-                'response_format': {"type": "json_object"},
-                'temperature': 0.0
-            }
+        matcher = item_matcher_cache.get()
+        if not len(matcher):
+            logger.info("Aucun article conventionnel dans la BD. Tous les articles sont marqués comme temporaires.")
+            for item in items:
+                item['is_conventional'] = False
+            return items
 
-            logger.info("Envoi de la requête de comparaison en batch à l'IA...")
-            response = requests.post(self.completion_url, headers=headers, json=payload, timeout=45)
-            response.raise_for_status()
+        ambiguous = {}
+        for item in items:
+            name = item.get('name')
+            result = matcher.match(name) if name else None
+            if result is None or result.status == MatchResult.NONE:
+                item['is_conventional'] = False
+                metrics.increment('item_matcher.local_none')
+            elif result.status in (MatchResult.EXACT, MatchResult.CONFIDENT):
+                self._apply_match(item, result.best)
+                metrics.increment(f'item_matcher.local_{result.status}')
+                logger.debug(f"Correspondance locale ({result.status}): '{name}' -> '{item['name']}' (ID: {item['db_id']})")
+            else:
+                ambiguous[name] = result
+                metrics.increment('item_matcher.ambiguous')
 
-            response_data = response.json()
-            ai_results_str = response_data['choices'][0]['message']['content']
-            logger.debug(f"Réponse JSON brute de l'IA: {ai_results_str}")
+        self._add_semantic_candidates(items, matcher, ambiguous)
 
-            matched_results = json.loads(ai_results_str).get("matched_items", [])
-            match_map = {str(result['original_name']).lower(): result for result in matched_results}
+        if ambiguous:
+            try:
+                resolved = self._resolve_ambiguous_matches(ambiguous)
+            except ServiceUnavailableError:
+                # Surcharge ou disjoncteur ouvert: l'appelant reçoit une erreur explicite plutôt qu'un résultat dégradé
+                raise
+            except requests.exceptions.Timeout:
+                logger.error("Erreur: La requête vers l'API OpenAI a expiré.")
+                resolved = None
+            except requests.exceptions.RequestException as e:
+                logger.error(f"Erreur: Problème de connexion avec l'API OpenAI: {e}")
+                resolved = None
+            except ai_schemas.SchemaViolationError as e:
+                logger.error(f"Erreur: Réponse de comparaison non conforme au schéma: {e}")
+                resolved = None
+            except Exception as e:
+                logger.error(f"Erreur majeure inattendue lors de la comparaison en batch: {e}")
+                resolved = None
+            if resolved is None:
+                # Les noms ambigus sont alors marqués comme temporaires
+                metrics.increment('item_matcher.fallbacks')
+                resolved = {}
 
             for item in items:
-                item_name_lower = str(item.get('name', '')).lower()
-                ai_match = match_map.get(item_name_lower)
-
-                if ai_match and ai_match.get('is_conventional'):
-                    item['is_conventional'] = True
-                    item['db_id'] = ai_match['db_id']
-                    item['name'] = ai_match['db_name']
-
-                    matched_db_item = next((db_item for db_item in db_conventional_items if db_item.id == ai_match['db_id']), None)
-                    if matched_db_item:
-                        item['zone_id'] = matched_db_item.zone_id
-                        item['furniture_id'] = matched_db_item.furniture_id
-                        item['drawer_id'] = matched_db_item.drawer_id
-                        item['location_info'] = matched_db_item.location_info
-                        logger.debug(f"Correspondance trouvée: '{item_name_lower}' -> '{item['name']}' (ID: {item['db_id']})")
+                name = item.get('name')
+                if name not in ambiguous:
+                    continue
+                record = resolved.get(name.lower())
+                if record is not None:
+                    self._apply_match(item, record)
+                    logger.debug(f"Correspondance trouvée par l'IA: '{name}' -> '{item['name']}' (ID: {item['db_id']})")
                 else:
                     item['is_conventional'] = False
-                    logger.debug(f"Aucune correspondance trouvée pour: '{item_name_lower}'")
-
-            conventional_count = sum(1 for item in items if item.get('is_conventional'))
-            logger.info(f"Comparaison terminée: {len(items)} articles traités, {conventional_count} conventionnels.")
-            return items
-
-        except requests.exceptions.Timeout:
-            logger.error("Erreur: La requête vers l'API OpenAI a expiré.")
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Erreur: Problème de connexion avec l'API OpenAI: {e}")
-        except (json.JSONDecodeError, KeyError) as e:
-            logger.error(f"Erreur: Impossible de parser la réponse JSON de l'IA: {e}")
-        except Exception as e:
-            logger.error(f"Erreur majeure inattendue lors de la comparaison en batch: {e}")
+                    logger.debug(f"Aucune correspondance trouvée pour: '{name}'")
 
-        logger.warning("Fallback: tous les articles sont marqués comme temporaires en raison d'une erreur.")
-        for item in items:
-            item['is_conventional'] = False
+        conventional_count = sum(1 for item in items if item.get('is_conventional'))
+        logger.info(
+            f"Comparaison terminée: {len(items)} articles traités, {conventional_count} conventionnels, "
+            f"{len(ambiguous)} soumis à l'IA."
+        )
         return items
 
 # Instance singleton du service
@@ -0,0 +1,189 @@
+"""
+Passerelle asynchrone vers l'API d'IA.
+Une boucle asyncio tourne dans un thread dédié avec un client HTTP asynchrone (httpx, pool de connexions
+partagé): les appels de tous les threads y sont multiplexés. Le thread appelant soumet une coroutine
+et attend son résultat; la réponse est adaptée à l'interface de `requests` utilisée par AIService.
+httpx est optionnel: sans lui, AIService conserve sa session `requests` synchrone.
+"""
+import atexit
+import asyncio
+import logging
+import threading
+import requests
+
+try:
+    import httpx
+except ImportError:  # dépendance optionnelle
+    httpx = None
+
+logger = logging.getLogger(__name__)
+# httpx journalise chaque requête au niveau INFO
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# Attente maximale (secondes) indiquée par un Retry-After avant une nouvelle tentative
+MAX_RETRY_AFTER = 30
+
+
+def gateway_available():
+    return httpx is not None
+
+
+class _Request:
+    """Requête envoyée (corps et en-têtes pour les métriques de taille)"""
+    __slots__ = ('body', 'headers')
+
+    def __init__(self, request):
+        self.headers = request.headers
+        try:
+            self.body = request.content
+        except httpx.RequestNotRead:
+            # Corps multipart envoyé en flux: seule la taille annoncée (Content-Length) est disponible
+            self.body = None
+
+
+class GatewayResponse:
+    """Réponse httpx présentée avec l'interface de requests.Response utilisée par AIService"""
+
+    def __init__(self, response):
+        self._response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.content = response.content
+        self.elapsed = response.elapsed
+        self.request = _Request(response.request)
+        self.url = str(response.url)
+
+    @property
+    def text(self):
+        return self._response.text
+
+    def json(self):
+        return self._response.json()
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+    def iter_lines(self):
+        return iter(self.content.splitlines())
+
+    def close(self):
+        pass
+
+
+def _split_files(files):
+    """Sépare les champs de formulaire (nom de fichier None) des fichiers d'un corps multipart"""
+    if not files:
+        return None, None
+    data = {}
+    uploads = {}
+    for key, value in files.items():
+        if isinstance(value, tuple) and value[0] is None:
+            data[key] = value[1]
+        else:
+            uploads[key] = value
+    return data or None, uploads or None
+
+
+def _timeout(timeout):
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+        return httpx.Timeout(read, connect=connect)
+    return httpx.Timeout(timeout)
+
+
+class AsyncGateway:
+    """
+    Boucle d'événements dans un thread dédié et client HTTP asynchrone partagé.
+    Les nouvelles tentatives (429/5xx, backoff exponentiel, Retry-After) se font sur la boucle,
+    sans occuper de thread pendant l'attente.
+    """
+
+    def __init__(self, max_connections=100, max_keepalive=20, max_retries=3, backoff_factor=0.5):
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self._loop = None
+        self._client = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=loop.run_forever, name='ai-gateway', daemon=True)
+            self._thread.start()
+            self._loop = loop
+            self._client = asyncio.run_coroutine_threadsafe(self._make_client(), loop).result()
+            logger.info("Passerelle asynchrone démarrée (%s connexions max)", self.max_connections)
+
+    async def _make_client(self):
+        # Le client est créé sur la boucle qui l'utilisera
+        return httpx.AsyncClient(limits=httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=min(self.max_keepalive, self.max_connections),
+        ))
+
+    def submit(self, coroutine):
+        """Planifie une coroutine sur la boucle de la passerelle et retourne un concurrent.futures.Future"""
+        self._ensure_started()
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+    def _retry_delay(self, attempt, response):
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(int(retry_after), MAX_RETRY_AFTER)
+        return self.backoff_factor * (2 ** attempt)
+
+    async def request(self, method, url, headers=None, json=None, files=None, timeout=None):
+        """Envoie la requête (avec nouvelles tentatives) et retourne la réponse httpx lue intégralement"""
+        data, uploads = _split_files(files)
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            try:
+                response = await self._client.request(
+                    method, url, headers=headers, json=json, data=data, files=uploads, timeout=_timeout(timeout)
+                )
+            except httpx.TimeoutException as e:
+                raise requests.exceptions.Timeout(str(e)) from e
+            except httpx.TransportError as e:
+                if last_attempt:
+                    raise requests.exceptions.ConnectionError(str(e)) from e
+                await asyncio.sleep(self._retry_delay(attempt, None))
+                continue
+            if response.status_code not in RETRY_STATUS_CODES or last_attempt:
+                return response
+            await asyncio.sleep(self._retry_delay(attempt, response))
+
+    def post(self, url, headers=None, json=None, files=None, timeout=None):
+        """Appel bloquant pour le thread appelant, exécuté sur la boucle de la passerelle"""
+        response = self.submit(self.request('POST', url, headers=headers, json=json, files=files, timeout=timeout)).result()
+        return GatewayResponse(response)
+
+    def close(self):
+        with self._lock:
+            if self._loop is None:
+                return
+            try:
+                asyncio.run_coroutine_threadsafe(self._client.aclose(), self._loop).result(timeout=5)
+            except Exception as e:
+                logger.debug(f"Fermeture du client asynchrone: {e}")
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop = None
+            self._client = None
+
+
+def build_gateway(max_connections=100, max_keepalive=20, max_retries=3, backoff_factor=0.5):
+    """Passerelle asynchrone, ou None si httpx n'est pas installé"""
+    if not gateway_available():
+        logger.warning("AI_ASYNC_GATEWAY activé mais httpx n'est pas installé: session HTTP synchrone conservée")
+        return None
+    gateway = AsyncGateway(max_connections=max_connections, max_keepalive=max_keepalive,
+                           max_retries=max_retries, backoff_factor=backoff_factor)
+    atexit.register(gateway.close)
+    return gateway
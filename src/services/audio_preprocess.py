@@ -0,0 +1,125 @@
+"""
+Prétraitement des enregistrements WAV/PCM avant transcription:
+suppression des silences de début et de fin (énergie RMS), passage en mono et rééchantillonnage à 16 kHz.
+Un fichier plus court et plus léger réduit le temps d'envoi et la durée facturée par l'API.
+"""
+import io
+import os
+import wave
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+WAV_MIME_TYPES = frozenset(['audio/wav', 'audio/x-wav', 'audio/wave', 'audio/vnd.wave'])
+
+TARGET_SAMPLE_RATE = 16000
+# Seuil de silence en dBFS (énergie RMS d'une trame) et marge conservée autour de la parole
+SILENCE_THRESHOLD_DB = float(os.environ.get('AI_AUDIO_SILENCE_DB', -45))
+FRAME_MS = 20
+PADDING_MS = 200
+# Débit montant estimé (octets/s) pour évaluer le temps d'envoi économisé
+UPLINK_BYTES_PER_SECOND = float(os.environ.get('AI_AUDIO_UPLINK_BPS', 250000))
+
+_SAMPLE_TYPES = {1: np.uint8, 2: np.int16, 4: np.int32}
+
+
+def is_wav(mime_type):
+    return (mime_type or '').split(';')[0].strip().lower() in WAV_MIME_TYPES
+
+
+def _decode(data):
+    """Décode un WAV PCM en (échantillons float32 [trames x canaux], fréquence)"""
+    with wave.open(io.BytesIO(data), 'rb') as reader:
+        channels = reader.getnchannels()
+        sample_width = reader.getsampwidth()
+        rate = reader.getframerate()
+        frames = reader.readframes(reader.getnframes())
+    if sample_width not in _SAMPLE_TYPES:
+        raise ValueError(f"Largeur d'échantillon non prise en charge: {sample_width} octet(s)")
+    samples = np.frombuffer(frames, dtype=_SAMPLE_TYPES[sample_width]).astype(np.float32)
+    if sample_width == 1:
+        samples = (samples - 128.0) / 128.0
+    else:
+        samples /= float(2 ** (8 * sample_width - 1))
+    return samples.reshape(-1, channels), rate
+
+
+def _encode(samples, rate):
+    """Encode des échantillons mono float32 en WAV PCM 16 bits"""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype('<i2')
+    output = io.BytesIO()
+    with wave.open(output, 'wb') as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(rate)
+        writer.writeframes(pcm.tobytes())
+    return output.getvalue()
+
+
+def trim_silence(samples, rate, threshold_db=SILENCE_THRESHOLD_DB):
+    """Retire les silences de début et de fin (trames dont l'énergie RMS est sous le seuil)"""
+    frame_size = max(1, int(rate * FRAME_MS / 1000))
+    frame_count = len(samples) // frame_size
+    if frame_count == 0:
+        return samples
+    frames = samples[:frame_count * frame_size].reshape(frame_count, frame_size)
+    rms = np.sqrt(np.mean(frames ** 2, axis=1))
+    voiced = np.nonzero(rms > 10 ** (threshold_db / 20))[0]
+    if not len(voiced):
+        # Aucun signal au-dessus du seuil: l'enregistrement est conservé tel quel
+        return samples
+    padding = int(rate * PADDING_MS / 1000)
+    start = max(0, voiced[0] * frame_size - padding)
+    end = min(len(samples), (voiced[-1] + 1) * frame_size + padding)
+    return samples[start:end]
+
+
+def resample(samples, rate, target_rate=TARGET_SAMPLE_RATE):
+    """Rééchantillonnage par interpolation linéaire"""
+    if rate == target_rate or not len(samples):
+        return samples
+    target_length = int(round(len(samples) * target_rate / rate))
+    positions = np.linspace(0, len(samples) - 1, num=target_length)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def preprocess_wav(data, target_rate=TARGET_SAMPLE_RATE):
+    """
+    Prépare un enregistrement WAV pour la transcription
+
+    Args:
+        data (bytes): Contenu du fichier WAV
+        target_rate (int): Fréquence d'échantillonnage de sortie
+
+    Returns:
+        tuple: (contenu WAV mono 16 bits, statistiques du traitement)
+    """
+    samples, rate = _decode(data)
+    original_duration = len(samples) / rate if rate else 0.0
+    mono = samples.mean(axis=1) if samples.shape[1] > 1 else samples[:, 0]
+    trimmed = trim_silence(mono, rate)
+    # Jamais de suréchantillonnage (audio téléphonique à 8 kHz): il grossirait l'envoi sans rien apporter
+    output_rate = min(rate, target_rate)
+    processed = _encode(resample(trimmed, rate, output_rate), output_rate)
+    trimmed_seconds = original_duration - len(trimmed) / rate
+
+    # Un traitement qui n'allège pas l'envoi est abandonné: le fichier d'origine est transmis
+    kept_original = len(processed) >= len(data)
+    if kept_original:
+        processed, output_rate, trimmed_seconds = data, rate, 0.0
+
+    saved_bytes = len(data) - len(processed)
+    stats = {
+        'original_bytes': len(data),
+        'processed_bytes': len(processed),
+        'saved_bytes': saved_bytes,
+        'original_seconds': round(original_duration, 3),
+        'trimmed_seconds': round(trimmed_seconds, 3),
+        'estimated_upload_seconds_saved': round(saved_bytes / UPLINK_BYTES_PER_SECOND, 3),
+        'channels': int(samples.shape[1]),
+        'sample_rate': rate,
+        'output_sample_rate': output_rate,
+        'kept_original': kept_original,
+    }
+    return processed, stats
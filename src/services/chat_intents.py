@@ -0,0 +1,185 @@
+"""
+Réponses directes aux questions fréquentes du chat inventaire.
+"Où est X ?", "Qui a emprunté X ?" et "Combien de Y ?" sont reconnues par expressions régulières
+et répondues à partir de la base (index de correspondance des articles et emprunts en cours),
+sans appel au modèle. Les autres questions, ou un article introuvable, sont transmises à l'IA.
+"""
+import os
+import re
+import logging
+from src.models import db
+from src.models.borrow import Borrow
+from src.models.user import User
+from src.services.inventory_index import normalize_text
+from src.services.item_matcher import item_matcher_cache, MatchResult
+from src.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+CHAT_INTENTS_ENABLED = os.environ.get('AI_CHAT_INTENTS', 'true').lower() in ('1', 'true')
+
+WHERE = 'where'
+WHO_BORROWED = 'who_borrowed'
+COUNT = 'count'
+
+# Expressions appliquées à la question normalisée (minuscules, sans accents, apostrophes suivies d'un espace)
+INTENT_PATTERNS = [
+    (WHERE, re.compile(
+        r"^(?:ou (?:est|sont|se trouvent?|trouver|je trouve|puis-je trouver|est range(?:e|s|es)?|sont range(?:e|s|es)?|a ete range(?:e)?)"
+        r"|dans quel(?:le)? (?:zone|meuble|tiroir|endroit) (?:est|sont|se trouvent?|est range(?:e|s|es)?))"
+        r" (?P<subject>.+)$"
+    )),
+    (WHO_BORROWED, re.compile(
+        r"^qui (?:a|avait|a deja) (?:emprunte|pris|recupere) (?P<subject>.+)$"
+        r"|^qui (?:a|possede|utilise) (?P<subject2>(?:le|la|les|l') .+)$"
+    )),
+    (COUNT, re.compile(
+        r"^combien (?:y a-t-il |y-a-t-il |ya-t-il |il y a |avons-nous |ai-je |a-t-on )?(?:de |d' )(?P<subject>.+)$"
+    )),
+]
+
+# Fins de question ignorées ("... dans l'inventaire", "... actuellement")
+SUBJECT_SUFFIX = re.compile(
+    r"(?: (?:y a-t-il|ya-t-il|il y a|avons-nous|avons nous|ai-je|a-t-on|actuellement|en ce moment|en stock"
+    r"|dans l' inventaire|au total|aujourd' hui|exactement|svp|stp))+$"
+)
+SUBJECT_PREFIX = re.compile(r"^(?:(?:le|la|les|l'|un|une|des|du|de|d'|mon|ma|mes|notre|nos) )+")
+
+
+# Marques du pluriel dans la question ("où sont les tournevis", "où se trouvent mes pinces")
+PLURAL_VERBS = re.compile(r"\b(?:sont|se trouvent)\b")
+PLURAL_DETERMINERS = frozenset(['les', 'des', 'mes', 'nos'])
+
+
+class Intent:
+    """Intention reconnue, nom de l'article concerné et sujet au pluriel"""
+    __slots__ = ('kind', 'subject', 'plural')
+
+    def __init__(self, kind, subject, plural=False):
+        self.kind = kind
+        self.subject = subject
+        self.plural = plural
+
+
+def classify(question):
+    """
+    Reconnaît l'intention d'une question
+
+    Returns:
+        Intent: intention et sujet, ou None si la question doit être confiée au modèle
+    """
+    text = re.sub(r"['’]", "' ", normalize_text(question or ''))
+    text = ' '.join(text.replace('?', ' ').replace('!', ' ').split()).rstrip(' .')
+    for kind, pattern in INTENT_PATTERNS:
+        match = pattern.match(text)
+        if not match:
+            continue
+        group = 'subject' if match.group('subject') else 'subject2'
+        subject = SUBJECT_SUFFIX.sub('', match.group(group) or '')
+        prefix = SUBJECT_PREFIX.match(subject)
+        plural = bool(PLURAL_VERBS.search(text[:match.start(group)])) or bool(
+            prefix and PLURAL_DETERMINERS.intersection(prefix.group(0).split())
+        )
+        subject = subject[prefix.end():].strip() if prefix else subject.strip()
+        if subject:
+            return Intent(kind, subject, plural)
+    return None
+
+
+def _active_borrows(item_ids):
+    """Emprunts en cours des articles donnés: {item_id: [(nom de l'emprunteur, date de retour prévue)]}"""
+    rows = db.session.query(Borrow.item_id, User.name, Borrow.expected_return_date).join(
+        User, User.id == Borrow.user_id
+    ).filter(Borrow.item_id.in_(item_ids), Borrow.returned.is_(False)).all()
+    borrows = {}
+    for item_id, user_name, expected_return_date in rows:
+        borrows.setdefault(item_id, []).append((user_name, expected_return_date))
+    return borrows
+
+
+def _resolve(subject, include_related=False):
+    """
+    Articles conventionnels correspondant au sujet (résolution locale uniquement)
+
+    Args:
+        subject (str): Nom de l'article dans la question
+        include_related (bool): Ajouter à la meilleure correspondance les articles dont le nom contient
+                                le sujet ("combien de tournevis" compte aussi "Tournevis plat")
+    """
+    matcher = item_matcher_cache.get()
+    result = matcher.match(subject)
+    if result.status not in (MatchResult.EXACT, MatchResult.CONFIDENT):
+        # Nom générique ("tournevis"): tous les articles dont le nom contient ces mots
+        return matcher.containing(subject)
+    records = [result.best]
+    if include_related:
+        records += [record for record in matcher.containing(subject) if record.id != result.best.id]
+    return records
+
+
+def _borrow_text(borrows):
+    return ', '.join(
+        f"{user_name} (retour prévu le {expected_return_date:%d/%m/%Y})" if expected_return_date else user_name
+        for user_name, expected_return_date in borrows
+    )
+
+
+def _answer_where(records, borrows):
+    lines = []
+    for record in records[:10]:
+        line = f"{record.name} : {record.location_info}"
+        if record.id in borrows:
+            line += f" (actuellement emprunté par {_borrow_text(borrows[record.id])})"
+        lines.append(line)
+    if len(lines) == 1:
+        return lines[0] + '.'
+    return "Plusieurs articles correspondent :\n- " + '\n- '.join(lines)
+
+
+def _answer_who_borrowed(records, borrows):
+    lines = []
+    for record in records[:10]:
+        if record.id in borrows:
+            lines.append(f"{record.name} est emprunté par {_borrow_text(borrows[record.id])}.")
+        else:
+            lines.append(f"{record.name} n'est pas emprunté actuellement ({record.location_info}).")
+    return '\n'.join(lines)
+
+
+def _answer_count(records, borrows):
+    borrowed = sum(1 for record in records if record.id in borrows)
+    names = ', '.join(record.name for record in records[:10]) + (', ...' if len(records) > 10 else '')
+    answer = f"Il y a {len(records)} article(s) correspondant dans l'inventaire : {names}."
+    if borrowed:
+        answer += f" Dont {borrowed} actuellement emprunté(s)."
+    return answer
+
+
+def answer(question):
+    """
+    Répond à une question reconnue à partir de la base (doit être appelé dans un contexte d'application)
+
+    Returns:
+        str: la réponse, ou None si la question n'est pas reconnue ou qu'aucun article ne correspond
+    """
+    if not CHAT_INTENTS_ENABLED:
+        return None
+    intent = classify(question)
+    if intent is None:
+        metrics.increment('chat_intents.unrecognized')
+        return None
+
+    records = _resolve(intent.subject, include_related=intent.kind == COUNT or (intent.kind == WHERE and intent.plural))
+    if not records:
+        # Synonyme ou reformulation: le modèle, avec le contexte de l'inventaire, fera mieux
+        metrics.increment(f'chat_intents.{intent.kind}.unresolved')
+        logger.debug(f"Intention {intent.kind} reconnue mais aucun article pour '{intent.subject}'")
+        return None
+
+    borrows = _active_borrows([record.id for record in records])
+    metrics.increment(f'chat_intents.{intent.kind}.answered')
+    if intent.kind == WHERE:
+        return _answer_where(records, borrows)
+    if intent.kind == WHO_BORROWED:
+        return _answer_who_borrowed(records, borrows)
+    return _answer_count(records, borrows)
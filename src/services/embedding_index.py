@@ -0,0 +1,236 @@
+"""
+Index vectoriel des noms d'articles.
+Chaque nom est vectorisé une seule fois (vecteur float32 persisté dans `item_embedding`),
+puis tous les vecteurs sont chargés dans une matrice NumPy normalisée: une recherche
+par lot se réduit à un produit matriciel (similarité cosinus).
+"""
+import os
+import time
+import hashlib
+import logging
+import threading
+import numpy as np
+from sqlalchemy import select
+from src.models import db
+from src.models.item import Item
+from src.models.item_embedding import ItemEmbedding
+from src.services.inventory_cache import inventory_version, normalize_question
+from src.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BATCH_SIZE = 256
+
+# Similarité cosinus minimale d'un résultat (en deçà, le voisin n'est pas considéré comme pertinent)
+MIN_SCORE = float(os.environ.get('AI_EMBEDDING_MIN_SCORE', 0.5))
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+def text_hash(text):
+    return hashlib.sha1((text or '').encode('utf-8')).hexdigest()
+
+
+class HashingEmbedder:
+    """
+    Embedding local et déterministe (hachage signé des mots et trigrammes de caractères).
+    Sans appel réseau: utilisé par défaut et pour les essais hors ligne.
+    Purement lexical (proche de l'appariement par trigrammes): aucune similarité sémantique,
+    utiliser le backend 'openai' pour rapprocher des synonymes.
+    """
+
+    def __init__(self, dim=256):
+        self.dim = dim
+        self.name = f'hashing-{dim}'
+
+    def _features(self, text):
+        normalized = normalize_question(text)
+        for word in normalized.split():
+            yield 'w:' + word, 1.0
+        padded = f"  {normalized} "
+        for i in range(len(padded) - 2):
+            yield 't:' + padded[i:i + 3], 0.5
+
+    def embed(self, texts):
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in self._features(text):
+                digest = int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'little')
+                sign = 1.0 if digest & 1 else -1.0
+                matrix[row, (digest >> 1) % self.dim] += sign * weight
+        return _normalize_rows(matrix)
+
+
+class OpenAIEmbedder:
+    """Embedding via l'endpoint /v1/embeddings d'OpenAI"""
+
+    def __init__(self, post, model='text-embedding-3-small'):
+        # `post(json=...)` envoie la requête (URL, en-têtes et délais fournis par l'appelant)
+        self.post = post
+        self.name = model
+
+    def embed(self, texts):
+        response = self.post(json={'model': self.name, 'input': list(texts)})
+        response.raise_for_status()
+        data = sorted(response.json()['data'], key=lambda entry: entry['index'])
+        return _normalize_rows(np.asarray([entry['embedding'] for entry in data], dtype=np.float32))
+
+
+class EmbeddingIndex:
+    """
+    Matrice des vecteurs des noms d'articles, synchronisée avec la version de l'inventaire.
+    Seuls les articles nouveaux ou renommés sont vectorisés lors d'un rafraîchissement.
+    """
+
+    def __init__(self, embedder=None):
+        self._lock = threading.RLock()
+        self.configure(embedder)
+
+    def configure(self, embedder):
+        """Change le backend d'embedding (les vecteurs existants sont alors recalculés)"""
+        with self._lock:
+            self.embedder = embedder
+            self._vectors = {}
+            self._loaded = False
+            self._version = None
+            # Matrices (ids, vecteurs) de tous les articles et des seuls articles conventionnels
+            self._all = (np.zeros(0, dtype=np.int64), None)
+            self._permanent = (np.zeros(0, dtype=np.int64), None)
+
+    @property
+    def enabled(self):
+        return self.embedder is not None
+
+    def _load_stored_vectors(self):
+        table = ItemEmbedding.__table__
+        with db.engine.connect() as connection:
+            rows = connection.execute(table.select().where(table.c.model == self.embedder.name)).all()
+        for row in rows:
+            self._vectors[row.item_id] = (row.text_hash, np.frombuffer(row.vector, dtype=np.float32))
+        self._loaded = True
+
+    def _store_vectors(self, entries):
+        """
+        Persiste les nouveaux vecteurs sur une connexion dédiée: la session de la requête appelante
+        (et son éventuel travail en cours) n'est ni validée ni annulée.
+        En cas d'échec, les vecteurs restent disponibles en mémoire.
+        """
+        item_ids = [item_id for item_id, _, _ in entries]
+        table = ItemEmbedding.__table__
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(table.delete().where(table.c.item_id.in_(item_ids)))
+                connection.execute(table.insert(), [
+                    {'item_id': item_id, 'model': self.embedder.name, 'text_hash': digest,
+                     'dim': int(vector.shape[0]), 'vector': vector.tobytes()}
+                    for item_id, digest, vector in entries
+                ])
+        except Exception as e:
+            logger.warning("Impossible d'enregistrer les embeddings: %s", e)
+
+    def refresh(self):
+        """
+        Synchronise les vecteurs avec l'inventaire (doit être appelé dans un contexte d'application).
+        Les appels au backend d'embedding se font hors du verrou: une recherche concurrente continue
+        d'utiliser la matrice précédente pendant la vectorisation.
+        """
+        version = inventory_version.value
+        with self._lock:
+            if self._version == version:
+                return
+            if not self._loaded:
+                self._load_stored_vectors()
+            embedder = self.embedder
+            known = dict(self._vectors)
+
+        # Lecture sur une connexion dédiée: seuls les articles validés sont indexés, sans flush
+        # ni transaction ouverte dans la session de l'appelant
+        item_table = Item.__table__
+        with db.engine.connect() as connection:
+            items = connection.execute(
+                select(item_table.c.id, item_table.c.name, item_table.c.is_temporary).order_by(item_table.c.id)
+            ).all()
+        missing = [(item_id, name) for item_id, name, _ in items
+                   if known.get(item_id, (None,))[0] != text_hash(name)]
+        for start in range(0, len(missing), EMBEDDING_BATCH_SIZE):
+            batch = missing[start:start + EMBEDDING_BATCH_SIZE]
+            vectors = embedder.embed([name for _, name in batch])
+            entries = [(item_id, text_hash(name), vectors[row]) for row, (item_id, name) in enumerate(batch)]
+            for item_id, digest, vector in entries:
+                known[item_id] = (digest, vector)
+            self._store_vectors(entries)
+            metrics.increment('embedding_index.embedded_items', len(entries))
+
+        with self._lock:
+            # Backend changé entre-temps, ou index déjà synchronisé sur une version plus récente
+            if self.embedder is not embedder or (self._version is not None and self._version >= version):
+                return
+            known_ids = {item_id for item_id, _, _ in items}
+            self._vectors = {item_id: entry for item_id, entry in known.items() if item_id in known_ids}
+            ids = np.asarray([item_id for item_id, _, _ in items], dtype=np.int64)
+            matrix = np.vstack([self._vectors[item_id][1] for item_id, _, _ in items]) if items else None
+            permanent = np.asarray([not is_temporary for _, _, is_temporary in items], dtype=bool)
+            self._all = (ids, matrix)
+            self._permanent = (ids[permanent], matrix[permanent] if matrix is not None else None)
+            self._version = version
+        metrics.increment('embedding_index.refreshes')
+        if missing:
+            logger.info("Index vectoriel mis à jour: %s nom(s) vectorisé(s), %s article(s)", len(missing), len(items))
+
+    def search(self, texts, top_k=5, include_temporary=True, min_score=MIN_SCORE):
+        """
+        Recherche par lot des articles les plus proches de chaque texte
+
+        Args:
+            texts (list): Textes à rechercher
+            top_k (int): Nombre de résultats par texte
+            include_temporary (bool): Inclure les articles temporaires
+            min_score (float): Similarité minimale des résultats retournés
+
+        Returns:
+            list: Pour chaque texte, une liste de (score cosinus, item_id) triée par score décroissant
+        """
+        if not texts:
+            return []
+        if not self.enabled:
+            return [[] for _ in texts]
+        self.refresh()
+        started = time.perf_counter()
+        with self._lock:
+            ids, matrix = self._all if include_temporary else self._permanent
+        if matrix is None or not len(ids):
+            return [[] for _ in texts]
+
+        scores = self.embedder.embed(list(texts)) @ matrix.T
+        limit = min(top_k, len(ids))
+        top = np.argpartition(-scores, limit - 1, axis=1)[:, :limit]
+        results = []
+        for row, columns in enumerate(top):
+            ranked = sorted(columns, key=lambda column: -scores[row, column])
+            results.append([(float(scores[row, column]), int(ids[column])) for column in ranked if scores[row, column] >= min_score])
+        metrics.observe('embedding_index.search_seconds', time.perf_counter() - started)
+        return results
+
+
+def build_embedder(backend, post=None):
+    """
+    Construit le backend d'embedding configuré ('hashing', 'openai' ou 'none')
+
+    Args:
+        backend (str): Nom du backend
+        post (callable): Fonction d'envoi vers l'endpoint d'embeddings (backend 'openai')
+    """
+    backend = (backend or 'hashing').strip().lower()
+    if backend in ('none', 'off', ''):
+        return None
+    if backend == 'openai':
+        return OpenAIEmbedder(post, model=os.environ.get('OPENAI_EMBEDDING_MODEL', 'text-embedding-3-small'))
+    return HashingEmbedder(dim=int(os.environ.get('AI_EMBEDDING_DIM', 256)))
+
+
+# Le backend (AI_EMBEDDING_BACKEND) est installé par le service IA, qui fournit l'accès à l'API
+embedding_index = EmbeddingIndex()
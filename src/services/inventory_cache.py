@@ -0,0 +1,179 @@
+"""
+Version de l'inventaire et caches associés.
+La version est incrémentée à chaque commit modifiant un article ou un emplacement;
+les valeurs dérivées de l'inventaire (contexte du chat, réponses...) sont indexées par cette version.
+"""
+import re
+import time
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from itertools import chain
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from src.models.item import Item
+from src.models.location import Zone, Furniture, Drawer
+from src.models.location_node import LocationNode
+from src.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+TRACKED_MODELS = (Item, Zone, Furniture, Drawer, LocationNode)
+
+
+class InventoryVersion:
+    """Compteur monotone de la version de l'inventaire (propre au processus)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._value = 0
+
+    @property
+    def value(self):
+        return self._value
+
+    def bump(self):
+        with self._lock:
+            self._value += 1
+            return self._value
+
+
+inventory_version = InventoryVersion()
+
+
+class VersionedCache:
+    """
+    Cache de valeurs calculées pour la version courante de l'inventaire.
+    Les entrées d'une version plus ancienne sont purgées dès qu'une version plus récente est vue.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._version = None
+        self._values = {}
+
+    def get_or_build(self, version, key, builder):
+        """
+        Retourne la valeur associée à (version, key), en la calculant avec `builder()` si nécessaire
+        """
+        with self._lock:
+            if self._version is None or version > self._version:
+                self._version = version
+                self._values = {}
+            if version == self._version and key in self._values:
+                metrics.increment(f'{self.name}.hits')
+                return self._values[key]
+        metrics.increment(f'{self.name}.misses')
+        value = builder()
+        with self._lock:
+            if version == self._version:
+                self._values[key] = value
+        return value
+
+
+class TTLLRUCache:
+    """
+    Cache LRU borné dont les entrées expirent après `ttl` secondes.
+    Les accès réussis et manqués sont comptés dans les métriques sous `name`.
+    """
+
+    def __init__(self, name, max_size=256, ttl=600):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key):
+        """Retourne la valeur associée à la clé, ou None si absente ou expirée"""
+        if self.max_size <= 0:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                metrics.increment(f'{self.name}.hits')
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+                metrics.increment(f'{self.name}.expired')
+        metrics.increment(f'{self.name}.misses')
+        return None
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                metrics.increment(f'{self.name}.evictions')
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def normalize_text(text):
+    """Met en minuscules et retire les accents"""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+
+def normalize_question(question):
+    """Normalise une question pour la clé de cache (casse, accents, ponctuation, espaces)"""
+    return ' '.join(re.findall(r'[a-z0-9]+', normalize_text(question)))
+
+
+class ChatAnswerCache:
+    """
+    Cache des réponses du chat inventaire, indexé par question normalisée et version de l'inventaire.
+    Toute nouvelle version de l'inventaire vide le cache.
+    """
+
+    def __init__(self, max_size=256, ttl=600):
+        self._cache = TTLLRUCache('chat_answer_cache', max_size=max_size, ttl=ttl)
+        self._lock = threading.Lock()
+        self._version = None
+
+    def _check_version(self, version):
+        with self._lock:
+            if self._version is None or version > self._version:
+                self._version = version
+                self._cache.clear()
+            return version == self._version
+
+    def get(self, question, version):
+        if not self._check_version(version):
+            return None
+        return self._cache.get(normalize_question(question))
+
+    def put(self, question, version, answer):
+        if self._check_version(version):
+            self._cache.put(normalize_question(question), answer)
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_inventory_changes(session, flush_context):
+    if any(isinstance(obj, TRACKED_MODELS) for obj in chain(session.new, session.dirty, session.deleted)):
+        session.info['inventory_changed'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_inventory_version(session):
+    if session.info.pop('inventory_changed', False):
+        version = inventory_version.bump()
+        logger.debug("Version de l'inventaire incrémentée: %s", version)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_inventory_changes(session):
+    session.info.pop('inventory_changed', None)
@@ -0,0 +1,280 @@
+"""
+Index de recherche local (BM25) sur les noms d'articles et les libellés d'emplacement.
+Il sélectionne les articles pertinents pour une question du chat inventaire afin que
+la taille du prompt reste bornée quelle que soit la taille de l'inventaire.
+"""
+import os
+import math
+import logging
+import threading
+import re
+from collections import Counter, defaultdict
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload
+from src.models.item import Item
+from src.models.location import Zone, Furniture, Drawer
+from src.services.inventory_cache import inventory_version, normalize_text
+from src.services.embedding_index import embedding_index
+
+logger = logging.getLogger(__name__)
+
+# Mots vides français ignorés lors de l'indexation et de la recherche
+STOPWORDS = frozenset("""
+a ai au aux avec c ce ces combien comment d dans de des du elle en est et il ils j je l la le les
+leur m ma mes mon n ne nous on ou où par pas pour qu que quel quelle quelles quels qui quoi s sa
+se ses son sont sur t ta tes ton tu un une vos votre vous y
+""".split())
+
+TEMPORARY_ZONE_LABEL = "Articles temporaires"
+
+# Constante de la fusion par rang réciproque (Reciprocal Rank Fusion) des résultats BM25 et vectoriels
+RRF_K = 60
+
+
+def tokenize(text):
+    """
+    Découpe un texte en termes normalisés (sans accents, sans mots vides, pluriels simples retirés)
+    """
+    tokens = []
+    for token in re.split(r'[^a-z0-9]+', normalize_text(text)):
+        if not token or token in STOPWORDS:
+            continue
+        if len(token) > 3 and token[-1] in 'sx':
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class InventoryDocument:
+    """Vue légère d'un article indexé (compatible avec la construction du prompt du chat)"""
+    __slots__ = ('id', 'name', 'location_info', 'zone_name', 'furniture_name', 'is_temporary')
+
+    def __init__(self, item):
+        self.id = item.id
+        self.name = item.name
+        self.is_temporary = item.is_temporary
+        self.location_info = item.location_info
+        if item.is_temporary:
+            self.zone_name = TEMPORARY_ZONE_LABEL
+            self.furniture_name = None
+        else:
+            self.zone_name = item.zone_rel.name if item.zone_rel else "Non spécifié"
+            self.furniture_name = item.furniture_rel.name if item.furniture_rel else None
+
+    def terms(self):
+        # Le nom compte double par rapport au libellé d'emplacement
+        name_terms = tokenize(self.name)
+        return name_terms + name_terms + tokenize(self.location_info)
+
+
+class RetrievalResult:
+    """Articles retenus pour une question, avec le résumé par zone de tout l'inventaire"""
+
+    def __init__(self, items, zone_summaries, total_items, version):
+        self.items = items
+        self.zone_summaries = zone_summaries
+        self.total_items = total_items
+        # Version de l'inventaire lue avant le rafraîchissement de l'index
+        self.version = version
+
+    @property
+    def is_complete(self):
+        """True si tout l'inventaire a été retenu (la sélection ne dépend alors pas de la question)"""
+        return len(self.items) >= self.total_items
+
+
+class BM25Index:
+    """Index inversé BM25 avec mise à jour incrémentale des documents"""
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._doc_terms = {}
+        self._postings = defaultdict(dict)
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self._doc_terms)
+
+    def upsert(self, doc_id, terms):
+        self.remove(doc_id)
+        counts = Counter(terms)
+        self._doc_terms[doc_id] = (counts, len(terms))
+        self._total_length += len(terms)
+        for term, frequency in counts.items():
+            self._postings[term][doc_id] = frequency
+
+    def remove(self, doc_id):
+        previous = self._doc_terms.pop(doc_id, None)
+        if previous is None:
+            return
+        counts, length = previous
+        self._total_length -= length
+        for term in counts:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+
+    def search(self, terms, limit):
+        """Retourne les `limit` meilleurs (score, doc_id) pour les termes de la requête"""
+        if not self._doc_terms:
+            return []
+        doc_count = len(self._doc_terms)
+        average_length = self._total_length / doc_count or 1
+        scores = defaultdict(float)
+        for term in set(terms):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, frequency in postings.items():
+                length = self._doc_terms[doc_id][1]
+                norm = self.k1 * (1 - self.b + self.b * length / average_length)
+                scores[doc_id] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+        ranked = sorted(scores.items(), key=lambda entry: (-entry[1], entry[0]))
+        return [(score, doc_id) for doc_id, score in ranked[:limit]]
+
+
+class InventoryIndex:
+    """
+    Index de l'inventaire tenu à jour par les écritures sur les articles.
+    Les écritures marquent les articles concernés; l'index est rafraîchi
+    (une seule requête) à la recherche suivante.
+    """
+
+    def __init__(self, top_k=40):
+        self.top_k = top_k
+        # Verrou réentrant: un autoflush pendant le rafraîchissement déclenche les écouteurs ci-dessous
+        self._lock = threading.RLock()
+        self._bm25 = BM25Index()
+        self._documents = {}
+        self._pending_ids = set()
+        self._needs_rebuild = True
+        self._summaries = None
+
+    def mark_item_changed(self, item_id):
+        with self._lock:
+            self._pending_ids.add(item_id)
+
+    def mark_stale(self):
+        """Force une reconstruction complète (ex: renommage d'un emplacement)"""
+        with self._lock:
+            self._needs_rebuild = True
+
+    def _load_items(self, *criteria):
+        query = Item.query.options(
+            joinedload(Item.zone_rel), joinedload(Item.furniture_rel), joinedload(Item.drawer_rel)
+        )
+        return query.filter(*criteria).all() if criteria else query.all()
+
+    def _index(self, item):
+        document = InventoryDocument(item)
+        self._documents[item.id] = document
+        self._bm25.upsert(item.id, document.terms())
+
+    def refresh(self):
+        """Applique les modifications en attente (doit être appelé dans un contexte d'application)"""
+        with self._lock:
+            if self._needs_rebuild:
+                self._bm25 = BM25Index()
+                self._documents = {}
+                for item in self._load_items():
+                    self._index(item)
+                self._needs_rebuild = False
+                self._pending_ids.clear()
+                self._summaries = None
+                logger.info("Index de l'inventaire reconstruit: %s article(s)", len(self._documents))
+            elif self._pending_ids:
+                pending = set(self._pending_ids)
+                self._pending_ids.clear()
+                found = self._load_items(Item.id.in_(pending))
+                for item in found:
+                    self._index(item)
+                for item_id in pending - {item.id for item in found}:
+                    self._documents.pop(item_id, None)
+                    self._bm25.remove(item_id)
+                self._summaries = None
+
+    def zone_summaries(self):
+        """Résumé par zone: nombre d'articles par zone et par meuble (recalculé après chaque modification)"""
+        if self._summaries is not None:
+            return self._summaries
+        zones = defaultdict(Counter)
+        for document in self._documents.values():
+            zones[document.zone_name][document.furniture_name] += 1
+        summaries = []
+        for zone_name in sorted(zones):
+            furniture_counts = zones[zone_name]
+            details = ', '.join(
+                f"{name}: {count}" for name, count in sorted(furniture_counts.items(), key=lambda entry: str(entry[0])) if name
+            )
+            total = sum(furniture_counts.values())
+            summaries.append(f"{zone_name}: {total} article(s)" + (f" ({details})" if details else ''))
+        self._summaries = summaries
+        return summaries
+
+    def _semantic_search(self, query, limit):
+        """Articles les plus proches de la question selon l'index vectoriel (vide s'il est indisponible)"""
+        try:
+            return embedding_index.search([query], top_k=limit)[0]
+        except Exception as e:
+            logger.warning("Recherche vectorielle indisponible pour le chat: %s", e)
+            return []
+
+    def _fuse(self, lexical, semantic, limit):
+        """Fusionne deux classements (score, doc_id) par rang réciproque"""
+        scores = defaultdict(float)
+        for ranking in (lexical, semantic):
+            for rank, (_, doc_id) in enumerate(ranking):
+                if doc_id in self._documents:
+                    scores[doc_id] += 1.0 / (RRF_K + rank + 1)
+        return [doc_id for doc_id, _ in sorted(scores.items(), key=lambda entry: (-entry[1], entry[0]))[:limit]]
+
+    def retrieve(self, query, top_k=None):
+        """
+        Sélectionne les articles les plus pertinents pour une question
+
+        Args:
+            query (str): Question de l'utilisateur
+            top_k (int): Nombre maximal d'articles retenus
+
+        Returns:
+            RetrievalResult: Articles retenus (tout l'inventaire trié par nom, ou la sélection triée
+                             par pertinence décroissante), résumé par zone et taille de l'inventaire
+        """
+        limit = top_k or self.top_k
+        version = inventory_version.value
+        self.refresh()
+        with self._lock:
+            total = len(self._documents)
+            lexical = self._bm25.search(tokenize(query), limit) if total > limit else None
+        # La vectorisation de la question (appel éventuel au backend d'embedding) se fait hors du verrou
+        semantic = self._semantic_search(query, limit) if lexical is not None else None
+        with self._lock:
+            if lexical is None:
+                selected = sorted(self._documents.values(), key=lambda document: (normalize_text(document.name), document.id))
+            else:
+                ranked_ids = self._fuse(lexical, semantic, limit)
+                selected = [self._documents[doc_id] for doc_id in ranked_ids]
+            summaries = self.zone_summaries()
+        # La sélection reste dans l'ordre de pertinence: une troncature au budget écarte les moins pertinents
+        return RetrievalResult(selected, summaries, total, version)
+
+
+inventory_index = InventoryIndex(top_k=int(os.environ.get('AI_CHAT_TOP_K', 40)))
+
+
+# Les écritures sur les articles marquent l'article concerné; celles sur les emplacements
+# invalident l'index entier puisque les libellés indexés en dépendent.
+@event.listens_for(Item, 'after_insert')
+@event.listens_for(Item, 'after_update')
+@event.listens_for(Item, 'after_delete')
+def _item_changed(mapper, connection, target):
+    inventory_index.mark_item_changed(target.id)
+
+
+for _location_model in (Zone, Furniture, Drawer):
+    for _event_name in ('after_update', 'after_delete'):
+        event.listen(_location_model, _event_name, lambda mapper, connection, target: inventory_index.mark_stale())
@@ -0,0 +1,180 @@
+"""
+Correspondance locale entre les noms d'articles dictés et les articles conventionnels.
+Les correspondances exactes (après normalisation) ou sans ambiguïté sont résolues localement;
+seuls les noms ambigus sont soumis à l'IA, avec une courte liste de candidats.
+"""
+import os
+import difflib
+import logging
+import threading
+from collections import defaultdict
+from sqlalchemy.orm import joinedload
+from src.models.item import Item
+from src.services.inventory_cache import inventory_version
+from src.services.inventory_index import normalize_text
+from src.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Articles et déterminants ignorés en début de nom ("la perceuse" -> "perceuse")
+LEADING_ARTICLES = frozenset(['le', 'la', 'les', 'l', 'un', 'une', 'des', 'du', 'de', 'd'])
+
+# Seuils de similarité (0..1) utilisés pour classer une correspondance
+CONFIDENT_SCORE = float(os.environ.get('AI_MATCH_CONFIDENT_SCORE', 0.92))
+MIN_CANDIDATE_SCORE = float(os.environ.get('AI_MATCH_MIN_SCORE', 0.55))
+CONFIDENT_MARGIN = 0.08
+
+
+def normalize_name(name):
+    """
+    Normalise un nom d'article: minuscules, sans accents ni ponctuation,
+    sans article initial et avec les pluriels simples ramenés au singulier
+    """
+    words = ''.join(char if char.isalnum() else ' ' for char in normalize_text(name)).split()
+    while words and words[0] in LEADING_ARTICLES:
+        words = words[1:]
+    return ' '.join(word[:-1] if len(word) > 3 and word[-1] in 'sx' else word for word in words)
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class MatchRecord:
+    """Article conventionnel candidat (copie légère, indépendante de la session SQLAlchemy)"""
+    __slots__ = ('id', 'name', 'normalized', 'zone_id', 'furniture_id', 'drawer_id', 'location_info')
+
+    def __init__(self, item):
+        self.id = item.id
+        self.name = item.name
+        self.normalized = normalize_name(item.name)
+        self.zone_id = item.zone_id
+        self.furniture_id = item.furniture_id
+        self.drawer_id = item.drawer_id
+        self.location_info = item.location_info
+
+
+class MatchResult:
+    """Résultat de la correspondance locale d'un nom dicté"""
+    EXACT = 'exact'
+    CONFIDENT = 'confident'
+    AMBIGUOUS = 'ambiguous'
+    NONE = 'none'
+
+    def __init__(self, status, candidates):
+        self.status = status
+        # Liste de (score, MatchRecord) triée par score décroissant
+        self.candidates = candidates
+
+    @property
+    def best(self):
+        return self.candidates[0][1] if self.candidates else None
+
+    def merge(self, extra, limit=5):
+        """
+        Ajoute des candidats issus d'une autre recherche (ex: index vectoriel).
+        Un nom sans correspondance lexicale devient ambigu s'il reçoit des candidats.
+        """
+        seen = {record.id for _, record in self.candidates}
+        merged = self.candidates + [(score, record) for score, record in extra if record.id not in seen]
+        merged.sort(key=lambda entry: (-entry[0], entry[1].id))
+        self.candidates = merged[:limit]
+        if self.status == self.NONE and self.candidates:
+            self.status = self.AMBIGUOUS
+
+
+class ItemMatcher:
+    """Index en mémoire (nom normalisé exact + trigrammes) des articles conventionnels"""
+
+    def __init__(self, items):
+        self.records = {}
+        self._by_normalized = defaultdict(list)
+        self._by_trigram = defaultdict(set)
+        self._by_word = defaultdict(set)
+        for item in items:
+            record = MatchRecord(item)
+            self.records[record.id] = record
+            self._by_normalized[record.normalized].append(record)
+            for word in record.normalized.split():
+                self._by_word[word].add(record.id)
+            for gram in trigrams(record.normalized):
+                self._by_trigram[gram].add(record.id)
+
+    def __len__(self):
+        return len(self.records)
+
+    def candidates(self, name, limit=5):
+        """Retourne les `limit` articles les plus proches du nom, avec leur score de similarité"""
+        normalized = normalize_name(name)
+        grams = trigrams(normalized)
+        shared = defaultdict(int)
+        for gram in grams:
+            for record_id in self._by_trigram.get(gram, ()):
+                shared[record_id] += 1
+        # Pré-filtre par trigrammes communs, puis score fin par distance d'édition
+        prefiltered = sorted(shared, key=lambda record_id: -shared[record_id])[:limit * 4]
+        scored = []
+        for record_id in prefiltered:
+            record = self.records[record_id]
+            score = difflib.SequenceMatcher(None, normalized, record.normalized).ratio()
+            if score >= MIN_CANDIDATE_SCORE:
+                scored.append((score, record))
+        scored.sort(key=lambda entry: (-entry[0], entry[1].id))
+        return scored[:limit]
+
+    def containing(self, name):
+        """Retourne les articles dont le nom contient tous les mots du nom donné ("tournevis" -> "Tournevis plat", ...)"""
+        words = normalize_name(name).split()
+        if not words:
+            return []
+        ids = set.intersection(*(self._by_word.get(word, set()) for word in words))
+        return sorted((self.records[record_id] for record_id in ids), key=lambda record: (record.name.lower(), record.id))
+
+    def match(self, name):
+        """
+        Classe la correspondance d'un nom dicté
+
+        Returns:
+            MatchResult: EXACT/CONFIDENT (résolu localement), AMBIGUOUS (à arbitrer par l'IA) ou NONE
+        """
+        exact = self._by_normalized.get(normalize_name(name))
+        if exact and len(exact) == 1:
+            return MatchResult(MatchResult.EXACT, [(1.0, exact[0])])
+
+        candidates = self.candidates(name)
+        if not candidates:
+            return MatchResult(MatchResult.NONE, [])
+        best_score = candidates[0][0]
+        runner_up = candidates[1][0] if len(candidates) > 1 else 0.0
+        if not exact and best_score >= CONFIDENT_SCORE and best_score - runner_up >= CONFIDENT_MARGIN:
+            return MatchResult(MatchResult.CONFIDENT, candidates[:1])
+        return MatchResult(MatchResult.AMBIGUOUS, candidates)
+
+
+class ItemMatcherCache:
+    """Conserve l'index de correspondance de la version courante de l'inventaire"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._matcher = None
+
+    def get(self):
+        """Retourne l'index à jour (doit être appelé dans un contexte d'application)"""
+        version = inventory_version.value
+        with self._lock:
+            if self._matcher is not None and self._version == version:
+                return self._matcher
+        items = Item.query.filter_by(is_temporary=False).options(
+            joinedload(Item.zone_rel), joinedload(Item.furniture_rel), joinedload(Item.drawer_rel)
+        ).all()
+        matcher = ItemMatcher(items)
+        metrics.increment('item_matcher.rebuilds')
+        with self._lock:
+            self._version = version
+            self._matcher = matcher
+        return matcher
+
+
+item_matcher_cache = ItemMatcherCache()
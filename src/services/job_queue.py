@@ -0,0 +1,161 @@
+"""
+File de travaux asynchrones pour les traitements IA longs (reconnaissance vocale).
+Les travaux s'exécutent sur un pool de threads borné; les résultats sont consultables
+par interrogation (polling) ou par flux Server-Sent Events.
+"""
+import os
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, has_app_context
+from src.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Levée lorsque la file a atteint sa profondeur maximale"""
+
+    def __init__(self, retry_after=5):
+        super().__init__("La file de traitement est pleine. Veuillez réessayer dans quelques instants.")
+        self.retry_after = retry_after
+
+
+class Job:
+    """Etat d'un travail soumis à la file"""
+
+    def __init__(self, kind):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = 'queued'  # queued -> running -> done | error
+        self.result = None
+        self.error = None
+        self.error_type = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._finished = threading.Event()
+
+    @property
+    def finished(self):
+        return self._finished.is_set()
+
+    def wait(self, timeout=None):
+        """Attend la fin du travail; retourne True s'il est terminé"""
+        return self._finished.wait(timeout)
+
+    def to_dict(self):
+        data = {
+            'job_id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'wait_time': round(self.started_at - self.created_at, 3) if self.started_at else None,
+            'run_time': round(self.finished_at - self.started_at, 3) if self.finished_at and self.started_at else None,
+        }
+        if self.status == 'done':
+            data['result'] = self.result
+        elif self.status == 'error':
+            data['error'] = self.error
+            data['error_type'] = self.error_type
+        return data
+
+
+class JobQueue:
+    """
+    Pool de threads borné avec une profondeur de file maximale.
+    Au-delà de `max_pending` travaux en attente, les soumissions sont refusées.
+    """
+
+    def __init__(self, max_workers=4, max_pending=32, result_ttl=600):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ai-job')
+        self._jobs = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, kind, func, *args, error_classifier=None, **kwargs):
+        """
+        Soumet une fonction à exécuter en arrière-plan dans le contexte de l'application Flask
+
+        Args:
+            kind (str): Type de travail (utilisé pour les métriques)
+            func (callable): Fonction à exécuter; sa valeur de retour devient le résultat
+            error_classifier (callable): Fonction optionnelle retournant un error_type pour une exception
+
+        Returns:
+            Job: Le travail créé
+
+        Raises:
+            QueueFullError: Si la file est pleine
+        """
+        self._purge_expired()
+        app = current_app._get_current_object() if has_app_context() else None
+        job = Job(kind)
+        with self._lock:
+            if self._pending >= self.max_pending:
+                metrics.increment('ai_jobs.rejected')
+                raise QueueFullError()
+            self._pending += 1
+            self._jobs[job.id] = job
+        metrics.increment('ai_jobs.submitted')
+        metrics.set_gauge('ai_jobs.queue_depth', self._pending)
+        # Le contexte (utilisateur à l'origine de la requête, etc.) suit le travail dans le thread d'exécution
+        self._executor.submit(contextvars.copy_context().run, self._run, app, job, func, args, kwargs, error_classifier)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    @property
+    def pending(self):
+        with self._lock:
+            return self._pending
+
+    def _run(self, app, job, func, args, kwargs, error_classifier):
+        job.started_at = time.time()
+        job.status = 'running'
+        with self._lock:
+            self._pending -= 1
+            depth = self._pending
+        metrics.set_gauge('ai_jobs.queue_depth', depth)
+        metrics.observe(f'ai_jobs.{job.kind}.wait_seconds', job.started_at - job.created_at)
+        try:
+            if app is not None:
+                with app.app_context():
+                    job.result = func(*args, **kwargs)
+            else:
+                job.result = func(*args, **kwargs)
+            job.status = 'done'
+            metrics.increment(f'ai_jobs.{job.kind}.succeeded')
+        except Exception as e:
+            logger.error("Erreur dans le travail %s (%s): %s", job.id, job.kind, e, exc_info=True)
+            job.error = str(e)
+            job.error_type = error_classifier(e) if error_classifier else 'server_error'
+            job.status = 'error'
+            metrics.increment(f'ai_jobs.{job.kind}.failed')
+        finally:
+            job.finished_at = time.time()
+            metrics.observe(f'ai_jobs.{job.kind}.run_seconds', job.finished_at - job.started_at)
+            job._finished.set()
+
+    def _purge_expired(self):
+        """Supprime les travaux terminés depuis plus de `result_ttl` secondes"""
+        limit = time.time() - self.result_ttl
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items() if job.finished and job.finished_at < limit]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+
+# Instance partagée par les routes IA
+job_queue = JobQueue(
+    max_workers=int(os.environ.get('AI_JOB_WORKERS', 4)),
+    max_pending=int(os.environ.get('AI_JOB_MAX_PENDING', 32)),
+    result_ttl=int(os.environ.get('AI_JOB_RESULT_TTL', 600)),
+)
@@ -0,0 +1,151 @@
+"""
+Extraction locale des noms d'articles dictés.
+Une transcription du type "un marteau, deux tournevis et la pince" est découpée sans appel à l'IA:
+séparateurs de liste et conjonctions, articles et quantités retirés. Un score de confiance indique
+si le découpage est fiable; en dessous du seuil, l'extraction est confiée au modèle.
+"""
+import re
+import logging
+from src.services.inventory_index import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Mots séparant deux articles d'une liste (comparés sans accents)
+SEPARATORS = frozenset([',', ';', '+', 'et', 'puis', 'plus'])
+
+# Articles, déterminants et quantités retirés en début d'article
+DETERMINERS = frozenset([
+    "l'", "d'", 'le', 'la', 'les', 'un', 'une', 'des', 'du', 'de', 'mon', 'ma', 'mes', 'ton', 'ta', 'tes',
+    'son', 'sa', 'ses', 'ce', 'cet', 'cette', 'ces', 'deux', 'trois', 'quatre', 'cinq', 'six', 'sept',
+    'huit', 'neuf', 'dix', 'onze', 'douze', 'vingt', 'cent', 'quelques', 'plusieurs', 'autre', 'autres',
+    'encore', 'paire', 'lot', 'peu',
+])
+
+# Mots qui signalent une phrase plutôt qu'un nom d'article: le découpage local n'est pas fiable
+SENTENCE_WORDS = frozenset([
+    "j'", "qu'", "n'", "m'", "c'", 'je', 'tu', 'il', 'elle', 'on', 'nous', 'vous', 'ils', 'elles', 'me', 'moi',
+    'te', 'se', 'qui', 'que', 'quoi', 'ou', 'est', 'sont', 'ai', 'avons', 'avez', 'ont', 'pas',
+    'ne', 'pour', 'dans', 'sur', 'sous', 'avec', 'sans', 'chez', 'quand', 'comment', 'combien', 'si',
+    'mais', 'donc', 'car', 'faut', 'veux', 'voudrais', 'besoin', 'emprunter', 'prendre', 'rendre',
+    # Salutations, remerciements et mots de remplissage (transcriptions typiques d'un silence)
+    'bonjour', 'bonsoir', 'salut', 'coucou', 'allo', 'revoir', 'bienvenue', 'merci', 'bravo', 'ok', 'okay',
+    'oui', 'non', 'voila', 'bon', 'bah', 'ben', 'bref', 'euh', 'heu', 'hum', 'hmm', 'ah', 'oh', 'hein',
+    'abonnez', 'abonnez-vous', 'video', 'suite', 'prochaine',
+])
+
+# Marqueurs de sous-titres que Whisper produit sur un enregistrement vide ("Sous-titrage ST' 501")
+SUBTITLE_MARKERS = frozenset([
+    "st'", 'sous-titrage', 'sous-titres', 'sous-titre', 'sous-titrages', 'amara', 'radio-canada',
+])
+
+# Confiance d'un article unique absent de l'inventaire: sous le seuil par défaut, le modèle vérifie
+# qu'il s'agit bien d'un article et non d'un mot isolé mal transcrit
+UNKNOWN_SINGLE_ITEM_CONFIDENCE = 0.5
+
+# Formules d'introduction retirées en début de transcription (texte normalisé, mots séparés par un espace)
+COMMAND_PREFIX = re.compile(
+    r"^(?:(?:alors|bon|euh|bonjour) )*"
+    r"(?:(?:je (?:voudrais|veux|souhaite|souhaiterais|aimerais|vais|dois) (?:emprunter|prendre|ajouter|recuperer) )"
+    r"|(?:j' ai besoin (?:de |d' )?)|(?:il me faut )|(?:je (?:prends|emprunte|recupere) )|(?:j' emprunte )"
+    r"|(?:(?:emprunter|emprunt|prendre|ajouter|ajoute) (?:de |d' )?))?"
+)
+# Formules de politesse retirées en fin de transcription
+POLITE_SUFFIX = re.compile(r"(?: (?:s' il (?:te|vous) plait|stp|svp|merci))+$")
+
+_TOKEN = re.compile(r"[\w-]+'?|[,;+]")
+
+
+class LocalExtraction:
+    """Articles extraits localement et confiance (0..1) dans le découpage"""
+    __slots__ = ('items', 'confidence')
+
+    def __init__(self, items, confidence):
+        self.items = items
+        self.confidence = confidence
+
+
+def _tokens(text):
+    # Les élisions (l'outil, d'eau) deviennent des mots séparés: "l'" "outil"
+    return _TOKEN.findall(re.sub(r"['’]", "' ", text))
+
+
+def _strip_affixes(tokens, normalized):
+    """Retire la formule d'introduction et la politesse finale"""
+    joined = ' '.join(normalized)
+    prefix = COMMAND_PREFIX.match(joined).group(0)
+    start = prefix.count(' ')
+    suffix = POLITE_SUFFIX.search(joined)
+    end = len(tokens) - suffix.group(0).count(' ') if suffix else len(tokens)
+    return tokens[start:end], normalized[start:end]
+
+
+def _segment_confidence(words):
+    """Confiance dans le fait qu'un segment soit un unique nom d'article"""
+    if any(word in SUBTITLE_MARKERS or any(char.isdigit() for char in word) for word in words):
+        return 0.0
+    if any(word in SENTENCE_WORDS for word in words):
+        return 0.3
+    if len(words) > 4:
+        return 0.4
+    if len(words) == 4:
+        return 0.8
+    return 1.0
+
+
+def _join(tokens):
+    text = ''
+    for token in tokens:
+        text += token if not text or text.endswith("'") else ' ' + token
+    return text
+
+
+def extract_item_list(text, is_known=None):
+    """
+    Découpe une transcription en noms d'articles
+
+    Args:
+        text (str): Texte transcrit
+        is_known (callable): Indique si un nom correspond à un article de l'inventaire; un article unique
+                             inconnu (ou sans cette fonction) reçoit une confiance sous le seuil par défaut
+
+    Returns:
+        LocalExtraction: articles au format [{"id": 1, "name": "Nom Article"}] et confiance
+    """
+    if not text or '?' in text:
+        return LocalExtraction([], 0.0)
+
+    tokens = _tokens(text.strip().rstrip('.!'))
+    normalized = [normalize_text(token) for token in tokens]
+    tokens, normalized = _strip_affixes(tokens, normalized)
+
+    segments = []
+    current = []
+    for token, word in zip(tokens, normalized):
+        if word in SEPARATORS:
+            segments.append(current)
+            current = []
+        else:
+            current.append((token, word))
+    segments.append(current)
+
+    items = []
+    seen = set()
+    confidence = 1.0
+    for segment in segments:
+        while segment and (segment[0][1] in DETERMINERS or segment[0][1].isdigit()):
+            segment = segment[1:]
+        if not segment:
+            continue
+        words = [word for _, word in segment]
+        confidence = min(confidence, _segment_confidence(words))
+        name = _join(token for token, _ in segment)
+        key = ' '.join(words)
+        if key in seen:
+            continue
+        seen.add(key)
+        items.append({'id': len(items) + 1, 'name': name[0].upper() + name[1:]})
+
+    if len(items) == 1 and confidence > UNKNOWN_SINGLE_ITEM_CONFIDENCE and not (is_known and is_known(items[0]['name'])):
+        confidence = UNKNOWN_SINGLE_ITEM_CONFIDENCE
+
+    return LocalExtraction(items, confidence if items else 0.0)
@@ -0,0 +1,121 @@
+"""
+Contexte des emplacements pour l'extraction d'inventaire par la voix.
+L'arborescence zones > meubles > tiroirs est construite côté serveur, encodée de façon compacte
+pour le prompt et mise en cache par version de l'inventaire. Les mêmes tables d'index
+permettent de valider en O(1) les IDs renvoyés par le modèle.
+"""
+import logging
+from collections import defaultdict
+from src.models import db
+from src.models.location import Zone, Furniture, Drawer
+from src.services.inventory_cache import VersionedCache, inventory_version
+from src.services.inventory_index import tokenize
+from src.services.token_budget import estimate_tokens, fit_lines
+
+logger = logging.getLogger(__name__)
+
+# Préfixes des identifiants dans le prompt (Z3 = zone 3, M12 = meuble 12, T40 = tiroir 40)
+PREFIXES = {'zone_id': 'Z', 'furniture_id': 'M', 'drawer_id': 'T'}
+
+
+class LocationContext:
+    """Arborescence des emplacements: encodage compact pour le prompt et validation des IDs"""
+
+    def __init__(self, zones, furniture, drawers):
+        # id -> nom, et id -> (nom, parent) pour les meubles et tiroirs
+        self.zones = {zone_id: name for zone_id, name in zones}
+        self.furniture = {furniture_id: (name, zone_id) for furniture_id, name, zone_id in furniture}
+        self.drawers = {drawer_id: (name, furniture_id) for drawer_id, name, furniture_id in drawers}
+        self.lines = self._encode()
+        self.prompt = '\n'.join(self.lines)
+        self.prompt_tokens = estimate_tokens(self.prompt)
+
+    @classmethod
+    def load(cls):
+        """Charge l'arborescence (trois requêtes sur des colonnes, sans objets ORM)"""
+        return cls(
+            db.session.query(Zone.id, Zone.name).order_by(Zone.name).all(),
+            db.session.query(Furniture.id, Furniture.name, Furniture.zone_id).order_by(Furniture.name).all(),
+            db.session.query(Drawer.id, Drawer.name, Drawer.furniture_id).order_by(Drawer.name).all(),
+        )
+
+    def __len__(self):
+        return len(self.zones)
+
+    def _encode(self):
+        """
+        Une ligne par zone, meubles et tiroirs imbriqués:
+        Z1 Garage: M4 Etagère [T9 Niveau 1 | T10 Niveau 2]; M5 Etabli
+        """
+        drawers_by_furniture = defaultdict(list)
+        for drawer_id, (name, furniture_id) in self.drawers.items():
+            drawers_by_furniture[furniture_id].append(f"T{drawer_id} {name}")
+        furniture_by_zone = defaultdict(list)
+        for furniture_id, (name, zone_id) in self.furniture.items():
+            drawers = drawers_by_furniture.get(furniture_id)
+            furniture_by_zone[zone_id].append(
+                f"M{furniture_id} {name}" + (f" [{' | '.join(drawers)}]" if drawers else '')
+            )
+        lines = []
+        for zone_id, name in self.zones.items():
+            furniture = furniture_by_zone.get(zone_id)
+            lines.append(f"Z{zone_id} {name}" + (f": {'; '.join(furniture)}" if furniture else ''))
+        return lines
+
+    def prompt_for(self, text, max_tokens):
+        """
+        Arborescence à insérer dans le prompt, limitée à `max_tokens` jetons.
+        Si elle est trop longue, les zones dont un libellé figure dans la transcription passent en premier.
+        """
+        if max_tokens <= 0 or self.prompt_tokens <= max_tokens:
+            return self.prompt
+        spoken = set(tokenize(text))
+        ranked = sorted(self.lines, key=lambda line: -len(spoken.intersection(tokenize(line))))
+        kept, dropped = fit_lines(ranked, max_tokens, operation='extraction')
+        return '\n'.join(kept) + f"\n(... {dropped} autre(s) zone(s) non listée(s))"
+
+    @staticmethod
+    def _parse_id(value, key):
+        """Accepte 12, "12" ou "M12" (le modèle recopie parfois le préfixe)"""
+        if value is None or isinstance(value, bool):
+            return None
+        if isinstance(value, int):
+            return value
+        text = str(value).strip()
+        prefix = PREFIXES[key]
+        if text[:1].upper() == prefix:
+            text = text[1:]
+        return int(text) if text.isdigit() else None
+
+    def resolve(self, item):
+        """
+        Valide les IDs d'emplacement d'un article et complète les niveaux supérieurs.
+        Un tiroir valide détermine son meuble et sa zone; un ID inconnu ou incohérent est remplacé par None.
+        """
+        zone_id = self._parse_id(item.get('zone_id'), 'zone_id')
+        furniture_id = self._parse_id(item.get('furniture_id'), 'furniture_id')
+        drawer_id = self._parse_id(item.get('drawer_id'), 'drawer_id')
+
+        if drawer_id not in self.drawers:
+            drawer_id = None
+        if drawer_id is not None:
+            furniture_id = self.drawers[drawer_id][1]
+        if furniture_id not in self.furniture:
+            furniture_id = None
+        if furniture_id is not None:
+            zone_id = self.furniture[furniture_id][1]
+        if zone_id not in self.zones:
+            zone_id = None
+
+        item['zone_id'] = zone_id
+        item['furniture_id'] = furniture_id
+        item['drawer_id'] = drawer_id
+        return item
+
+
+_context_cache = VersionedCache('location_context')
+
+
+def get_location_context():
+    """Retourne l'arborescence des emplacements de la version courante (doit être appelé dans un contexte d'application)"""
+    return _context_cache.get_or_build(inventory_version.value, 'tree', LocationContext.load)
@@ -0,0 +1,115 @@
+"""
+Requêtes et migration pour la hiérarchie générique des emplacements (table location_node)
+"""
+import logging
+from sqlalchemy import func, inspect, text
+from src.models import db
+from src.models.item import Item
+from src.models.location import Zone, Furniture, Drawer
+from src.models.location_node import LocationNode, find_legacy_node, insert_legacy_node, insert_node, resolve_item_node_id
+
+logger = logging.getLogger(__name__)
+
+
+def _ensure_item_column():
+    """Ajoute la colonne item.location_node_id aux bases créées avant la hiérarchie générique"""
+    columns = {column['name'] for column in inspect(db.engine).get_columns('item')}
+    if 'location_node_id' in columns:
+        return False
+    with db.engine.begin() as connection:
+        connection.execute(text('ALTER TABLE item ADD COLUMN location_node_id INTEGER REFERENCES location_node(id)'))
+        connection.execute(text('CREATE INDEX IF NOT EXISTS ix_item_location_node_id ON item (location_node_id)'))
+    logger.info("Colonne item.location_node_id ajoutée")
+    return True
+
+
+def _ensure_path_collation():
+    """Passe location_node.path en collation 'C' sur les bases PostgreSQL créées avant ce réglage"""
+    if db.engine.dialect.name != 'postgresql':
+        return False
+    with db.engine.begin() as connection:
+        collation = connection.execute(text(
+            "SELECT collation_name FROM information_schema.columns "
+            "WHERE table_name = 'location_node' AND column_name = 'path'"
+        )).scalar()
+        if collation == 'C':
+            return False
+        connection.execute(text('ALTER TABLE location_node ALTER COLUMN path TYPE VARCHAR(255) COLLATE "C"'))
+    logger.info("Collation 'C' appliquée à location_node.path")
+    return True
+
+
+def migrate_legacy_locations():
+    """
+    Reporte les tables Zone/Furniture/Drawer dans location_node puis rattache les articles.
+    La migration est idempotente : seules les lignes sans noeud associé sont traitées.
+
+    Returns:
+        dict: Nombre de noeuds créés et d'articles rattachés
+    """
+    _ensure_item_column()
+    _ensure_path_collation()
+    created_nodes = 0
+    linked_items = 0
+    with db.engine.begin() as connection:
+        # Les niveaux sont traités du haut vers le bas pour que les parents existent toujours
+        for kind, model in (('zone', Zone), ('furniture', Furniture), ('drawer', Drawer)):
+            for row in connection.execute(model.__table__.select().order_by(model.__table__.c.id)):
+                if find_legacy_node(connection, kind, row.id) is None:
+                    insert_legacy_node(connection, kind, row)
+                    created_nodes += 1
+
+        item_table = Item.__table__
+        orphan_items = connection.execute(item_table.select().where(
+            item_table.c.is_temporary == False,  # noqa: E712
+            item_table.c.location_node_id.is_(None),
+        )).all()
+        for row in orphan_items:
+            node_id = resolve_item_node_id(connection, row)
+            if node_id:
+                connection.execute(item_table.update().where(item_table.c.id == row.id).values(location_node_id=node_id))
+                linked_items += 1
+
+    logger.info("Migration des emplacements: %s noeud(s) créé(s), %s article(s) rattaché(s)", created_nodes, linked_items)
+    return {'created_nodes': created_nodes, 'linked_items': linked_items}
+
+
+def create_node(name, parent=None, kind='node'):
+    """Crée un noeud générique sous `parent` (LocationNode ou None) et retourne l'objet créé"""
+    connection = db.session.connection()
+    node_id = insert_node(connection, name, kind=kind, parent=parent)
+    return db.session.get(LocationNode, node_id)
+
+
+def subtree_query(node):
+    """Requête des noeuds du sous-arbre (noeud inclus), par parcours de plage sur l'index de path"""
+    return LocationNode.query.filter(LocationNode.subtree_filter(node.path))
+
+
+def subtree_items_query(node):
+    """Requête des articles rangés dans le sous-arbre d'un noeud"""
+    return Item.query.join(LocationNode, Item.location_node_id == LocationNode.id).filter(
+        LocationNode.subtree_filter(node.path)
+    )
+
+
+def subtree_item_count(node):
+    """Nombre d'articles rangés dans le sous-arbre d'un noeud"""
+    return db.session.query(func.count(Item.id)).join(
+        LocationNode, Item.location_node_id == LocationNode.id
+    ).filter(LocationNode.subtree_filter(node.path)).scalar()
+
+
+def breadcrumb(node):
+    """Retourne la liste des noeuds de la racine jusqu'au noeud, en une seule requête sur la clé primaire"""
+    return LocationNode.query.filter(LocationNode.id.in_(node.ancestor_ids)).order_by(LocationNode.depth).all()
+
+
+def breadcrumb_label(node, separator=' > '):
+    """Libellé lisible du chemin d'un noeud (ex: 'Garage > Etabli > Tiroir 1')"""
+    return separator.join(ancestor.name for ancestor in breadcrumb(node))
+
+
+def node_for_legacy(kind, legacy_id):
+    """Retourne le LocationNode associé à une Zone, un Furniture ou un Drawer"""
+    return LocationNode.query.filter_by(kind=kind, legacy_id=legacy_id).first()
@@ -0,0 +1,135 @@
+"""
+Métriques en mémoire (compteurs, jauges, histogrammes) partagées par les services.
+Les valeurs sont propres au processus et exposées au format JSON par /api/ai/metrics.
+"""
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+
+class Histogram:
+    """
+    Histogramme simple: cumule nombre, somme, min et max, et conserve un échantillon
+    glissant des dernières valeurs pour estimer les percentiles.
+    """
+
+    def __init__(self, sample_size=1024):
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=sample_size)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        with self._lock:
+            self._samples.append(value)
+            self.count += 1
+            self.total += value
+            self.min = value if self.min is None else min(self.min, value)
+            self.max = value if self.max is None else max(self.max, value)
+
+    def snapshot(self):
+        with self._lock:
+            samples = sorted(self._samples)
+            result = {
+                'count': self.count,
+                'sum': round(self.total, 6),
+                'min': self.min,
+                'max': self.max,
+                'avg': round(self.total / self.count, 6) if self.count else None,
+            }
+        for label, quantile in (('p50', 0.50), ('p95', 0.95), ('p99', 0.99)):
+            result[label] = samples[min(len(samples) - 1, int(quantile * len(samples)))] if samples else None
+        return result
+
+
+class MetricsRegistry:
+    """Registre thread-safe des métriques du processus"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+
+    def increment(self, name, amount=1):
+        """Incrémente un compteur"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def set_gauge(self, name, value):
+        """Fixe la valeur courante d'une jauge"""
+        with self._lock:
+            self._gauges[name] = value
+
+    def add_gauge(self, name, delta):
+        """Fait varier une jauge (ex: nombre de travaux en attente)"""
+        with self._lock:
+            self._gauges[name] = self._gauges.get(name, 0) + delta
+
+    def observe(self, name, value):
+        """Ajoute une observation à un histogramme"""
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+        histogram.observe(value)
+
+    def counter_value(self, name):
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def snapshot(self, prefix=None):
+        """
+        Retourne l'état de toutes les métriques (filtrées par préfixe si fourni)
+
+        Returns:
+            dict: {'counters': {...}, 'gauges': {...}, 'histograms': {...}}
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = dict(self._histograms)
+        keep = (lambda name: name.startswith(prefix)) if prefix else (lambda name: True)
+        return {
+            'counters': {name: value for name, value in sorted(counters.items()) if keep(name)},
+            'gauges': {name: value for name, value in sorted(gauges.items()) if keep(name)},
+            'histograms': {name: histogram.snapshot() for name, histogram in sorted(histograms.items()) if keep(name)},
+        }
+
+
+# Instance partagée par l'ensemble de l'application
+metrics = MetricsRegistry()
+
+
+class StageTimings:
+    """
+    Chronométrage des étapes d'un traitement (une instance par requête).
+    Chaque durée est ajoutée à l'histogramme `<prefix>.<étape>_seconds` et conservée
+    pour le détail de la réponse (en-tête Server-Timing).
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.stages.append((name, elapsed))
+            metrics.observe(f'{self.prefix}.{name}_seconds', elapsed)
+
+    def to_dict(self):
+        """Durées des étapes en millisecondes"""
+        return {name: round(elapsed * 1000, 1) for name, elapsed in self.stages}
+
+    @staticmethod
+    def server_timing(durations_ms):
+        """Formate des durées (ms) pour l'en-tête HTTP Server-Timing"""
+        return ', '.join(f'{name};dur={duration}' for name, duration in durations_ms.items())
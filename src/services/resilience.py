@@ -0,0 +1,193 @@
+"""
+Protection des appels à l'API d'IA.
+Un cloisonnement (bulkhead) limite le nombre d'appels simultanés par type d'opération:
+une rafale de requêtes vocales ne peut plus occuper tous les threads du serveur, et les
+requêtes excédentaires sont refusées rapidement au lieu d'attendre leur tour.
+Un disjoncteur (circuit breaker) coupe les appels pendant une panne de l'API: après une série
+d'échecs, les requêtes échouent immédiatement au lieu d'attendre chacune leur délai d'expiration.
+"""
+import math
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from src.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceUnavailableError(Exception):
+    """Le service d'IA ne peut pas traiter la requête pour le moment (réponse HTTP `status_code`)"""
+    status_code = 503
+    error_type = 'service_unavailable'
+
+    def __init__(self, message, retry_after=5):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class OverloadedError(ServiceUnavailableError):
+    """Levée lorsque tous les emplacements d'une opération sont occupés au-delà du délai d'attente"""
+    status_code = 429
+    error_type = 'overloaded'
+
+    def __init__(self, operation, retry_after=2):
+        super().__init__(
+            "Le service d'IA est très sollicité. Veuillez réessayer dans quelques instants.",
+            retry_after=retry_after
+        )
+        self.operation = operation
+
+
+class CircuitOpenError(ServiceUnavailableError):
+    """Levée lorsque le disjoncteur est ouvert (API d'IA considérée comme indisponible)"""
+    status_code = 503
+    error_type = 'circuit_open'
+
+    def __init__(self, retry_after=5):
+        super().__init__(
+            "Le service d'IA est momentanément indisponible. Veuillez réessayer dans quelques instants.",
+            retry_after=retry_after
+        )
+
+
+class Bulkhead:
+    """
+    Sémaphore borné avec attente limitée.
+    Au plus `max_concurrent` appels s'exécutent en même temps; un appel supplémentaire attend
+    au plus `max_wait` secondes qu'un emplacement se libère, sinon OverloadedError est levée.
+    """
+
+    def __init__(self, name, max_concurrent=8, max_wait=2.0):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    @contextmanager
+    def slot(self):
+        started = time.monotonic()
+        acquired = self._semaphore.acquire(timeout=self.max_wait)
+        metrics.observe(f'ai_bulkhead.{self.name}.wait_seconds', time.monotonic() - started)
+        if not acquired:
+            metrics.increment(f'ai_bulkhead.{self.name}.rejected')
+            logger.warning("Appel %s refusé: %s appel(s) déjà en cours", self.name, self.max_concurrent)
+            raise OverloadedError(self.name, retry_after=max(1, math.ceil(self.max_wait)))
+        with self._lock:
+            self._in_flight += 1
+            metrics.set_gauge(f'ai_bulkhead.{self.name}.in_flight', self._in_flight)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                metrics.set_gauge(f'ai_bulkhead.{self.name}.in_flight', self._in_flight)
+            self._semaphore.release()
+
+    def to_dict(self):
+        return {'max_concurrent': self.max_concurrent, 'in_flight': self._in_flight, 'max_wait': self.max_wait}
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur à trois états:
+    - fermé: les appels passent; au-delà de `failure_threshold` échecs en `window` secondes, il s'ouvre;
+    - ouvert: les appels échouent immédiatement (CircuitOpenError) pendant `reset_timeout` secondes;
+    - semi-ouvert: un appel de test est autorisé; son succès referme le disjoncteur, son échec le rouvre.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_threshold=5, window=60, reset_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = deque()
+        self._opened_at = None
+        self._probe_in_flight = False
+        self._last_failure = None
+
+    @property
+    def state(self):
+        with self._lock:
+            self._refresh_state(time.monotonic())
+            return self._state
+
+    def _refresh_state(self, now):
+        if self._state == self.OPEN and now - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+            logger.info("Disjoncteur %s semi-ouvert: appel de test autorisé", self.name)
+
+    def _set_state(self, state):
+        self._state = state
+        metrics.set_gauge(f'ai_breaker.{self.name}.open', 1 if state == self.OPEN else 0)
+
+    def before_call(self):
+        """Autorise l'appel ou lève CircuitOpenError"""
+        now = time.monotonic()
+        with self._lock:
+            self._refresh_state(now)
+            if self._state == self.CLOSED:
+                return
+            if self._state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+            retry_after = self.reset_timeout - (now - self._opened_at) if self._state == self.OPEN else 1
+        metrics.increment(f'ai_breaker.{self.name}.rejected')
+        raise CircuitOpenError(retry_after=max(1, math.ceil(retry_after)))
+
+    def release_call(self):
+        """Appel autorisé qui ne renseigne pas sur l'état de l'API (refusé localement, limité): libère l'appel de test"""
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._probe_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info("Disjoncteur %s refermé", self.name)
+            self._set_state(self.CLOSED)
+            self._failures.clear()
+            self._probe_in_flight = False
+
+    def record_failure(self, reason=None):
+        now = time.monotonic()
+        metrics.increment(f'ai_breaker.{self.name}.failures')
+        with self._lock:
+            self._last_failure = reason
+            self._failures.append(now)
+            while self._failures and now - self._failures[0] > self.window:
+                self._failures.popleft()
+            if self._state == self.HALF_OPEN or len(self._failures) >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    metrics.increment(f'ai_breaker.{self.name}.opened')
+                    logger.warning("Disjoncteur %s ouvert (%s échec(s) récents): %s", self.name, len(self._failures), reason)
+                self._set_state(self.OPEN)
+                self._opened_at = now
+                self._probe_in_flight = False
+
+    def to_dict(self):
+        now = time.monotonic()
+        with self._lock:
+            self._refresh_state(now)
+            return {
+                'state': self._state,
+                'recent_failures': sum(1 for failure in self._failures if now - failure <= self.window),
+                'failure_threshold': self.failure_threshold,
+                'window': self.window,
+                'reset_timeout': self.reset_timeout,
+                'retry_in': round(max(0.0, self.reset_timeout - (now - self._opened_at)), 1) if self._state == self.OPEN else 0,
+                'last_failure': self._last_failure,
+            }
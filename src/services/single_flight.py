@@ -0,0 +1,87 @@
+"""
+Regroupement des calculs identiques simultanés (« single-flight »).
+Le premier appel pour une empreinte donnée exécute le calcul; les appels identiques qui arrivent
+pendant ce temps attendent et reçoivent le même résultat (ou la même erreur) au lieu de le refaire.
+Rien n'est conservé une fois le calcul terminé: ce n'est pas un cache.
+"""
+import json
+import hashlib
+import logging
+import threading
+from src.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint(*parts):
+    """Empreinte stable d'une requête à partir de valeurs sérialisables en JSON"""
+    payload = json.dumps(parts, ensure_ascii=False, separators=(',', ':'), sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class _Call:
+    """Calcul en cours et son issue"""
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Un calcul à la fois par empreinte.
+    Les compteurs `single_flight.<nom>.executed` et `single_flight.<nom>.shared` mesurent
+    les calculs effectués et les appels servis par un calcul déjà en cours.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func, *args, share=None, **kwargs):
+        """
+        Exécute `func(*args, **kwargs)` sauf si un calcul de même clé est déjà en cours
+
+        Args:
+            key (str): Empreinte de la requête (voir `fingerprint`)
+            func (callable): Calcul à exécuter
+            share (callable): Copie appliquée au résultat remis aux appels regroupés
+                              (résultat modifiable par l'appelant, comme une liste de dictionnaires)
+
+        Returns:
+            Le résultat du calcul
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+
+        if not leader:
+            metrics.increment(f'single_flight.{self.name}.shared')
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return share(call.result) if share is not None else call.result
+
+        try:
+            result = func(*args, **kwargs)
+            # Les appels regroupés copient un exemplaire que l'appelant initial ne modifiera pas
+            call.result = share(result) if share is not None else result
+            return result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+            metrics.increment(f'single_flight.{self.name}.executed')
+            if call.waiters:
+                logger.debug("Calcul %s partagé avec %s appel(s) identique(s)", self.name, call.waiters)
@@ -0,0 +1,115 @@
+"""
+Budget de jetons des prompts envoyés à l'API d'IA.
+Le nombre de jetons est estimé localement (mots et ponctuation, sans tokenizer externe), les données
+sont sérialisées en JSON compact, et chaque opération dispose d'un budget: les listes trop longues
+sont tronquées (en gardant les lignes les plus pertinentes, placées en tête) ou découpées en lots.
+"""
+import os
+import re
+import json
+import math
+import logging
+from src.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Budgets par défaut (jetons de prompt) par opération, modifiables par AI_TOKEN_BUDGET_<OPERATION>
+DEFAULT_BUDGETS = {
+    'extraction': 6000,
+    'comparison': 3000,
+    'chat': 8000,
+}
+
+# Surcoût d'un message de chat (rôle, délimiteurs)
+MESSAGE_OVERHEAD = 4
+
+_PIECES = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+
+def estimate_tokens(text):
+    """
+    Estimation du nombre de jetons d'un texte: un jeton par signe de ponctuation,
+    un jeton par tranche de quatre caractères pour les mots (les mots français courts comptent pour un)
+    """
+    if not text:
+        return 0
+    return sum(1 if not piece[0].isalnum() and piece[0] != '_' else math.ceil(len(piece) / 4)
+               for piece in _PIECES.findall(text))
+
+
+def estimate_messages(messages):
+    """Estimation du nombre de jetons d'une liste de messages de chat"""
+    return sum(estimate_tokens(message.get('content') or '') + MESSAGE_OVERHEAD for message in messages)
+
+
+def compact_json(value):
+    """Sérialisation JSON sans espaces superflus (les caractères accentués restent lisibles)"""
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+
+def budget_for(operation):
+    """Budget de jetons de prompt d'une opération (0 ou moins: illimité)"""
+    try:
+        return int(float(os.environ.get(f'AI_TOKEN_BUDGET_{operation.upper()}', DEFAULT_BUDGETS.get(operation, 0))))
+    except ValueError:
+        return DEFAULT_BUDGETS.get(operation, 0)
+
+
+def fit_lines(lines, max_tokens, operation=None):
+    """
+    Garde les premières lignes tenant dans `max_tokens` jetons
+
+    Returns:
+        tuple: (lignes conservées, nombre de lignes écartées)
+    """
+    kept = []
+    used = 0
+    for line in lines:
+        cost = estimate_tokens(line) + 1
+        if max_tokens > 0 and used + cost > max_tokens:
+            break
+        kept.append(line)
+        used += cost
+    dropped = len(lines) - len(kept)
+    if dropped and operation:
+        metrics.increment(f'token_budget.{operation}.truncated')
+        logger.info("Prompt %s tronqué: %s ligne(s) écartée(s) pour respecter le budget de %s jetons", operation, dropped, max_tokens)
+    return kept, dropped
+
+
+def chunk_by_budget(entries, cost, max_tokens):
+    """
+    Répartit des entrées en lots dont le coût cumulé ne dépasse pas `max_tokens`
+    (une entrée plus coûteuse que le budget forme un lot à elle seule)
+
+    Args:
+        entries (list): Entrées à répartir, dans l'ordre
+        cost (callable): Coût en jetons d'une entrée
+        max_tokens (int): Budget d'un lot (0 ou moins: un seul lot)
+
+    Returns:
+        list: Liste de lots (listes d'entrées)
+    """
+    if max_tokens <= 0:
+        return [list(entries)] if entries else []
+    chunks = []
+    current = []
+    used = 0
+    for entry in entries:
+        entry_cost = cost(entry)
+        if current and used + entry_cost > max_tokens:
+            chunks.append(current)
+            current = []
+            used = 0
+        current.append(entry)
+        used += entry_cost
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def record(operation, messages):
+    """Enregistre l'estimation du prompt d'une opération et la retourne"""
+    tokens = estimate_messages(messages)
+    metrics.observe(f'token_budget.{operation}.estimated_tokens', tokens)
+    return tokens
@@ -0,0 +1,122 @@
+"""
+Cache des transcriptions, adressé par le contenu audio.
+La clé est l'empreinte SHA-256 des octets envoyés et du modèle de transcription: un même
+enregistrement renvoyé par le navigateur (nouvelle tentative après une coupure) n'est pas retranscrit.
+Les entrées sont stockées dans une base SQLite locale, avec durée de vie et éviction LRU.
+"""
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from src.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_CACHE_PATH = os.path.join(PROJECT_ROOT, 'data', 'transcription_cache.db')
+
+
+def audio_key(data, model):
+    """Empreinte SHA-256 du modèle et du contenu audio"""
+    digest = hashlib.sha256(model.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(data)
+    return digest.hexdigest()
+
+
+class TranscriptionCache:
+    """Cache SQLite borné (`max_entries`) dont les entrées expirent après `ttl` secondes"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=500, ttl=7 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def _connect(self):
+        if not self._initialized:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=5)
+        if not self._initialized:
+            with self._lock:
+                if not self._initialized:
+                    connection.execute(
+                        "CREATE TABLE IF NOT EXISTS transcription_cache ("
+                        "key TEXT PRIMARY KEY, model TEXT NOT NULL, text TEXT NOT NULL, "
+                        "audio_bytes INTEGER NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL)"
+                    )
+                    connection.execute(
+                        "CREATE INDEX IF NOT EXISTS ix_transcription_cache_last_access ON transcription_cache (last_access)"
+                    )
+                    connection.commit()
+                    self._initialized = True
+        return connection
+
+    def get(self, key):
+        """Retourne la transcription associée à la clé, ou None si absente ou expirée"""
+        if not self.enabled:
+            return None
+        now = time.time()
+        try:
+            connection = self._connect()
+            try:
+                row = connection.execute(
+                    "SELECT text, created_at FROM transcription_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[1] + self.ttl > now:
+                    connection.execute("UPDATE transcription_cache SET last_access = ? WHERE key = ?", (now, key))
+                    connection.commit()
+                    metrics.increment('transcription_cache.hits')
+                    return row[0]
+                if row is not None:
+                    connection.execute("DELETE FROM transcription_cache WHERE key = ?", (key,))
+                    connection.commit()
+                    metrics.increment('transcription_cache.expired')
+            finally:
+                connection.close()
+        except sqlite3.Error as e:
+            logger.warning("Cache des transcriptions indisponible: %s", e)
+        metrics.increment('transcription_cache.misses')
+        return None
+
+    def put(self, key, model, text, audio_bytes=0):
+        if not self.enabled:
+            return
+        now = time.time()
+        try:
+            connection = self._connect()
+            try:
+                connection.execute(
+                    "INSERT OR REPLACE INTO transcription_cache (key, model, text, audio_bytes, created_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, model, text, audio_bytes, now, now)
+                )
+                # Purge des entrées expirées puis éviction des moins récemment utilisées
+                connection.execute("DELETE FROM transcription_cache WHERE created_at <= ?", (now - self.ttl,))
+                evicted = connection.execute(
+                    "DELETE FROM transcription_cache WHERE key IN ("
+                    "SELECT key FROM transcription_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                ).rowcount
+                connection.commit()
+            finally:
+                connection.close()
+        except sqlite3.Error as e:
+            logger.warning("Impossible d'enregistrer la transcription en cache: %s", e)
+            return
+        if evicted:
+            metrics.increment('transcription_cache.evictions', evicted)
+
+
+transcription_cache = TranscriptionCache(
+    path=os.environ.get('AI_TRANSCRIPTION_CACHE_PATH', DEFAULT_CACHE_PATH),
+    max_entries=int(os.environ.get('AI_TRANSCRIPTION_CACHE_SIZE', 500)),
+    ttl=float(os.environ.get('AI_TRANSCRIPTION_CACHE_TTL', 7 * 24 * 3600)),
+)
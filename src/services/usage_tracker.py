@@ -0,0 +1,259 @@
+"""
+Comptabilité des appels à l'API d'IA.
+Chaque appel (opération, modèle, jetons, durée, utilisateur) est placé dans une file en mémoire puis
+écrit par lots dans la table `ai_usage` par un thread dédié: la requête de l'utilisateur n'attend
+jamais l'écriture. Un quota quotidien de jetons par utilisateur peut être appliqué en mémoire.
+"""
+import os
+import time
+import queue
+import atexit
+import logging
+import threading
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from flask import current_app, has_app_context
+from sqlalchemy import case, func, insert
+from src.models import db
+from src.models.ai_usage import AIUsage
+from src.models.user import User
+from src.services.metrics import metrics
+from src.services.resilience import ServiceUnavailableError
+
+logger = logging.getLogger(__name__)
+
+# Utilisateur à l'origine des appels en cours (renseigné par les routes, copié dans les travaux asynchrones)
+current_user_id = ContextVar('ai_current_user_id', default=None)
+
+
+class QuotaExceededError(ServiceUnavailableError):
+    """Levée lorsque l'utilisateur a consommé son quota quotidien de jetons"""
+    status_code = 429
+    error_type = 'quota_exceeded'
+
+    def __init__(self, retry_after):
+        super().__init__(
+            "Votre quota quotidien d'utilisation de l'IA est atteint. Il sera renouvelé demain.",
+            retry_after=retry_after
+        )
+
+
+def token_counts(usage):
+    """(prompt, completion, total) depuis un bloc `usage` (complétion, transcription ou embeddings)"""
+    if not isinstance(usage, dict):
+        return None, None, None
+    prompt = usage.get('prompt_tokens', usage.get('input_tokens'))
+    completion = usage.get('completion_tokens', usage.get('output_tokens'))
+    total = usage.get('total_tokens')
+    if total is None and (prompt is not None or completion is not None):
+        total = (prompt or 0) + (completion or 0)
+    return prompt, completion, total
+
+
+class DailyQuota:
+    """Jetons consommés par utilisateur pour la journée en cours (UTC); `max_tokens` à 0 désactive le quota"""
+
+    def __init__(self, max_tokens=0):
+        self.max_tokens = max_tokens
+        self._lock = threading.Lock()
+        self._day = None
+        self._used = {}
+
+    @property
+    def enabled(self):
+        return self.max_tokens > 0
+
+    def _roll(self):
+        today = datetime.utcnow().date()
+        if self._day != today:
+            self._day = today
+            self._used = {}
+
+    def used(self, user_id):
+        with self._lock:
+            self._roll()
+            return self._used.get(user_id, 0)
+
+    def check(self, user_id):
+        """Lève QuotaExceededError si l'utilisateur a atteint son quota"""
+        if not self.enabled or user_id is None:
+            return
+        if self.used(user_id) >= self.max_tokens:
+            metrics.increment('ai_usage_quota.rejected')
+            now = datetime.utcnow()
+            tomorrow = datetime(now.year, now.month, now.day) + timedelta(days=1)
+            raise QuotaExceededError(retry_after=max(1, int((tomorrow - now).total_seconds())))
+
+    def add(self, user_id, tokens):
+        if not self.enabled or user_id is None or not tokens:
+            return
+        with self._lock:
+            self._roll()
+            self._used[user_id] = self._used.get(user_id, 0) + tokens
+
+
+class UsageRecorder:
+    """
+    Écriture asynchrone et par lots des appels à l'API.
+    Un lot est écrit dès `batch_size` entrées ou au plus tard `flush_interval` secondes après la première;
+    au-delà de `max_pending` entrées en attente, les nouvelles entrées sont abandonnées (et comptées).
+    """
+
+    def __init__(self, batch_size=50, flush_interval=2.0, max_pending=10000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._app = None
+
+    @property
+    def enabled(self):
+        return self.batch_size > 0
+
+    def record(self, operation, model=None, status_code=None, usage=None, latency=None, user_id=None):
+        """Ajoute un appel à la file d'écriture (non bloquant)"""
+        if not self.enabled:
+            return
+        if self._app is None and has_app_context():
+            self._app = current_app._get_current_object()
+        prompt, completion, total = token_counts(usage)
+        row = {
+            'created_at': datetime.utcnow(),
+            'user_id': user_id,
+            'operation': operation,
+            'model': model,
+            'status_code': status_code,
+            'prompt_tokens': prompt,
+            'completion_tokens': completion,
+            'total_tokens': total,
+            'latency_ms': int(latency * 1000) if latency is not None else None,
+        }
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            metrics.increment('ai_usage_log.dropped')
+            return
+        self._ensure_thread()
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='ai-usage-writer', daemon=True)
+                self._thread.start()
+
+    def _next_batch(self, block=True):
+        """Attend une première entrée, puis complète le lot pendant au plus `flush_interval` secondes"""
+        batch = []
+        deadline = None
+        while len(batch) < self.batch_size:
+            try:
+                if not block:
+                    row = self._queue.get_nowait()
+                elif deadline is None:
+                    row = self._queue.get()
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    row = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(row)
+            if deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+
+    def _write(self, rows):
+        if self._app is None:
+            metrics.increment('ai_usage_log.dropped', len(rows))
+            logger.warning("Journal d'utilisation IA: aucune application Flask, %s entrée(s) ignorée(s)", len(rows))
+            return
+        started = time.monotonic()
+        with self._app.app_context():
+            try:
+                db.session.execute(insert(AIUsage), rows)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                metrics.increment('ai_usage_log.failed', len(rows))
+                logger.error("Impossible d'écrire %s entrée(s) du journal d'utilisation IA: %s", len(rows), e)
+                return
+        metrics.increment('ai_usage_log.written', len(rows))
+        metrics.observe('ai_usage_log.batch_seconds', time.monotonic() - started)
+
+    def flush(self):
+        """Écrit immédiatement les entrées en attente (arrêt du processus)"""
+        while True:
+            batch = self._next_batch(block=False)
+            if not batch:
+                return
+            self._write(batch)
+
+
+def usage_report(days=30):
+    """
+    Consommation agrégée par jour et par utilisateur
+
+    Returns:
+        list: dictionnaires (day, user_id, user_name, calls, errors, prompt_tokens, completion_tokens,
+              total_tokens, avg_latency_ms), du jour le plus récent au plus ancien
+    """
+    since = datetime.utcnow() - timedelta(days=days)
+    day = func.date(AIUsage.created_at)
+    rows = db.session.query(
+        day.label('day'),
+        AIUsage.user_id,
+        User.name,
+        func.count(AIUsage.id),
+        func.sum(case((AIUsage.status_code >= 400, 1), (AIUsage.status_code.is_(None), 1), else_=0)),
+        func.coalesce(func.sum(AIUsage.prompt_tokens), 0),
+        func.coalesce(func.sum(AIUsage.completion_tokens), 0),
+        func.coalesce(func.sum(AIUsage.total_tokens), 0),
+        func.avg(AIUsage.latency_ms),
+    ).outerjoin(User, User.id == AIUsage.user_id).filter(
+        AIUsage.created_at >= since
+    ).group_by(day, AIUsage.user_id, User.name).order_by(day.desc(), func.sum(AIUsage.total_tokens).desc()).all()
+    return [
+        {
+            'day': str(row[0]),
+            'user_id': row[1],
+            'user_name': row[2] or ('Système' if row[1] is None else f'Utilisateur supprimé #{row[1]}'),
+            'calls': row[3],
+            'errors': int(row[4] or 0),
+            'prompt_tokens': int(row[5]),
+            'completion_tokens': int(row[6]),
+            'total_tokens': int(row[7]),
+            'avg_latency_ms': int(row[8]) if row[8] is not None else None,
+        }
+        for row in rows
+    ]
+
+
+def operation_totals(days=30):
+    """Appels et jetons par opération et par modèle sur la période"""
+    since = datetime.utcnow() - timedelta(days=days)
+    rows = db.session.query(
+        AIUsage.operation, AIUsage.model, func.count(AIUsage.id),
+        func.coalesce(func.sum(AIUsage.total_tokens), 0), func.avg(AIUsage.latency_ms)
+    ).filter(AIUsage.created_at >= since).group_by(AIUsage.operation, AIUsage.model).order_by(AIUsage.operation).all()
+    return [
+        {'operation': row[0], 'model': row[1], 'calls': row[2], 'total_tokens': int(row[3]),
+         'avg_latency_ms': int(row[4]) if row[4] is not None else None}
+        for row in rows
+    ]
+
+
+usage_recorder = UsageRecorder(
+    batch_size=int(os.environ.get('AI_USAGE_BATCH_SIZE', 50)),
+    flush_interval=float(os.environ.get('AI_USAGE_FLUSH_INTERVAL', 2)),
+)
+daily_quota = DailyQuota(max_tokens=int(os.environ.get('AI_USER_DAILY_TOKEN_QUOTA', 0)))
+
+atexit.register(usage_recorder.flush)
@@ -306,6 +306,9 @@ class BaseVoiceRecognition {
                 appLog.log("Temporary only switch state:", temporaryOnlySwitch.checked);
             }
             
+            // Traitement asynchrone côté serveur: la requête retourne immédiatement un identifiant de travail
+            formData.append('async', 'true');
+
             // Permettre aux classes dérivées d'ajouter des données spécifiques
             this.prepareFormData(formData);
 
@@ -344,7 +347,10 @@ class BaseVoiceRecognition {
                     throw { message: errorMessage, type: errorType };
                 }
                 
-                const data = await response.json();
+                let data = await response.json();
+                if (response.status === 202 && data.status_url) {
+                    data = await this.waitForJob(data.status_url);
+                }
                 appLog.log('Données reçues du serveur:', data);
                 appLog.log('Structure de la réponse:', JSON.stringify(data, null, 2));
                 
@@ -609,6 +615,29 @@ class BaseVoiceRecognition {
         return mimeMap[baseMimeType] || '.raw'; // Default to .raw if unknown
     }
 
+    /**
+     * Attend la fin d'un travail asynchrone en interrogeant son URL d'état
+     * @param {string} statusUrl - URL retournée par le serveur (status_url)
+     * @returns {Promise<Object>} Résultat du travail ({items: [...]})
+     */
+    async waitForJob(statusUrl) {
+        const pollInterval = 750;
+        while (true) {
+            await new Promise(resolve => setTimeout(resolve, pollInterval));
+            const response = await fetch(statusUrl);
+            const job = await response.json();
+            if (!response.ok) {
+                throw { message: job.error || `Erreur ${response.status}`, type: job.error_type || 'unknown' };
+            }
+            if (job.status === 'done') {
+                return job.result;
+            }
+            if (job.status === 'error') {
+                throw { message: job.error, type: job.error_type || 'unknown' };
+            }
+        }
+    }
+
     // Méthodes à implémenter par les classes dérivées
     
     prepareFormData(formData) {
@@ -927,35 +956,6 @@ class InventoryVoiceRecognition extends BaseVoiceRecognition {
         }
     }
     
-    prepareFormData(formData) {
-        // Vérifier que les données de localisation sont complètes
-        if (!this.locations.zones || !this.locations.zones.length ||
-            !this.locations.furniture || !this.locations.furniture.length ||
-            !this.locations.drawers || !this.locations.drawers.length) {
-            appLog.error('Données de localisation incomplètes, tentative de rechargement...');
-            this.loadLocationData(); // Tenter de recharger
-        }
-        
-        // Formater le contexte en incluant uniquement les champs nécessaires
-        const formattedLocations = {
-            zones: this.locations.zones.map(zone => ({ id: zone.id, name: zone.name })),
-            furniture: this.locations.furniture.map(furniture => ({
-                id: furniture.id,
-                name: furniture.name,
-                zone_id: furniture.zone_id
-            })),
-            drawers: this.locations.drawers.map(drawer => ({
-                id: drawer.id,
-                name: drawer.name,
-                furniture_id: drawer.furniture_id
-            }))
-        };
-        
-        const locationsJSON = JSON.stringify(formattedLocations);
-        appLog.log('Envoi du contexte des emplacements (formaté):', formattedLocations);
-        formData.append('context', locationsJSON);
-    }
-    
     resetRecording() {
         super.resetRecording();
         // Réinitialiser les items reconnus
@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+from flask import Flask
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.models import db  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path):
+    """Application minimale sur une base SQLite temporaire (fichier: les connexions dédiées voient les données validées)"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'test.db'}"
+    app.config['SECRET_KEY'] = 'test'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
@@ -0,0 +1,49 @@
+import io
+import wave
+
+import numpy as np
+
+from src.services.audio_preprocess import preprocess_wav
+
+
+def make_wav(rate, seconds=1.0, channels=1, silence=0.0):
+    """Sinusoïde 16 bits précédée et suivie de `silence` secondes de silence"""
+    t = np.arange(int(rate * seconds)) / rate
+    tone = 0.5 * np.sin(2 * np.pi * 440 * t)
+    pad = np.zeros(int(rate * silence))
+    samples = (np.concatenate([pad, tone, pad]) * 32767).astype('<i2')
+    samples = np.repeat(samples[:, None], channels, axis=1)
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+def test_stereo_44k_is_downsampled_to_16k_mono():
+    data = make_wav(44100, channels=2, silence=0.5)
+    processed, stats = preprocess_wav(data)
+    assert stats['output_sample_rate'] == 16000
+    assert stats['saved_bytes'] > 0
+    assert not stats['kept_original']
+    with wave.open(io.BytesIO(processed)) as wav:
+        assert (wav.getnchannels(), wav.getframerate()) == (1, 16000)
+
+
+def test_low_rate_audio_is_never_upsampled():
+    data = make_wav(8000, silence=0.5)
+    processed, stats = preprocess_wav(data)
+    assert stats['output_sample_rate'] == 8000
+    assert stats['saved_bytes'] > 0
+    with wave.open(io.BytesIO(processed)) as wav:
+        assert wav.getframerate() == 8000
+
+
+def test_original_is_kept_when_processing_saves_nothing():
+    data = make_wav(8000)
+    processed, stats = preprocess_wav(data)
+    assert processed == data
+    assert stats['kept_original']
+    assert stats['saved_bytes'] == 0
@@ -0,0 +1,42 @@
+from src.models import db
+from src.models.item import Item
+from src.services import chat_intents
+
+
+def add_items(*names):
+    db.session.add_all([Item(name=name) for name in names])
+    db.session.commit()
+
+
+def test_classify_detects_plural_subjects():
+    assert chat_intents.classify('Où sont les tournevis ?').plural
+    assert chat_intents.classify('Où se trouvent mes pinces ?').plural
+    assert not chat_intents.classify('Où est le tournevis ?').plural
+    assert chat_intents.classify('Où est le tournevis ?').subject == 'tournevis'
+
+
+def test_count_includes_specific_items_of_a_generic_name(app):
+    add_items('Tournevis', 'Tournevis plat', 'Tournevis cruciforme', 'Marteau')
+
+    answer = chat_intents.answer('Combien de tournevis ?')
+
+    assert answer.startswith('Il y a 3 article(s)')
+    assert 'Tournevis plat' in answer and 'Tournevis cruciforme' in answer
+
+
+def test_plural_where_lists_every_matching_item(app):
+    add_items('Tournevis', 'Tournevis plat', 'Tournevis cruciforme')
+
+    answer = chat_intents.answer('Où sont les tournevis ?')
+
+    assert answer.startswith('Plusieurs articles correspondent')
+    assert answer.count('\n- ') == 3
+
+
+def test_singular_where_keeps_the_exact_match(app):
+    add_items('Tournevis', 'Tournevis plat')
+
+    answer = chat_intents.answer('Où est le tournevis ?')
+
+    assert answer.startswith('Tournevis :')
+    assert 'Tournevis plat' not in answer
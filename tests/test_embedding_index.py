@@ -0,0 +1,134 @@
+import numpy as np
+import pytest
+
+from src.models import db
+from src.models.item import Item
+from src.models.item_embedding import ItemEmbedding
+from src.services.embedding_index import EmbeddingIndex, _normalize_rows
+from src.services.inventory_cache import normalize_question
+from src.services.inventory_index import InventoryIndex
+import src.services.inventory_index as inventory_index_module
+
+# Concepts de l'embedding factice: des mots différents d'un même concept ont le même vecteur
+CONCEPTS = {
+    'perceuse': 0, 'visseuse': 0, 'percer': 0,
+    'marteau': 1, 'maillet': 1,
+    'scie': 2, 'egoine': 2,
+    'tuyau': 3, 'arrosage': 3,
+}
+
+
+class FakeEmbedder:
+    """Embedding déterministe: un axe par concept connu, un axe commun pour les mots inconnus"""
+    name = 'fake-concepts'
+    dim = 8
+
+    def __init__(self):
+        self.calls = []
+
+    def embed(self, texts):
+        self.calls.append(list(texts))
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in normalize_question(text).split():
+                matrix[row, CONCEPTS.get(word, self.dim - 1)] += 1.0
+        return _normalize_rows(matrix)
+
+
+class FailingEmbedder:
+    name = 'failing'
+
+    def embed(self, texts):
+        raise RuntimeError('backend indisponible')
+
+
+def add_items(*names, is_temporary=False):
+    items = [Item(name=name, is_temporary=is_temporary) for name in names]
+    db.session.add_all(items)
+    db.session.commit()
+    return items
+
+
+def test_search_ranks_semantic_neighbours_first(app):
+    drill, hammer, saw = add_items('Perceuse', 'Marteau', 'Scie')
+    index = EmbeddingIndex(FakeEmbedder())
+
+    results = index.search(['visseuse', 'maillet', 'egoine'], top_k=3)
+
+    assert [ranking[0][1] for ranking in results] == [drill.id, hammer.id, saw.id]
+    assert all(len(ranking) == 1 for ranking in results)  # les autres articles sont sous le seuil
+    assert results[0][0][0] == pytest.approx(1.0)
+
+
+def test_search_excludes_temporary_items_on_request(app):
+    add_items('Perceuse')
+    (temporary,) = add_items('Visseuse', is_temporary=True)
+    index = EmbeddingIndex(FakeEmbedder())
+
+    assert temporary.id in [item_id for _, item_id in index.search(['percer'], top_k=5)[0]]
+    assert temporary.id not in [item_id for _, item_id in index.search(['percer'], top_k=5, include_temporary=False)[0]]
+
+
+def test_refresh_embeds_only_new_or_renamed_items(app):
+    drill, hammer = add_items('Perceuse', 'Marteau')
+    embedder = FakeEmbedder()
+    index = EmbeddingIndex(embedder)
+    index.search(['scie'])
+    assert sorted(embedder.calls[0]) == ['Marteau', 'Perceuse']
+
+    # Sans nouvelle version de l'inventaire, seule la requête est vectorisée
+    embedder.calls.clear()
+    index.search(['scie'])
+    assert embedder.calls == [['scie']]
+
+    # Un ajout et un renommage incrémentent la version: seuls ces deux noms sont vectorisés
+    embedder.calls.clear()
+    (saw,) = add_items('Scie')
+    hammer.name = 'Maillet'
+    db.session.commit()
+    results = index.search(['egoine', 'marteau'])
+    assert sorted(embedder.calls[0]) == ['Maillet', 'Scie']
+    assert results[0][0][1] == saw.id
+    assert results[1][0][1] == hammer.id
+
+
+def test_vectors_are_persisted_and_reused(app):
+    add_items('Perceuse', 'Marteau')
+    EmbeddingIndex(FakeEmbedder()).refresh()
+    assert ItemEmbedding.query.filter_by(model=FakeEmbedder.name).count() == 2
+
+    # Un nouvel index (redémarrage) relit les vecteurs au lieu de les recalculer
+    embedder = FakeEmbedder()
+    EmbeddingIndex(embedder).refresh()
+    assert embedder.calls == []
+
+
+def test_refresh_leaves_the_caller_session_untouched(app):
+    add_items('Perceuse')
+    index = EmbeddingIndex(FakeEmbedder())
+    pending = Item(name='Article en cours de saisie')
+    db.session.add(pending)
+
+    index.refresh()
+
+    # Les vecteurs sont écrits sur une connexion dédiée: l'article en attente n'est ni validé ni annulé
+    assert pending in db.session.new
+    db.session.rollback()
+    assert Item.query.filter_by(name='Article en cours de saisie').count() == 0
+    assert ItemEmbedding.query.count() == 1
+
+
+def test_disabled_index_returns_empty_results(app):
+    add_items('Perceuse')
+    assert EmbeddingIndex(None).search(['perceuse', 'scie']) == [[], []]
+
+
+def test_chat_retrieval_falls_back_to_bm25_when_embeddings_fail(app, monkeypatch):
+    add_items('Perceuse sans fil', 'Marteau', 'Scie sauteuse', 'Tuyau d\'arrosage')
+    monkeypatch.setattr(inventory_index_module, 'embedding_index', EmbeddingIndex(FailingEmbedder()))
+    index = InventoryIndex(top_k=2)
+
+    result = index.retrieve('où est la perceuse ?')
+
+    assert 'Perceuse sans fil' in [document.name for document in result.items]
+    assert result.total_items == 4
@@ -0,0 +1,53 @@
+import os
+
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+
+from src.services import token_budget  # noqa: E402
+from src.services.ai_service import AIService  # noqa: E402
+
+
+class Document:
+    def __init__(self, item_id, name):
+        self.id = item_id
+        self.name = name
+        self.location_info = 'Garage > Etabli'
+
+
+def selection_lines(messages):
+    return [line for line in messages[1]['content'].splitlines() if line.startswith('- Nom:')]
+
+
+def test_budget_truncation_drops_least_relevant_items_then_sorts_by_name(monkeypatch):
+    # Sélection triée par pertinence: le meilleur résultat est alphabétiquement le dernier
+    ranked = [Document(1, 'Perceuse visseuse'), Document(2, 'Marteau'), Document(3, 'Agrafeuse'), Document(4, 'Clé à molette')]
+    service = AIService()
+    question = 'où est la perceuse ?'
+    full = service._build_inventory_chat_messages(ranked, question, zone_summaries=['Garage: 40 article(s)'], total_items=40)
+    # Budget restant juste suffisant pour les deux premières lignes de la sélection
+    budget = token_budget.estimate_messages([full[0], full[-1]]) + token_budget.MESSAGE_OVERHEAD + sum(
+        token_budget.estimate_tokens(line) + 1 for line in selection_lines(full)[:2]
+    )
+    monkeypatch.setenv('AI_TOKEN_BUDGET_CHAT', str(budget))
+
+    messages = service._build_inventory_chat_messages(ranked, question, zone_summaries=['Garage: 40 article(s)'], total_items=40)
+
+    assert selection_lines(messages) == [
+        '- Nom: Marteau, Emplacement: Garage > Etabli',
+        '- Nom: Perceuse visseuse, Emplacement: Garage > Etabli',
+    ]
+
+
+def test_partial_retrieval_is_ranked_by_relevance(app, monkeypatch):
+    from src.models import db
+    from src.models.item import Item
+    from src.services.embedding_index import EmbeddingIndex
+    import src.services.inventory_index as inventory_index_module
+
+    monkeypatch.setattr(inventory_index_module, 'embedding_index', EmbeddingIndex(None))
+    db.session.add_all([Item(name=name) for name in ('Agrafeuse', 'Marteau', 'Scie', 'Visseuse sans fil', 'Visseuse')])
+    db.session.commit()
+
+    result = inventory_index_module.InventoryIndex(top_k=2).retrieve('visseuse sans fil')
+
+    assert [document.name for document in result.items][0] == 'Visseuse sans fil'
+    assert not result.is_complete
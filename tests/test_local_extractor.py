@@ -0,0 +1,47 @@
+import pytest
+
+from src.services.local_extractor import extract_item_list
+
+THRESHOLD = 0.8
+
+
+def known(*names):
+    return lambda name: name.lower() in {known_name.lower() for known_name in names}
+
+
+def test_list_is_split_locally():
+    result = extract_item_list('un marteau, deux tournevis et la pince')
+    assert [item['name'] for item in result.items] == ['Marteau', 'Tournevis', 'Pince']
+    assert result.confidence >= THRESHOLD
+
+
+def test_single_known_item_is_accepted():
+    result = extract_item_list('un marteau', is_known=known('Marteau'))
+    assert result.items == [{'id': 1, 'name': 'Marteau'}]
+    assert result.confidence >= THRESHOLD
+
+
+@pytest.mark.parametrize('text', ['un marteau', 'Perforateur'])
+def test_single_unknown_item_falls_back_to_the_model(text):
+    assert extract_item_list(text, is_known=known('Scie')).confidence < THRESHOLD
+    assert extract_item_list(text).confidence < THRESHOLD
+
+
+@pytest.mark.parametrize('text', [
+    'Merci.', 'Bonjour', 'ok', 'Euh...', "Merci d'avoir regardé cette vidéo !",
+    "Sous-titrage ST' 501", 'Sous-titrage Société Radio-Canada',
+])
+def test_silence_hallucinations_and_filler_fall_back_to_the_model(text):
+    assert extract_item_list(text, is_known=lambda name: True).confidence < THRESHOLD
+
+
+def test_segment_with_digits_falls_back_to_the_model():
+    assert extract_item_list('une perceuse 18V et une scie').confidence < THRESHOLD
+    # Une quantité en tête de segment reste retirée
+    result = extract_item_list('2 marteaux et une scie')
+    assert [item['name'] for item in result.items] == ['Marteaux', 'Scie']
+    assert result.confidence >= THRESHOLD
+
+
+def test_questions_are_not_extracted_locally():
+    assert extract_item_list('où est la perceuse ?').confidence == 0.0
@@ -0,0 +1,74 @@
+import os
+from datetime import timedelta
+
+import pytest
+
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+
+from src.services.ai_service import AIService  # noqa: E402
+from src.services.resilience import Bulkhead, CircuitBreaker, CircuitOpenError, OverloadedError  # noqa: E402
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.headers = {}
+        self.content = b'{}'
+        self.request = None
+        self.elapsed = timedelta(milliseconds=5)
+
+    def json(self):
+        return {}
+
+
+class FakeSession:
+    def __init__(self, status_code=200):
+        self.status_code = status_code
+        self.calls = 0
+
+    def post(self, url, **kwargs):
+        self.calls += 1
+        return FakeResponse(self.status_code)
+
+
+@pytest.fixture
+def service(app):
+    service = AIService()
+    service.gateway = None
+    service.breaker = CircuitBreaker('test', failure_threshold=2, window=60, reset_timeout=30)
+    service.bulkheads['chat'] = Bulkhead('chat', max_concurrent=1, max_wait=0.01)
+    return service
+
+
+def test_rejected_call_does_not_hold_a_bulkhead_slot(service, monkeypatch):
+    service.http = FakeSession(status_code=500)
+    for _ in range(2):
+        service._post('chat', 'http://api.test/chat', json={'model': 'm'})
+    assert service.breaker.state == CircuitBreaker.OPEN
+
+    acquired = []
+    original_slot = service.bulkheads['chat'].slot
+    monkeypatch.setattr(service.bulkheads['chat'], 'slot', lambda: acquired.append(True) or original_slot())
+    with pytest.raises(CircuitOpenError):
+        service._post('chat', 'http://api.test/chat', json={'model': 'm'})
+    assert acquired == []
+    assert service.bulkheads['chat'].in_flight == 0
+
+
+def test_rate_limiting_does_not_open_the_circuit(service):
+    service.http = FakeSession(status_code=429)
+    for _ in range(5):
+        assert service._post('chat', 'http://api.test/chat', json={'model': 'm'}).status_code == 429
+    assert service.breaker.state == CircuitBreaker.CLOSED
+    assert service.http.calls == 5
+
+
+def test_overloaded_probe_releases_the_half_open_circuit(service, monkeypatch):
+    service.breaker._set_state(CircuitBreaker.HALF_OPEN)
+    service.http = FakeSession()
+    with service.bulkheads['chat'].slot():
+        with pytest.raises(OverloadedError):
+            service._post('chat', 'http://api.test/chat', json={'model': 'm'})
+    # Le refus du cloisonnement n'a pas consommé l'appel de test
+    service._post('chat', 'http://api.test/chat', json={'model': 'm'})
+    assert service.breaker.state == CircuitBreaker.CLOSED
@@ -0,0 +1,105 @@
+import os
+import sys
+import threading
+
+import pytest
+
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+
+from src.services.ai_service import AIService  # noqa: E402
+from src.services.single_flight import SingleFlight, fingerprint  # noqa: E402
+from src.services.usage_tracker import DailyQuota, QuotaExceededError, current_user_id  # noqa: E402
+
+# Le paquet src.services expose l'instance `ai_service` sous le nom du module
+ai_service_module = sys.modules['src.services.ai_service']
+
+
+def run_concurrently(flight, key, func, callers=5, **kwargs):
+    started = threading.Event()
+    release = threading.Event()
+    results = []
+
+    def leader_func():
+        started.set()
+        release.wait(5)
+        return func()
+
+    def call(is_leader):
+        try:
+            results.append(flight.do(key, leader_func if is_leader else func, **kwargs))
+        except Exception as e:
+            results.append(e)
+
+    threads = [threading.Thread(target=call, args=(True,))]
+    threads[0].start()
+    started.wait(5)
+    threads += [threading.Thread(target=call, args=(False,)) for _ in range(callers - 1)]
+    for thread in threads[1:]:
+        thread.start()
+    # Laisser les suivants rejoindre le calcul en cours avant de le terminer
+    while flight._calls[key].waiters < callers - 1:
+        pass
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+def test_identical_calls_share_one_computation():
+    calls = []
+    results = run_concurrently(SingleFlight('test'), 'k', lambda: calls.append(1) or ['resultat'], share=list)
+    assert len(calls) == 1
+    assert results == [['resultat']] * 5
+    assert len({id(result) for result in results}) == 5
+
+
+def test_waiters_receive_the_leader_error():
+    def fail():
+        raise ValueError('erreur')
+    results = run_concurrently(SingleFlight('test'), 'k', fail, callers=3)
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_fingerprint_is_stable_across_key_order():
+    assert fingerprint({'a': 1, 'b': 2}, 3) == fingerprint({'b': 2, 'a': 1}, 3)
+    assert fingerprint('question', 1, 'alice') != fingerprint('question', 1, 'bob')
+
+
+@pytest.mark.parametrize('quota, expected', [(0, None), (1000, 42)])
+def test_flight_scope_includes_the_user_only_with_a_quota(monkeypatch, quota, expected):
+    monkeypatch.setattr(ai_service_module, 'daily_quota', DailyQuota(max_tokens=quota))
+    token = current_user_id.set(42)
+    try:
+        assert AIService._flight_scope() == expected
+    finally:
+        current_user_id.reset(token)
+
+
+def test_quota_error_of_one_user_is_not_shared_with_another(monkeypatch):
+    daily_quota = DailyQuota(max_tokens=10)
+    daily_quota.add(1, 10)
+    monkeypatch.setattr(ai_service_module, 'daily_quota', daily_quota)
+    flight = SingleFlight('test')
+    barrier = threading.Barrier(2)
+    outcomes = {}
+
+    def ask(user_id):
+        current_user_id.set(user_id)
+        barrier.wait(5)
+        key = fingerprint('Où est la perceuse ?', AIService._flight_scope())
+
+        def call():
+            daily_quota.check(user_id)
+            return 'réponse'
+        try:
+            outcomes[user_id] = flight.do(key, call)
+        except QuotaExceededError as e:
+            outcomes[user_id] = e
+
+    threads = [threading.Thread(target=ask, args=(user_id,)) for user_id in (1, 2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert isinstance(outcomes[1], QuotaExceededError)
+    assert outcomes[2] == 'réponse'
@@ -0,0 +1,39 @@
+import os
+import sys
+
+import pytest
+
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+
+from src.services.ai_service import AIService  # noqa: E402
+from src.services.usage_tracker import DailyQuota, token_counts  # noqa: E402
+
+ai_service_module = sys.modules['src.services.ai_service']
+
+
+@pytest.mark.parametrize('usage, expected', [
+    ({'prompt_tokens': 10, 'completion_tokens': 5, 'total_tokens': 15}, (10, 5, 15)),
+    ({'type': 'tokens', 'input_tokens': 30, 'output_tokens': 4}, (30, 4, 34)),
+    ({'prompt_tokens': 8, 'total_tokens': 8}, (8, None, 8)),
+    (None, (None, None, None)),
+])
+def test_token_counts(usage, expected):
+    assert token_counts(usage) == expected
+
+
+class Response:
+    def __init__(self, user_id):
+        self.usage_record = {'operation': 'transcription', 'model': 'whisper-1', 'status_code': 200,
+                             'latency': 0.1, 'user_id': user_id}
+
+
+def test_quota_is_charged_with_the_logged_total(monkeypatch):
+    quota = DailyQuota(max_tokens=1000)
+    recorded = []
+    monkeypatch.setattr(ai_service_module, 'daily_quota', quota)
+    monkeypatch.setattr(ai_service_module.usage_recorder, 'record', lambda **kwargs: recorded.append(kwargs))
+
+    AIService()._record_usage(Response(user_id=7), usage={'type': 'tokens', 'input_tokens': 30, 'output_tokens': 4})
+
+    assert quota.used(7) == 34
+    assert token_counts(recorded[0]['usage'])[2] == 34
@@ -0,0 +1,174 @@
+"""
+Mesure de la latence des routes IA de JPJR.
+
+Envoie des requêtes concurrentes à `/api/ai/voice-recognition`, `/api/ai/inventory-voice` et
+`/api/ai/chat/inventory` d'une instance en cours d'exécution (de préférence branchée sur le bouchon
+tools/openai_stub.py via OPENAI_BASE_URL) et affiche, par route, les percentiles p50/p95/p99.
+
+Utilisation:
+    python tools/openai_stub.py --transcription-latency 800 --completion-latency 300 &
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=stub USE_SSL=false python -m src.app &
+    python tools/benchmark_ai.py --url http://127.0.0.1:5001 --requests 200 --concurrency 16
+"""
+import json
+import math
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+# Phrases dictées simulées: le bouchon renvoie le texte qui suit STUB-TEXT comme transcription
+VOICE_PHRASES = [
+    "un marteau, deux tournevis et la pince",
+    "je voudrais emprunter la perceuse et une rallonge",
+    "trois serre-joints et un niveau à bulle",
+]
+INVENTORY_PHRASES = [
+    "une scie sauteuse et une ponceuse",
+    "la boîte de vis et les chevilles",
+]
+CHAT_QUESTIONS = [
+    "Où est la perceuse ?",
+    "Quels outils de jardinage avons-nous ?",
+    "Qu'est-ce qui est rangé dans le garage ?",
+    "Combien de tournevis ?",
+]
+
+
+def percentile(sorted_values, fraction):
+    """Percentile par rang le plus proche d'une liste triée"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def _audio(text, index, audio_bytes):
+    # Octets différents à chaque requête: le cache des transcriptions ne fausse pas la mesure
+    marker = f"STUB-TEXT:{text}\n#{index}\n".encode('utf-8')
+    return marker + audio_bytes
+
+
+class Benchmark:
+    """Exécution d'une série de requêtes par route et collecte des durées"""
+
+    def __init__(self, base_url, user_id=None, verify=True, timeout=120, audio_bytes=b''):
+        self.base_url = base_url.rstrip('/')
+        self.user_id = user_id
+        self.verify = verify
+        self.timeout = timeout
+        self.audio_bytes = audio_bytes
+        self._local = threading.local()
+
+    def _session(self):
+        # Une session (cookie de connexion, connexions persistantes) par thread
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.verify = self.verify
+            if self.user_id is not None:
+                session.get(f'{self.base_url}/login/{self.user_id}', timeout=self.timeout, allow_redirects=False)
+            self._local.session = session
+        return session
+
+    def _request(self, endpoint, index):
+        session = self._session()
+        if endpoint == 'voice':
+            text = VOICE_PHRASES[index % len(VOICE_PHRASES)]
+            return session.post(
+                f'{self.base_url}/api/ai/voice-recognition',
+                files={'audio': ('audio.webm', _audio(text, index, self.audio_bytes), 'audio/webm')},
+                data={'mime_type': 'audio/webm'}, timeout=self.timeout
+            )
+        if endpoint == 'inventory':
+            text = INVENTORY_PHRASES[index % len(INVENTORY_PHRASES)]
+            return session.post(
+                f'{self.base_url}/api/ai/inventory-voice',
+                files={'audio': ('audio.webm', _audio(text, index, self.audio_bytes), 'audio/webm')},
+                data={'mime_type': 'audio/webm'}, timeout=self.timeout
+            )
+        # Numéro ajouté à la question: le cache des réponses du chat ne fausse pas la mesure
+        question = f"{CHAT_QUESTIONS[index % len(CHAT_QUESTIONS)]} ({index})"
+        return session.post(f'{self.base_url}/api/ai/chat/inventory', json={'query': question}, timeout=self.timeout)
+
+    def _timed(self, endpoint, index):
+        started = time.perf_counter()
+        try:
+            response = self._request(endpoint, index)
+            status = response.status_code
+        except requests.exceptions.RequestException as e:
+            status = type(e).__name__
+        return time.perf_counter() - started, status
+
+    def run(self, endpoint, count, concurrency):
+        """Envoie `count` requêtes avec `concurrency` clients simultanés; retourne le résumé de la route"""
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(lambda index: self._timed(endpoint, index), range(count)))
+        elapsed = time.perf_counter() - started
+
+        durations = sorted(duration for duration, status in results if status == 200)
+        statuses = {}
+        for _, status in results:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        to_ms = lambda value: round(value * 1000, 1) if value is not None else None
+        return {
+            'endpoint': endpoint,
+            'requests': count,
+            'concurrency': concurrency,
+            'ok': len(durations),
+            'statuses': statuses,
+            'throughput_rps': round(count / elapsed, 2) if elapsed else None,
+            'mean_ms': to_ms(sum(durations) / len(durations)) if durations else None,
+            'p50_ms': to_ms(percentile(durations, 0.50)),
+            'p95_ms': to_ms(percentile(durations, 0.95)),
+            'p99_ms': to_ms(percentile(durations, 0.99)),
+            'max_ms': to_ms(durations[-1]) if durations else None,
+        }
+
+
+def _print_table(summaries):
+    columns = ('endpoint', 'requests', 'concurrency', 'ok', 'throughput_rps', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms')
+    print('  '.join(f'{column:>14}' for column in columns))
+    for summary in summaries:
+        print('  '.join(f'{str(summary[column]):>14}' for column in columns))
+        errors = {status: n for status, n in summary['statuses'].items() if status != '200'}
+        if errors:
+            print(f"{'':>14}  réponses en erreur: {errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mesure de latence des routes IA (p50/p95/p99)")
+    parser.add_argument('--url', default='http://127.0.0.1:5001', help="URL de l'application")
+    parser.add_argument('--endpoints', default='voice,inventory,chat', help="routes à mesurer: voice, inventory, chat")
+    parser.add_argument('--requests', type=int, default=50, help='nombre de requêtes par route')
+    parser.add_argument('--concurrency', type=int, default=8, help='clients simultanés')
+    parser.add_argument('--user-id', type=int, default=1, help="utilisateur connecté (requis par le chat)")
+    parser.add_argument('--audio', help="fichier audio ajouté au marqueur STUB-TEXT (taille d'upload réaliste)")
+    parser.add_argument('--insecure', action='store_true', help='ne pas vérifier le certificat (USE_SSL avec certificat adhoc)')
+    parser.add_argument('--json', action='store_true', help='résultat au format JSON')
+    args = parser.parse_args()
+
+    endpoints = [endpoint.strip() for endpoint in args.endpoints.split(',') if endpoint.strip()]
+    unknown = set(endpoints) - {'voice', 'inventory', 'chat'}
+    if unknown:
+        parser.error(f"routes inconnues: {', '.join(sorted(unknown))}")
+
+    audio_bytes = b''
+    if args.audio:
+        with open(args.audio, 'rb') as audio_file:
+            audio_bytes = audio_file.read()
+    if args.insecure:
+        requests.packages.urllib3.disable_warnings()
+
+    benchmark = Benchmark(args.url, user_id=args.user_id, verify=not args.insecure, audio_bytes=audio_bytes)
+    summaries = [benchmark.run(endpoint, args.requests, args.concurrency) for endpoint in endpoints]
+    if args.json:
+        print(json.dumps(summaries, indent=2))
+    else:
+        _print_table(summaries)
+
+
+if __name__ == '__main__':
+    main()
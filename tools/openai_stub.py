@@ -0,0 +1,248 @@
+"""
+Bouchon local de l'API OpenAI pour mesurer JPJR sans appel réel.
+
+Implémente `/v1/audio/transcriptions` et `/v1/chat/completions` (y compris le mode `stream`) avec des
+réponses déterministes: la transcription est lue dans l'audio s'il contient `STUB-TEXT:<texte>`, sinon
+choisie parmi des phrases types selon l'empreinte des octets; les extractions et comparaisons sont
+construites à partir du prompt (selon le schéma demandé). Une latence et un taux d'erreur artificiels
+sont configurables.
+
+Utilisation:
+    python tools/openai_stub.py --port 8089 --transcription-latency 800 --completion-latency 300 --error-rate 0.02
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=stub USE_SSL=false python -m src.app
+"""
+import re
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Transcriptions renvoyées pour un audio quelconque (choix déterministe selon ses octets)
+CANNED_TRANSCRIPTS = [
+    "un marteau, deux tournevis et la pince",
+    "je voudrais emprunter la perceuse et une rallonge",
+    "une scie sauteuse dans le garage sur l'établi",
+    "trois serre-joints et un niveau à bulle",
+]
+
+STUB_TEXT = re.compile(rb"STUB-TEXT:([^\r\n]+)")
+SEPARATORS = re.compile(r",|;|\bet\b|\bpuis\b", re.IGNORECASE)
+LEADING_WORDS = re.compile(
+    r"^(?:(?:je voudrais|je veux|il me faut|emprunter|prendre|ajouter|un|une|des|le|la|les|du|de|deux|trois|quatre|cinq)\b\s*"
+    r"|[ld]'\s*)+",
+    re.IGNORECASE
+)
+LOCATION_SUFFIX = re.compile(r"\s+(?:dans|sur|sous)\s+.*$", re.IGNORECASE)
+
+
+class StubConfig:
+    """Latences (secondes), gigue, taux d'erreur et générateur aléatoire partagé par les threads"""
+
+    def __init__(self, transcription_latency=0.0, completion_latency=0.0, jitter=0.0,
+                 error_rate=0.0, error_status=500, stream_chunks=8, seed=0):
+        self.transcription_latency = transcription_latency
+        self.completion_latency = completion_latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.stream_chunks = stream_chunks
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self, base):
+        with self._lock:
+            jitter = self._random.uniform(-self.jitter, self.jitter) if self.jitter else 0.0
+        time.sleep(max(0.0, base + jitter))
+
+    def should_fail(self):
+        if self.error_rate <= 0:
+            return False
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+
+def _usage(prompt_text, completion_text):
+    prompt = max(1, len(prompt_text) // 4)
+    completion = max(1, len(completion_text) // 4)
+    return {'prompt_tokens': prompt, 'completion_tokens': completion, 'total_tokens': prompt + completion}
+
+
+def transcript_for(body):
+    """Texte de l'audio: marqueur STUB-TEXT, sinon phrase type choisie par empreinte"""
+    match = STUB_TEXT.search(body)
+    if match:
+        return match.group(1).decode('utf-8', 'replace').strip()
+    digest = hashlib.sha256(body).digest()
+    return CANNED_TRANSCRIPTS[digest[0] % len(CANNED_TRANSCRIPTS)]
+
+
+def item_names(text):
+    """Découpage simple d'une transcription en noms d'articles"""
+    names = []
+    for segment in SEPARATORS.split(text):
+        name = LOCATION_SUFFIX.sub('', LEADING_WORDS.sub('', segment.strip())).strip(" .!?")
+        if name and name.lower() not in (existing.lower() for existing in names):
+            names.append(name)
+    return names
+
+
+def _quoted(content):
+    match = re.search(r'"([^"]*)"', content)
+    return match.group(1) if match else content
+
+
+def _comparison_candidates(content):
+    # Le prompt contient les candidats en JSON compact sur une ligne: {"nom": [{"id": 1, "name": "..."}]}
+    for line in content.splitlines():
+        line = line.strip()
+        if line.startswith('{') and line.endswith('}'):
+            try:
+                return json.loads(line)
+            except ValueError:
+                continue
+    return {}
+
+
+def completion_content(payload):
+    """Contenu de la réponse selon le schéma demandé (extraction, comparaison) ou le chat"""
+    messages = payload.get('messages') or []
+    user_content = next((m.get('content') or '' for m in reversed(messages) if m.get('role') == 'user'), '')
+    response_format = payload.get('response_format') or {}
+    schema_name = (response_format.get('json_schema') or {}).get('name')
+
+    if schema_name == 'extracted_items' or (not schema_name and 'emprunter des articles' in user_content):
+        return json.dumps({'items': [{'name': name} for name in item_names(_quoted(user_content))]}, ensure_ascii=False)
+    if schema_name == 'located_items' or (not schema_name and 'Emplacements existants' in user_content):
+        zone = re.search(r"^Z(\d+) ", user_content, re.MULTILINE)
+        zone_id = int(zone.group(1)) if zone else None
+        return json.dumps({'items': [
+            {'name': name, 'zone_id': zone_id, 'furniture_id': None, 'drawer_id': None}
+            for name in item_names(_quoted(user_content))
+        ]}, ensure_ascii=False)
+    if schema_name == 'item_comparison' or 'matched_items' in user_content:
+        matches = []
+        for name, candidates in _comparison_candidates(user_content).items():
+            best = candidates[0] if candidates else None
+            matches.append({
+                'original_name': name, 'is_conventional': best is not None,
+                'db_id': best['id'] if best else None, 'db_name': best['name'] if best else None,
+            })
+        return json.dumps({'matched_items': matches}, ensure_ascii=False)
+    return f"Réponse de test: {len(messages)} message(s), {len(user_content)} caractère(s) dans la question."
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    config = StubConfig()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self):
+        self._send_json(self.config.error_status, {'error': {'message': 'Erreur simulée par le bouchon', 'type': 'stub_error'}})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        path = self.path.split('?')[0].rstrip('/')
+        if path.endswith('/audio/transcriptions'):
+            self.config.delay(self.config.transcription_latency)
+            if self.config.should_fail():
+                return self._send_error()
+            text = transcript_for(body)
+            return self._send_json(200, {'text': text, 'usage': {'type': 'tokens', 'input_tokens': max(1, len(body) // 1000),
+                                                                  'output_tokens': max(1, len(text) // 4)}})
+        if path.endswith('/chat/completions'):
+            try:
+                payload = json.loads(body or b'{}')
+            except ValueError:
+                return self._send_json(400, {'error': {'message': 'JSON invalide', 'type': 'invalid_request_error'}})
+            self.config.delay(self.config.completion_latency)
+            if self.config.should_fail():
+                return self._send_error()
+            content = completion_content(payload)
+            usage = _usage(json.dumps(payload.get('messages'), ensure_ascii=False), content)
+            if payload.get('stream'):
+                return self._stream(payload, content, usage)
+            return self._send_json(200, {
+                'id': 'chatcmpl-stub', 'object': 'chat.completion', 'model': payload.get('model'),
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+                'usage': usage,
+            })
+        self._send_json(404, {'error': {'message': f'Route inconnue: {self.path}', 'type': 'not_found'}})
+
+    def _stream(self, payload, content, usage):
+        """Réponse Server-Sent Events découpée en `stream_chunks` fragments, puis le bloc usage"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        size = max(1, len(content) // max(1, self.config.stream_chunks))
+        events = [{'choices': [{'index': 0, 'delta': {'content': content[i:i + size]}}]} for i in range(0, len(content), size)]
+        if (payload.get('stream_options') or {}).get('include_usage'):
+            events.append({'choices': [], 'usage': usage})
+        for event in events:
+            self._write_chunk(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode('utf-8'))
+        self._write_chunk(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+
+class StubServer(ThreadingHTTPServer):
+    # File d'attente des connexions suffisante pour une mesure à forte concurrence
+    request_queue_size = 256
+    daemon_threads = True
+
+
+def make_server(host='127.0.0.1', port=8089, config=None):
+    """Crée le serveur (un thread par connexion); `serve_forever()` le démarre"""
+    handler = type('ConfiguredStubHandler', (StubHandler,), {'config': config or StubConfig()})
+    server = StubServer((host, port), handler)
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bouchon local de l'API OpenAI (transcription et complétion)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--transcription-latency', type=float, default=0, help='latence ajoutée aux transcriptions (ms)')
+    parser.add_argument('--completion-latency', type=float, default=0, help='latence ajoutée aux complétions (ms)')
+    parser.add_argument('--jitter', type=float, default=0, help='variation aléatoire de la latence (± ms)')
+    parser.add_argument('--error-rate', type=float, default=0, help='proportion de réponses en erreur (0 à 1)')
+    parser.add_argument('--error-status', type=int, default=500, help='code HTTP des erreurs simulées')
+    parser.add_argument('--seed', type=int, default=0, help='graine du tirage des erreurs et de la gigue')
+    args = parser.parse_args()
+
+    config = StubConfig(
+        transcription_latency=args.transcription_latency / 1000,
+        completion_latency=args.completion_latency / 1000,
+        jitter=args.jitter / 1000,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed,
+    )
+    server = make_server(args.host, args.port, config)
+    print(f"Bouchon OpenAI sur http://{args.host}:{server.server_port}/v1 (Ctrl+C pour arrêter)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()